@@ -0,0 +1,271 @@
+"""
+Backtest a model walk forward through each season, as if it were retrained before every gameweek.
+The features that only depend on the matches before each row, i.e. the rolling form and shifted next match info of the
+clean gameweeks and the form against the next opponent as of the date of the row, are built once into a snapshot that
+is cached on disk and shared by every step. Each step only re-maps the positions from the matches already played, then
+trains on the rows whose next match was before the gameweek and whose player played it, as the model is trained, and
+scores every row whose next match is in the gameweek, as whether the player plays it is not known beforehand.
+The seasons are backtested in parallel, and the score of every step is cached, so a repeated backtest only fits the
+steps that have changed.
+
+Usage, from the root of the repository:
+    python -m project.backtest [--seasons 2021-22 ...] [--estimator sgd --params '{"alpha": 0.0001}'] [--jobs N]
+where the estimator defaults to the best candidate of the last grid search.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, balanced_accuracy_score
+from sklearn.preprocessing import MinMaxScaler
+from project.gridsearch import CANDIDATES, REPORT_PATH as GRIDSEARCH_REPORT_PATH, load_cache, save_cache
+from project.models.all_seasons import AllSeasons, ALL_SEASONS_COLUMNS, POSITION_TYPES
+from project.models.season_store import SeasonStore
+from project.models.training import Training, sparse_dummies, scale_and_stack
+from project.hashing import hash_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLEAN_GAMEWEEKS_PATH = os.path.join(ROOT, "data", "clean_gameweeks")
+SNAPSHOT_PATH = os.path.join(ROOT, "data", ".cache", "backtest")
+CACHE_PATH = os.path.join(ROOT, "data", ".cache", "backtest", "steps.json")
+REPORT_PATH = os.path.join(ROOT, "data", "models", "backtest.json")
+# The code the snapshot and the steps are built with, so a change to it invalidates the cached snapshots and scores.
+BACKTEST_CODE = ["project/backtest.py", "project/models/all_seasons.py", "project/models/training.py"]
+DEFAULT_CANDIDATE = {"estimator": "sgd", "params": {"loss": "modified_huber", "alpha": 0.0001}}
+
+parameters = json.load(open(os.path.join(ROOT, "project", "parameters.json")))
+POSITION_THRESHOLDS = parameters["POSITION_THRESHOLDS"]
+POSITIONS_PER_SEASON = parameters["POSITIONS_PER_SEASON"]
+
+
+def snapshot_key(store_path, seasons):
+    """
+    the key of the snapshot of the seasons, a hash of their clean gameweeks, the backtest code and the position
+    parameters the steps map the positions with
+    :param store_path: str
+    :param seasons: list
+    :return: str
+    """
+    key = {"seasons": {season: hash_path(os.path.join(store_path, season)) for season in seasons},
+           "code": {path: hash_path(path) for path in BACKTEST_CODE},
+           "positions": [POSITION_THRESHOLDS, POSITIONS_PER_SEASON]}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def build_snapshot(store_path, seasons):
+    """
+    the labelled rows of the seasons clean gameweeks with every feature that needs no later matches, where the form
+    against the next opponent is meaned as of the date of each row rather than over every season
+    the positions are left unmapped, as the mapping medians every match of the player, and the rows whose player did
+    not play their next match are kept, as whether they played is only known after the gameweek
+    :param store_path: str
+    :param seasons: list
+    :return: pandas.core.frame.DataFrame
+    """
+    all_seasons = SeasonStore(store_path).read(partitions=seasons, columns=ALL_SEASONS_COLUMNS, mmap=False)
+    all_seasons = AllSeasons(all_seasons)
+    all_seasons.form_against_shift_opponent(as_of=True)
+    snapshot = all_seasons.all_seasons
+    return snapshot[snapshot["shift_opponent"].notna()].reset_index(drop=True)
+
+
+def load_snapshot(store_path, seasons, snapshot_path=SNAPSHOT_PATH):
+    """
+    the snapshot of the seasons, read from the cache if it has been built from the same data and code
+    :param store_path: str
+    :param seasons: list
+    :param snapshot_path: str
+    :return: pandas.core.frame.DataFrame, str
+    """
+    key = snapshot_key(store_path, seasons)
+    snapshot_store = SeasonStore(os.path.join(snapshot_path, "snapshot-" + key))
+    if snapshot_store.partitions() == sorted(seasons):
+        return snapshot_store.read(mmap=False), key
+    snapshot = build_snapshot(store_path, seasons)
+    snapshot_store.write_seasons(snapshot)
+    return snapshot_store.read(mmap=False), key
+
+
+def step_key(data_key, season, gameweek, candidate):
+    """
+    :param data_key: str
+    :param season: str
+    :param gameweek: int
+    :param candidate: dict
+    :return: str
+    """
+    key = {"data": data_key, "season": season, "gameweek": gameweek, "estimator": candidate["estimator"],
+           "params": candidate["params"]}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def step_rows(seasons, rounds, next_rounds, played, season, gameweek):
+    """
+    the rows visible before the gameweek of the season, the rows labelled by then whose player played their next
+    match, as the model is trained, and every row whose next match is in the gameweek, whether or not the player goes
+    on to play it
+    :param seasons: np.array
+    :param rounds: np.array
+    :param next_rounds: np.array
+    :param played: np.array
+    :param season: str
+    :param gameweek: int
+    :return: np.array, np.array, np.array
+    """
+    earlier = seasons < season
+    in_season = seasons == season
+    visible = earlier | (in_season & (rounds < gameweek))
+    train_rows = np.flatnonzero(played & (earlier | (in_season & (next_rounds < gameweek))))
+    test_rows = np.flatnonzero(in_season & (next_rounds == gameweek))
+    return visible, train_rows, test_rows
+
+
+def run_step(snapshot, model_frame, categories, visible, train_rows, test_rows, candidate):
+    """
+    maps the positions from the visible rows, trains the candidate on the train rows and scores it on the test rows
+    :param snapshot: pandas.core.frame.DataFrame
+    :param model_frame: pandas.core.frame.DataFrame
+    :param categories: dict
+    :param visible: np.array
+    :param train_rows: np.array
+    :param test_rows: np.array
+    :param candidate: dict
+    :return: dict
+    """
+    start = time.perf_counter()
+    positions = AllSeasons(snapshot[["season", "player_id", "position", "creativity", "threat"]].copy())
+    positions.map_position_types(visible, thresholds=POSITION_THRESHOLDS, per_season=POSITIONS_PER_SEASON)
+
+    training = Training(model_frame.assign(position=positions.all_seasons["position"].to_numpy()))
+    dummies, _, _ = sparse_dummies(training.training_data, training.categorical_columns, categories)
+    x_train, x_test, _ = scale_and_stack(training.training_data[training.numerical_columns], dummies, train_rows,
+                                         test_rows, MinMaxScaler(), training.numerical_columns)
+    labels = training.labels.to_numpy()
+    estimator = clone(CANDIDATES[candidate["estimator"]][0]).set_params(**candidate["params"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        estimator.fit(x_train, labels[train_rows])
+        predicted = estimator.predict(x_test)
+        balanced_accuracy = balanced_accuracy_score(labels[test_rows], predicted)
+    return {"train_rows": len(train_rows), "test_rows": len(test_rows),
+            "accuracy": accuracy_score(labels[test_rows], predicted), "balanced_accuracy": balanced_accuracy,
+            "seconds": time.perf_counter() - start}
+
+
+def backtest_season(snapshot, season, candidate, data_key, min_train_rows=1000, cache=None):
+    """
+    steps through every gameweek of the season, using the cached score of a step when there is one
+    :param snapshot: pandas.core.frame.DataFrame
+    :param season: str
+    :param candidate: dict
+    :param data_key: str
+    :param min_train_rows: int
+    :param cache: dict
+    :return: list
+    """
+    cache = {} if cache is None else cache
+    model_frame = AllSeasons(snapshot.copy())
+    model_frame.take_useful_columns()
+    model_frame = model_frame.all_seasons
+    training = Training(model_frame.copy())
+    categories = sparse_dummies(training.training_data, training.categorical_columns)[2]
+    position_types = [position_type for _, _, attacking, defensive in POSITION_TYPES.values()
+                      for position_type in (attacking, defensive)]
+    raw_positions = set(snapshot["position"].dropna().astype(str)) - set(POSITION_TYPES)
+    categories["position"] = sorted(raw_positions.union(position_types))
+
+    seasons = snapshot["season"].astype(str).to_numpy()
+    rounds = snapshot["round"].to_numpy()
+    next_rounds = snapshot["shift_round"].to_numpy()
+    played = ((snapshot["shift_minutes"] > 0) | snapshot["shift_minutes"].isnull()).to_numpy()
+    steps = []
+    for gameweek in np.unique(next_rounds[seasons == season]).astype(int):
+        visible, train_rows, test_rows = step_rows(seasons, rounds, next_rounds, played, season, gameweek)
+        if len(train_rows) < min_train_rows:
+            continue
+        key = step_key(data_key, season, gameweek, candidate)
+        if key in cache:
+            step = cache[key]
+        else:
+            step = run_step(snapshot, model_frame, categories, visible, train_rows, test_rows, candidate)
+        steps.append(dict(step, season=season, gameweek=int(gameweek), key=key))
+    return steps
+
+
+def best_candidate(report_path=GRIDSEARCH_REPORT_PATH):
+    """
+    the best candidate of the last grid search, or the default candidate if there has not been one
+    :param report_path: str
+    :return: dict
+    """
+    if not os.path.exists(report_path):
+        return DEFAULT_CANDIDATE
+    with open(report_path) as report_file:
+        best = json.load(report_file)["best"]
+    return {"estimator": best["estimator"], "params": best["params"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest a model retrained before every gameweek.")
+    parser.add_argument("--seasons", nargs="+", help="the seasons to backtest, every season after the first by default")
+    parser.add_argument("--estimator", choices=list(CANDIDATES), help="the estimator, the grid search best by default")
+    parser.add_argument("--params", type=json.loads, default={}, help="the estimators hyperparameters as json")
+    parser.add_argument("--min-train-rows", type=int, default=1000,
+                        help="the fewest labelled rows a step is trained on, fewer and the gameweek is skipped")
+    parser.add_argument("--jobs", type=int, default=-1,
+                        help="the number of seasons backtested at once, -1 for every core")
+    parser.add_argument("--no-cache", action="store_true", help="run every step even if its score is cached")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    clean_seasons = SeasonStore(CLEAN_GAMEWEEKS_PATH).partitions()
+    backtest_seasons = arguments.seasons or clean_seasons[1:]
+    missing_seasons = sorted(set(backtest_seasons) - set(clean_seasons))
+    if missing_seasons:
+        raise KeyError("Seasons {} are not in the clean gameweeks".format(", ".join(missing_seasons)))
+    # Every season up to the last backtested is needed, as each step trains on the seasons before it.
+    snapshot_seasons = [season for season in clean_seasons if season <= max(backtest_seasons)]
+    snapshot, data_key = load_snapshot(CLEAN_GAMEWEEKS_PATH, snapshot_seasons)
+    print("Loaded the snapshot of {} rows in {:.1f}s".format(len(snapshot), time.perf_counter() - start))
+
+    candidate = ({"estimator": arguments.estimator, "params": arguments.params} if arguments.estimator
+                 else best_candidate())
+    cache = {} if arguments.no_cache else load_cache(CACHE_PATH)
+    season_steps = Parallel(n_jobs=arguments.jobs)(
+        delayed(backtest_season)(snapshot, season, candidate, data_key, arguments.min_train_rows, cache)
+        for season in backtest_seasons)
+    steps = [step for season in season_steps for step in season]
+    for step in steps:
+        cache[step["key"]] = {column: value for column, value in step.items()
+                              if column not in {"key", "season", "gameweek"}}
+    if not arguments.no_cache:
+        save_cache(cache, CACHE_PATH)
+
+    report = {"candidate": candidate, "seconds": time.perf_counter() - start, "seasons": {}, "steps": steps}
+    print("{:<10}{:>9}{:>12}{:>11}{:>11}{:>19}{:>9}".format("Season", "Gameweek", "Train rows", "Test rows",
+                                                            "Accuracy", "Balanced accuracy", "Seconds"))
+    for season, season_step in zip(backtest_seasons, season_steps):
+        for step in season_step:
+            print("{:<10}{:>9}{:>12}{:>11}{:>11.4f}{:>19.4f}{:>9.2f}".format(
+                season, step["gameweek"], step["train_rows"], step["test_rows"], step["accuracy"],
+                step["balanced_accuracy"], step["seconds"]))
+        test_rows = np.array([step["test_rows"] for step in season_step])
+        report["seasons"][season] = {
+            "gameweeks": len(season_step),
+            "accuracy": float(np.average([step["accuracy"] for step in season_step], weights=test_rows)),
+            "balanced_accuracy": float(np.mean([step["balanced_accuracy"] for step in season_step]))}
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as report_file:
+        json.dump(report, report_file, indent=2, default=str)
+
+    for season, summary in report["seasons"].items():
+        print("{}: {} gameweeks, accuracy {:.4f}, mean balanced accuracy {:.4f}".format(
+            season, summary["gameweeks"], summary["accuracy"], summary["balanced_accuracy"]))
+    print("{} {} backtested in {:.1f}s, report written to {}".format(candidate["estimator"],
+                                                                      json.dumps(candidate["params"]),
+                                                                      report["seconds"], REPORT_PATH))
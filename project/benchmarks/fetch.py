@@ -0,0 +1,107 @@
+"""
+Measure the fetchers against a local stub server of synthetic FPL api and football-data files, with a delay on every
+response: a cold fetch with one worker and with eight, a re-run where every response is unchanged, and a re-run after
+one players history changes.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+from project.benchmarks.synthetic import synthetic_seasons
+from project.fetch.client import CachedClient
+from project.fetch.gameweeks import fetch_gameweeks, HISTORY_COLUMNS
+from project.fetch.odds import fetch_odds, season_odds_url
+from project.fetch.stub import start_stub_server
+from project.transform.individual import GAMEWEEKS_COLUMNS
+
+PLAYERS = 600
+GAMEWEEKS = 38
+LATENCY = 0.02
+
+
+def write_json(path, data):
+    """
+    :param path: str
+    :param data: dict
+    :return: None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as json_file:
+        json.dump(data, json_file)
+
+
+def write_stub_files(directory):
+    """
+    writes a synthetic season as the files the stub server serves
+    :param directory: str
+    :return: str
+    """
+    season, (gameweeks_df, game_odds, end_of_season_df) = next(iter(synthetic_seasons(PLAYERS, GAMEWEEKS, 1).items()))
+    team_ids = {name: team_id for team_id, name in enumerate(sorted(gameweeks_df["team"].unique()), start=1)}
+    gameweeks_df = gameweeks_df.assign(team=gameweeks_df["team"].map(team_ids))
+    write_json(os.path.join(directory, "api", "bootstrap-static"), {
+        "teams": [{"id": team_id, "name": name} for name, team_id in team_ids.items()],
+        "element_types": [{"id": 1, "singular_name_short": "GK"}, {"id": 2, "singular_name_short": "DEF"},
+                          {"id": 3, "singular_name_short": "MID"}, {"id": 4, "singular_name_short": "FWD"}],
+        "events": [{"id": gameweek, "is_next": False} for gameweek in range(1, GAMEWEEKS + 1)],
+        "elements": [{"id": int(player["id"]), "first_name": player["first_name"],
+                      "second_name": player["second_name"], "element_type": int(player["element_type"]),
+                      "team": int(gameweeks_df.loc[gameweeks_df["element"] == player["id"], "team"].iloc[0])}
+                     for _, player in end_of_season_df.iterrows()]
+    })
+    history_df = gameweeks_df.reindex(columns=HISTORY_COLUMNS, fill_value=0)
+    for element, history in history_df.groupby("element"):
+        write_json(os.path.join(directory, "api", "element-summary", str(element)),
+                   {"history": json.loads(history.to_json(orient="records"))})
+    odds_path = os.path.join(directory, season_odds_url(season, "").strip("/"))
+    os.makedirs(os.path.dirname(odds_path), exist_ok=True)
+    game_odds.to_csv(odds_path, index=False)
+    game_odds.assign(Div="E0").to_csv(os.path.join(directory, "fixtures.csv"), index=False)
+    return season
+
+
+def run_fetch(base_url, cache_path, output_path, season, workers):
+    """
+    fetches the gameweeks and odds from the stub server, returning the seconds taken and the clients stats
+    :param base_url: str
+    :param cache_path: str
+    :param output_path: str
+    :param season: str
+    :param workers: int
+    :return: float, CachedClient
+    """
+    client = CachedClient(cache_path=cache_path, workers=workers)
+    start = time.perf_counter()
+    fetch_gameweeks(client, os.path.join(output_path, "{}-gameweeks.csv".format(season)), base_url + "/api")
+    fetch_odds(client, [season], output_path, base_url)
+    return time.perf_counter() - start, client
+
+
+with tempfile.TemporaryDirectory() as temporary_path:
+    stub_path, cache_path, output_path = (os.path.join(temporary_path, name) for name in ["stub", "cache", "output"])
+    stub_season = write_stub_files(stub_path)
+    server, stub_url = start_stub_server(stub_path, latency=LATENCY)
+
+    runs = []
+    for name, workers, clear_cache in [("cold, 1 worker", 1, True), ("cold, 8 workers", 8, True),
+                                       ("unchanged, 8 workers", 8, False)]:
+        if clear_cache:
+            shutil.rmtree(cache_path, ignore_errors=True)
+        runs.append((name,) + run_fetch(stub_url, cache_path, output_path, stub_season, workers))
+
+    changed_path = os.path.join(stub_path, "api", "element-summary", "1")
+    with open(changed_path) as changed_file:
+        changed = json.load(changed_file)
+    changed["history"][-1]["total_points"] += 1
+    write_json(changed_path, changed)
+    runs.append(("one player changed, 8 workers",) + run_fetch(stub_url, cache_path, output_path, stub_season, 8))
+    server.shutdown()
+
+    gameweeks = pd.read_csv(os.path.join(output_path, "{}-gameweeks.csv".format(stub_season)))
+    missing_columns = sorted(set(GAMEWEEKS_COLUMNS) - set(gameweeks.columns))
+    print("Wrote {} gameweeks rows, missing columns: {}".format(len(gameweeks), missing_columns))
+    print("{:<32}{:>9}  {}".format("Fetch", "Seconds", "Transfers"))
+    for name, seconds, client in runs:
+        print("{:<32}{:>9.2f}  {}".format(name, seconds, client.summary()))
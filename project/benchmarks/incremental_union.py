@@ -0,0 +1,92 @@
+"""
+Check the incremental union against a full rebuild as the current season grows and is corrected: the union is rebuilt
+with the current season up to a gameweek, then the current season is merged week by week, including a merge back to
+an earlier gameweek, which reverts the position types and means that changed, and after every merge the store is
+compared with a full rebuild of the same clean gameweeks.
+A second merge with no change must update no rows, as the state is saved after every merge.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from project.models.season_store import SeasonStore
+from project.models.union_state import UnionState, stream_union
+
+# The gameweeks of the current season merged in turn, after a rebuild up to the first.
+GAMEWEEKS = [10, 20, 30, 20, 38, 38]
+
+parameters = json.load(open("../../project/parameters.json"))
+POSITION_THRESHOLDS = parameters["POSITION_THRESHOLDS"]
+POSITIONS_PER_SEASON = parameters["POSITIONS_PER_SEASON"]
+
+
+def rebuild(clean_store, output_store, frozen_seasons, current_season):
+    """
+    :param clean_store: SeasonStore
+    :param output_store: SeasonStore
+    :param frozen_seasons: list
+    :param current_season: str
+    :return: UnionState
+    """
+    aggregates, positions, against, frozen_rows = stream_union(clean_store, output_store, frozen_seasons,
+                                                               current_season, POSITION_THRESHOLDS,
+                                                               POSITIONS_PER_SEASON)
+    return UnionState.from_union("", frozen_seasons, aggregates, frozen_rows, positions, against,
+                                 POSITION_THRESHOLDS, POSITIONS_PER_SEASON)
+
+
+def differing_rows(store, other_store):
+    """
+    the number of rows of the stores with a different value, comparing the categories as strings
+    :param store: SeasonStore
+    :param other_store: SeasonStore
+    :return: int
+    """
+    dataframe, other = store.read(mmap=False), other_store.read(mmap=False)
+    if dataframe.shape != other.shape or list(dataframe.columns) != list(other.columns):
+        return max(len(dataframe), len(other))
+    differs = np.zeros(len(dataframe), dtype=bool)
+    for column in dataframe.columns:
+        values, other_values = dataframe[column], other[column]
+        if values.dtype.kind == "f":
+            differs |= ~np.isclose(values.to_numpy(), other_values.to_numpy(), equal_nan=True)
+        else:
+            values, other_values = values.astype(object), other_values.astype(object)
+            differs |= (values.ne(other_values) & ~(values.isna() & other_values.isna())).to_numpy()
+    return int(differs.sum())
+
+
+clean_gameweeks = SeasonStore("../../data/clean_gameweeks")
+current_season = clean_gameweeks.partitions()[-1]
+frozen_seasons = clean_gameweeks.partitions()[:-1]
+current_rows = clean_gameweeks.read_partition(current_season, mmap=False)
+
+with tempfile.TemporaryDirectory() as temporary_path:
+    clean_store = SeasonStore(os.path.join(temporary_path, "clean"))
+    for season in frozen_seasons:
+        shutil.copytree(os.path.join(clean_gameweeks.path, season), os.path.join(clean_store.path, season))
+    incremental_store = SeasonStore(os.path.join(temporary_path, "incremental"))
+    state_path = os.path.join(temporary_path, "union-state.pkl")
+
+    clean_store.write(current_rows[current_rows["round"] <= GAMEWEEKS[0]], current_season)
+    rebuild(clean_store, incremental_store, frozen_seasons, current_season).save(state_path)
+    print("{:<10}{:>14}{:>14}{:>14}{:>18}".format("Gameweek", "Merge (s)", "Rebuild (s)", "Rows updated",
+                                                  "Rows different"))
+    for gameweek in GAMEWEEKS[1:]:
+        current_seasons = current_rows[current_rows["round"] <= gameweek].reset_index(drop=True)
+        clean_store.write(current_seasons, current_season)
+
+        start = time.perf_counter()
+        updated = UnionState.load(state_path).merge(incremental_store, clean_store.read_partition(current_season),
+                                                    current_season, state_path)
+        merge_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rebuild_store = SeasonStore(os.path.join(temporary_path, "rebuild-{}".format(gameweek)))
+        rebuild(clean_store, rebuild_store, frozen_seasons, current_season)
+        rebuild_seconds = time.perf_counter() - start
+        print("{:<10}{:>14.2f}{:>14.2f}{:>14}{:>18}".format(gameweek, merge_seconds, rebuild_seconds, updated,
+                                                            differing_rows(incremental_store, rebuild_store)))
+        shutil.rmtree(rebuild_store.path)
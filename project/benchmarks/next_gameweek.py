@@ -0,0 +1,35 @@
+"""
+Write the files the prediction service needs for the next gameweek, the fixtures and the upcoming odds, from the last
+round of matches in the current seasons game odds, so the benchmarks can load the service without fetching them.
+"""
+import json
+import os
+import pandas as pd
+
+parameters = json.load(open("../../project/parameters.json"))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+GAME_ODDS_PATH = "../../data/game_odds/{}-game-odds.csv".format(CURRENT_SEASON)
+
+
+def write_next_gameweek(directory, game_odds_path=GAME_ODDS_PATH):
+    """
+    writes the last round of matches of the game odds, one match for every team, as the next fixtures and the upcoming
+    odds, with the kickoff times in utc as the FPL api gives them
+    :param directory: str
+    :param game_odds_path: str
+    :return: str, str
+    """
+    game_odds = pd.read_csv(game_odds_path, usecols=["Date", "Time", "HomeTeam", "AwayTeam", "B365H", "B365A"])
+    teams = pd.unique(game_odds[["HomeTeam", "AwayTeam"]].to_numpy().ravel())
+    matches = game_odds.tail(len(teams) // 2)
+    kickoff_times = pd.to_datetime(matches["Date"] + " " + matches["Time"], dayfirst=True)
+    fixtures = pd.DataFrame({"kickoff_time": kickoff_times.dt.tz_localize("Europe/London").dt.tz_convert("UTC")
+                             .dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                             "HomeTeam": matches["HomeTeam"], "AwayTeam": matches["AwayTeam"]})
+
+    os.makedirs(directory, exist_ok=True)
+    fixtures_path = os.path.join(directory, "{}-next-fixtures.csv".format(CURRENT_SEASON))
+    odds_path = os.path.join(directory, "upcoming-game-odds.csv")
+    fixtures.to_csv(fixtures_path, index=False)
+    matches[["HomeTeam", "AwayTeam", "B365H", "B365A"]].to_csv(odds_path, index=False)
+    return fixtures_path, odds_path
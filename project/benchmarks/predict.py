@@ -0,0 +1,43 @@
+"""
+Measure the latency of the prediction service: loading the model and predictors, predicting the whole gameweek, and
+looking up each players prediction, directly and over http.
+The next gameweek is the last round of matches of the current season, written by next_gameweek.py.
+"""
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import quote
+import numpy as np
+from project.benchmarks.next_gameweek import write_next_gameweek
+from project.predict import PredictionService, serve
+
+with tempfile.TemporaryDirectory() as next_gameweek_path:
+    fixtures_path, odds_path = write_next_gameweek(next_gameweek_path)
+    start = time.perf_counter()
+    service = PredictionService(fixtures_path=fixtures_path, odds_path=odds_path)
+print("Load: {:.1f}ms for {} players".format((time.perf_counter() - start) * 1000, len(service.predictors)))
+
+start = time.perf_counter()
+service.predict_gameweek()
+print("Whole gameweek: {:.1f}ms".format((time.perf_counter() - start) * 1000))
+
+players = list(service.rows_by_player.keys())
+latencies = []
+for player in players:
+    start = time.perf_counter()
+    service.predict_player(player)
+    latencies.append(time.perf_counter() - start)
+print("Player lookup: median {:.3f}ms, 99th percentile {:.3f}ms".format(np.median(latencies) * 1000,
+                                                                         np.percentile(latencies, 99) * 1000))
+
+PORT = 8765
+threading.Thread(target=serve, args=(service, PORT), daemon=True).start()
+time.sleep(0.5)
+latencies = []
+for player in players:
+    start = time.perf_counter()
+    urllib.request.urlopen("http://127.0.0.1:{}/players/{}".format(PORT, quote(player))).read()
+    latencies.append(time.perf_counter() - start)
+print("Player over http: median {:.3f}ms, 99th percentile {:.3f}ms".format(np.median(latencies) * 1000,
+                                                                            np.percentile(latencies, 99) * 1000))
@@ -0,0 +1,63 @@
+"""
+Compare the parse time and memory of reading every column of each seasons raw data with reading only the columns the
+transformations declare, parsed as their declared types, and of loading the clean gameweeks for the union with and
+without its declared columns.
+"""
+import os
+import time
+import pandas as pd
+from project.models.all_seasons import ALL_SEASONS_COLUMNS
+from project.models.season_store import SeasonStore
+from project.transform.individual import LOADERS, read_gameweeks, read_game_odds, read_end_of_season
+
+REPEAT = 5
+
+
+def measure(read):
+    """
+    the fastest of the repeated reads, with the memory of the dataframe read
+    :param read: function
+    :return: float, float, int
+    """
+    seconds = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        dataframe = read()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), dataframe.memory_usage(deep=True).sum() / 1024 ** 2, dataframe.shape[1]
+
+
+def print_row(name, full, projected):
+    """
+    :param name: str
+    :param full: tuple
+    :param projected: tuple
+    :return: None
+    """
+    print("{:<26}{:>6} -> {:<4}{:>9.3f} -> {:<9.3f}{:>8.1f} -> {:<8.1f}{:>6.0%}{:>8.0%}".format(
+        name, full[2], projected[2], full[0], projected[0], full[1], projected[1],
+        1 - projected[0] / full[0], 1 - projected[1] / full[1]))
+
+
+print("{:<26}{:>14}{:>22}{:>20}{:>6}{:>8}".format("Data", "Columns", "Seconds", "Memory (MB)", "Time", "Memory"))
+for season in LOADERS:
+    gameweeks_path = "../../data/gameweeks/{}-gameweeks.csv".format(season)
+    encoding = "latin-1" if season in {"2016-17", "2017-18", "2018-19"} else "utf-8"
+    if os.path.exists(gameweeks_path):
+        print_row("{} gameweeks".format(season), measure(lambda: pd.read_csv(gameweeks_path, encoding=encoding)),
+                  measure(lambda: read_gameweeks(season, encoding=encoding)))
+
+    odds_path = "../../data/game_odds/{}-game-odds.csv".format(season)
+    if os.path.exists(odds_path):
+        print_row("{} game odds".format(season), measure(lambda: pd.read_csv(odds_path)),
+                  measure(lambda: read_game_odds(season)))
+
+    end_of_season_path = "../../data/end_of_season/{}-end-of-season.csv".format(season)
+    if os.path.exists(end_of_season_path):
+        print_row("{} end of season".format(season), measure(lambda: pd.read_csv(end_of_season_path)),
+                  measure(lambda: read_end_of_season(season)))
+
+clean_gameweeks = SeasonStore("../../data/clean_gameweeks")
+if clean_gameweeks.partitions():
+    print_row("union clean gameweeks", measure(lambda: clean_gameweeks.read(mmap=False)),
+              measure(lambda: clean_gameweeks.read(columns=ALL_SEASONS_COLUMNS, mmap=False)))
@@ -0,0 +1,79 @@
+"""
+Check the model refresh against a full refit: fit the sgd candidate on every labelled row except the last weeks of the
+latest season, then week by week refresh that bundle with the week's rows, refit a bundle on every row so far, and
+score both on the following week's rows.
+A week is the rows of the latest season whose next match is in that gameweek.
+"""
+import time
+import warnings
+import numpy as np
+from sklearn.metrics import balanced_accuracy_score
+from project.gridsearch import fit_model
+from project.models.season_store import SeasonStore
+from project.models.training import Training, row_hashes, season_row_hashes
+from project.refresh import LABEL
+
+WEEKS = 5
+CANDIDATE = {"estimator": "sgd", "params": {"loss": "modified_huber", "alpha": 0.0001}}
+
+
+def training_rows(dataframe):
+    """
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: Training
+    """
+    dataframe = dataframe.apply(lambda column: column.cat.remove_unused_categories()
+                                if column.dtype == "category" else column)
+    training = Training(dataframe)
+    training.dummify_categories(sparse_output=True)
+    return training
+
+
+def refit(dataframe):
+    """
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: ModelBundle, float
+    """
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        bundle = fit_model(training_rows(dataframe.copy()), CANDIDATE)
+    return bundle, time.perf_counter() - start
+
+
+def score(bundle, dataframe):
+    """
+    :param bundle: ModelBundle
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: float
+    """
+    predictions = bundle.estimator.predict(bundle.encode(dataframe.drop(columns=LABEL)))
+    return balanced_accuracy_score(dataframe[LABEL].astype(str), predictions.astype(str))
+
+
+all_seasons = SeasonStore("../../data/all_seasons").read(mmap=False)
+all_seasons = all_seasons[all_seasons["shift_opponent"].notna()].reset_index(drop=True)
+latest_season = all_seasons["season"].astype(str).max()
+next_rounds = np.where(all_seasons["season"].astype(str) == latest_season, all_seasons["shift_round"], np.nan)
+weeks = [np.flatnonzero(next_rounds == gameweek) for gameweek in np.unique(next_rounds[~np.isnan(next_rounds)])]
+weeks = weeks[-WEEKS - 1:]
+trained = np.setdiff1d(np.arange(len(all_seasons)), np.concatenate(weeks))
+
+refreshed, _ = refit(all_seasons.iloc[trained])
+print("{:<6}{:>8}{:>14}{:>14}{:>12}{:>12}{:>10}".format("Week", "Rows", "Refresh (s)", "Refit (s)", "Refreshed",
+                                                           "Refitted", "Features"))
+for week, (week_rows, next_rows) in enumerate(zip(weeks[:-1], weeks[1:]), start=1):
+    new_rows = all_seasons.iloc[week_rows]
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        refresh = refreshed.refresh(new_rows.drop(columns=LABEL), new_rows[LABEL],
+                                    season_row_hashes(row_hashes(new_rows), new_rows["season"].astype(str).to_numpy()))
+    refresh_seconds = time.perf_counter() - start
+
+    trained = np.r_[trained, week_rows]
+    refitted, refit_seconds = refit(all_seasons.iloc[np.sort(trained)])
+    next_week = all_seasons.iloc[next_rows]
+    print("{:<6}{:>8}{:>14.3f}{:>14.3f}{:>12.4f}{:>12.4f}{:>10}".format(
+        week, len(week_rows), refresh_seconds, refit_seconds, score(refreshed, next_week),
+        score(refitted, next_week), "+{}".format(refresh["new_features"])))
@@ -0,0 +1,60 @@
+"""
+Compare the previous row by row rolling mean loop with the sorted single pass in Gameweeks.rolling_mean_metrics on the
+current seasons gameweeks data, and how much the means change now that they are of the latest matches before each row
+rather than the players first matches of the season.
+"""
+import json
+import time
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from project.transform.individual import load_gameweeks
+from project.models.gameweeks import Gameweeks, ROLLING_METRICS
+
+WINDOW = 3
+
+
+def rolling_mean_metrics_loop(dataframe, window=WINDOW):
+    """
+    the previous implementation of the rolling means, which masks the whole gameweeks data for every row and means
+    the first matches in the window of the masked matches, i.e. the players first matches of the season
+    :param dataframe: pandas.core.frame.DataFrame
+    :param window: int
+    :return: pandas.core.frame.DataFrame
+    """
+    means = {mean_column: [] for mean_column in ROLLING_METRICS.values()}
+    zipped_names = zip(dataframe["name"], dataframe["date_of_match"])
+    for player, date in tqdm(list(zipped_names)):
+        players_df = dataframe[(dataframe["name"] == player) & (dataframe["date_of_match"] < date)][:window]
+        for metric, mean_column in ROLLING_METRICS.items():
+            means[mean_column].append(players_df[metric].mean())
+    means = pd.DataFrame(means, index=dataframe.index)
+    for metric, mean_column in ROLLING_METRICS.items():
+        means[mean_column] = means[mean_column].fillna(dataframe[metric])
+    return means
+
+
+parameters = json.load(open("../../project/parameters.json"))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+
+gameweeks = Gameweeks(load_gameweeks(CURRENT_SEASON))
+gameweeks.add_times_of_match()
+
+start = time.perf_counter()
+loop_means = rolling_mean_metrics_loop(gameweeks.gameweeks)
+loop_time = time.perf_counter() - start
+
+start = time.perf_counter()
+gameweeks.rolling_mean_metrics(window=WINDOW)
+vectorised_time = time.perf_counter() - start
+
+print("Rows: {}".format(len(gameweeks.gameweeks)))
+print("Loop: {:.3f}s".format(loop_time))
+print("Single pass: {:.3f}s".format(vectorised_time))
+print("Speed up: {:.0f}x".format(loop_time / vectorised_time))
+print("{:<20}{:>15}{:>20}{:>20}".format("Column", "Rows changed", "Mean abs change", "Max abs change"))
+for mean_column in ROLLING_METRICS.values():
+    differences = np.abs(loop_means[mean_column].to_numpy(dtype=float)
+                         - gameweeks.gameweeks[mean_column].to_numpy(dtype=float))
+    print("{:<20}{:>14.1%}{:>20.4f}{:>20.4f}".format(mean_column, np.mean(differences > 1e-9), np.mean(differences),
+                                                       np.max(differences)))
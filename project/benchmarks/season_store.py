@@ -0,0 +1,60 @@
+"""
+Compare the load time and peak memory of the clean gameweeks read from the season store with the same data read from
+csv files, each measured in a fresh process.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from project.models.season_store import SeasonStore
+
+CLEAN_GAMEWEEKS_PATH = os.path.abspath("../../data/clean_gameweeks")
+PROJECTED_COLUMNS = ["name", "opponent_team", "shift_opponent", "date_of_match", "total_points", "creativity",
+                     "threat", "influence", "bps", "goals_scored", "assists", "goals_conceded"]
+
+LOAD_TEMPLATE = """
+import glob, json, resource, sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+from project.models.season_store import SeasonStore
+start = time.perf_counter()
+{load}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  "rows": len(dataframe), "columns": dataframe.shape[1],
+                  "memory_mb": dataframe.memory_usage(deep=True).sum() / 1024 ** 2}}))
+"""
+
+LOADS = {
+    "csv": "dataframe = pd.concat(map(lambda x: pd.read_csv(x, low_memory=False), "
+           "sorted(glob.glob({csv_path!r} + '/*.csv'))))",
+    "baseline (imports only)": "dataframe = pd.DataFrame()",
+    "store": "dataframe = SeasonStore({store_path!r}).read()",
+    "store, no mmap": "dataframe = SeasonStore({store_path!r}).read(mmap=False)",
+    "store, projected columns": "dataframe = SeasonStore({store_path!r}).read(columns={columns!r})"
+}
+
+
+def measure(load, **paths):
+    """
+    runs the load in a fresh python process and returns its timings and peak memory
+    :param load: str
+    :return: dict
+    """
+    code = LOAD_TEMPLATE.format(root=os.path.abspath("../.."), load=load.format(**paths))
+    return json.loads(subprocess.run([sys.executable, "-c", code], capture_output=True, check=True,
+                                     text=True).stdout)
+
+
+store = SeasonStore(CLEAN_GAMEWEEKS_PATH)
+with tempfile.TemporaryDirectory() as csv_path:
+    for season in store.partitions():
+        store.read_partition(season).to_csv(os.path.join(csv_path, "{}-clean-gameweeks.csv".format(season)),
+                                            index=False)
+
+    print("{:<26}{:>10}{:>16}{:>14}{:>10}".format("Load", "Seconds", "Peak RSS (MB)", "Frame (MB)", "Columns"))
+    for name, load in LOADS.items():
+        result = measure(load, csv_path=csv_path, store_path=CLEAN_GAMEWEEKS_PATH, columns=PROJECTED_COLUMNS)
+        print("{:<26}{:>10.3f}{:>16.1f}{:>14.1f}{:>10}".format(name, result["seconds"], result["peak_rss_mb"],
+                                                                result["memory_mb"], result["columns"]))
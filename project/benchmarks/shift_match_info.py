@@ -0,0 +1,71 @@
+"""
+Compare the per player shift loop with the grouped shift in Gameweeks.shift_match_info on the current seasons gameweeks
+data, and check both give the same next match info.
+"""
+import json
+import time
+import pandas as pd
+from tqdm import tqdm
+from project.transform.individual import load_gameweeks
+from project.models.gameweeks import Gameweeks, SHIFT_COLUMNS
+from project.models.identity import IdentityIndex
+
+
+def shift_match_info_loop(dataframe):
+    """
+    the previous implementation of the shift, which filters and sorts the gameweeks data for every player and concats
+    each shifted column separately
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: pandas.core.frame.DataFrame
+    """
+    shifted = {shift_column: [] for shift_column in SHIFT_COLUMNS.values()}
+    for player in tqdm(list(dataframe["name"].unique())):
+        players_df = dataframe[dataframe["name"] == player].sort_values(by="date_of_match", ascending=False)
+        for column, shift_column in SHIFT_COLUMNS.items():
+            shifted[shift_column].append(players_df[column].shift())
+    return pd.DataFrame({shift_column: pd.concat(series).sort_index() for shift_column, series in shifted.items()})
+
+
+parameters = json.load(open("../../project/parameters.json"))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+
+gameweeks = Gameweeks(load_gameweeks(CURRENT_SEASON))
+game_odds = pd.read_csv("../../data/game_odds/{}-game-odds.csv".format(CURRENT_SEASON))
+identity = IdentityIndex.load("../../data/identity")
+gameweeks.add_value_delta()
+gameweeks.map_opponent_team(identity, CURRENT_SEASON)
+gameweeks.add_teams()
+gameweeks.add_times_of_match()
+gameweeks.join_odds(game_odds, identity)
+gameweeks.add_win_expectation()
+gameweeks.add_total_points_range()
+gameweeks.rolling_mean_metrics()
+
+start = time.perf_counter()
+loop_shifted = shift_match_info_loop(gameweeks.gameweeks)
+loop_time = time.perf_counter() - start
+
+start = time.perf_counter()
+gameweeks.shift_match_info()
+grouped_time = time.perf_counter() - start
+
+# The order of a players matches on the same date, i.e. two players sharing a name or a duplicated row, is not defined
+# in the loop, so rows on those dates, or whose next match is on one, are left out of the check.
+matches = gameweeks.gameweeks[["name", "date_of_match", "kickoff_time"]]
+shared_dates = matches.duplicated(subset=["name", "date_of_match"], keep=False)
+shared_keys = set(zip(matches.loc[shared_dates, "name"], matches.loc[shared_dates, "date_of_match"]))
+next_dates = matches.sort_values(by="kickoff_time", kind="mergesort").groupby("name")["date_of_match"].shift(-1)
+next_on_shared_date = pd.Series([key in shared_keys for key in zip(matches["name"], next_dates.loc[matches.index])],
+                                index=matches.index)
+undefined_order = shared_dates | next_on_shared_date
+shift_columns = list(SHIFT_COLUMNS.values())
+loop_shifted = loop_shifted[~undefined_order].astype(object)
+grouped_shifted = gameweeks.gameweeks.loc[~undefined_order, shift_columns].astype(object)
+mismatches = ~((loop_shifted == grouped_shifted) | (loop_shifted.isnull() & grouped_shifted.isnull()))
+
+print("Rows: {}".format(len(gameweeks.gameweeks)))
+print("Loop: {:.3f}s".format(loop_time))
+print("Grouped shift: {:.3f}s".format(grouped_time))
+print("Speed up: {:.0f}x".format(loop_time / grouped_time))
+print("Mismatched rows: {} (excluding {} rows with an undefined next match)".format(
+    mismatches.any(axis=1).sum(), undefined_order.sum()))
@@ -0,0 +1,65 @@
+"""
+Compare the time and peak memory of preparing the training data with dense dummies and with sparse dummies, check both
+give the same train and test sets, and fit a sparse capable estimator on each.
+"""
+import time
+import tracemalloc
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from project.models.training import Training
+from project.models.season_store import SeasonStore
+
+
+def prepare(dataframe, sparse_output):
+    """
+    dummifies and splits the training data, measuring the time taken and the peak memory allocated
+    :param dataframe: pandas.core.frame.DataFrame
+    :param sparse_output: bool
+    :return: tuple, float, float
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    training = Training(dataframe.copy())
+    training.dummify_categories(sparse_output=sparse_output)
+    prepared = training.split_into_train_and_test()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return prepared, seconds, peak / 1024 ** 2
+
+
+def matrix_mb(matrix):
+    """
+    :param matrix: np.array or scipy.sparse.csr_matrix
+    :return: float
+    """
+    if isinstance(matrix, np.ndarray):
+        return matrix.nbytes / 1024 ** 2
+    return (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1024 ** 2
+
+
+all_seasons = SeasonStore("../../data/all_seasons").read()
+training_data = all_seasons[all_seasons["shift_opponent"].notna()]
+training_data = training_data.apply(lambda column: column.cat.remove_unused_categories()
+                                    if column.dtype == "category" else column)
+
+results = {"dense": prepare(training_data, sparse_output=False), "sparse": prepare(training_data, sparse_output=True)}
+(dense_train, dense_test, *_), _, _ = results["dense"]
+(sparse_train, sparse_test, *_), _, _ = results["sparse"]
+print("Train set {} rows by {} columns".format(*dense_train.shape))
+print("Same train set: {}, same test set: {}".format(
+    np.array_equal(dense_train.astype(float), sparse_train.toarray(), equal_nan=True),
+    np.array_equal(dense_test.astype(float), sparse_test.toarray(), equal_nan=True)))
+
+print("{:<8}{:>10}{:>16}{:>16}{:>14}".format("Dummies", "Seconds", "Peak alloc (MB)", "Train set (MB)", "Fit seconds"))
+for name, ((x_train, x_test, y_train, y_test, transformer), seconds, peak_mb) in results.items():
+    # The scaled numerical columns can be missing, which the estimator does not accept.
+    if isinstance(x_train, np.ndarray):
+        x_fit = np.nan_to_num(x_train.astype(float))
+    else:
+        x_fit = x_train.copy()
+        x_fit.data = np.nan_to_num(x_fit.data)
+    start = time.perf_counter()
+    SGDClassifier(random_state=1).fit(x_fit, y_train)
+    fit_seconds = time.perf_counter() - start
+    print("{:<8}{:>10.2f}{:>16.1f}{:>16.1f}{:>14.2f}".format(name, seconds, peak_mb, matrix_mb(x_train), fit_seconds))
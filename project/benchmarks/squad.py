@@ -0,0 +1,36 @@
+"""
+Measure the squad optimizer on the current predictions: solving the best squad, with and without limits on the
+position types, and scoring every one and two transfer scenario of that squad in batches.
+The next gameweek is the last round of matches of the current season, written by next_gameweek.py.
+"""
+import tempfile
+import time
+from project.benchmarks.next_gameweek import write_next_gameweek
+from project.models.squad import select_squad, best_transfers, transfer_scenarios
+from project.optimize import load_players
+from project.predict import PredictionService
+
+REPEAT = 3
+
+with tempfile.TemporaryDirectory() as next_gameweek_path:
+    fixtures_path, odds_path = write_next_gameweek(next_gameweek_path)
+    players = load_players(PredictionService(fixtures_path=fixtures_path, odds_path=odds_path))
+print("{} players".format(len(players)))
+
+for name, position_limits in [("squad", {}), ("squad, AttDEF 0-2 and DefMID 2-5", {"AttDEF": (0, 2),
+                                                                                   "DefMID": (2, 5)})]:
+    seconds = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        squad = select_squad(players, position_limits=position_limits)
+        seconds.append(time.perf_counter() - start)
+    print("{:<40}{:>9.3f}s  score {:.2f}, cost {}".format(name, min(seconds), squad.score, squad.cost))
+
+squad = select_squad(players)
+for transfers, candidates in [(1, None), (2, 40)]:
+    scenarios = len(transfer_scenarios(players, squad.rows, transfers, candidates)[0])
+    start = time.perf_counter()
+    best = best_transfers(players, squad.rows, transfers=transfers, candidates=candidates, jobs=-1)
+    seconds = time.perf_counter() - start
+    print("{:<40}{:>9.3f}s  {} scenarios, {:.0f} per second, best gain {:.2f}".format(
+        "{} transfers".format(transfers), seconds, scenarios, scenarios / seconds, best[0]["gain"] if best else 0))
@@ -0,0 +1,242 @@
+"""
+Benchmark every public method of Gameweeks, EndOfSeason, AllSeasons and Training on synthetic data of increasing size,
+recording the time and peak memory of each method, writing a json report and flagging regressions against a baseline.
+Each size runs the whole pipeline as the transform scripts do, where the time of a method is the fastest of the repeats
+and its peak memory is measured with tracemalloc in a separate run, as tracing slows the methods down.
+
+Usage, from the benchmarks directory:
+    python suite.py [--sizes small medium] [--repeat 3] [--save-baseline]
+The run exits with an error if any method regressed, so it can be run as a check.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import sklearn
+from project.benchmarks.synthetic import synthetic_seasons
+from project.models.all_seasons import AllSeasons, AGAINST_OPPONENT_METRICS
+from project.models.end_of_season import EndOfSeason
+from project.models.gameweeks import Gameweeks
+from project.models.identity import IdentityIndex, fpl_teams
+from project.models.season_store import SeasonStore
+from project.models.training import Training
+
+# The number of players, gameweeks and seasons of each size.
+SIZES = {
+    "small": {"players": 200, "gameweeks": 10, "seasons": 1},
+    "medium": {"players": 600, "gameweeks": 38, "seasons": 2},
+    "large": {"players": 800, "gameweeks": 38, "seasons": 6}
+}
+# Changes smaller than these are noise rather than regressions, however large relative to the baseline.
+MIN_SECONDS = 0.01
+MIN_PEAK_MB = 1.0
+
+
+def run_pipeline(seasons, trace_memory):
+    """
+    runs every transformation on the seasons raw data, measuring each public method, where the measurements of a
+    method run once per season are the total time and the largest peak
+    a method that raises is recorded with its error and the pipeline carries on without it
+    :param seasons: dict
+    :param trace_memory: bool
+    :return: dict
+    """
+    results = {}
+
+    def measure(name, method, *args, **kwargs):
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            method(*args, **kwargs)
+        except Exception as error:
+            results[name] = {"error": "{}: {}".format(type(error).__name__, error)}
+            return
+        finally:
+            seconds = time.perf_counter() - start
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if trace_memory else None
+            tracemalloc.stop()
+        result = results.setdefault(name, {"seconds": 0.0, "peak_mb": None})
+        if "error" not in result:
+            result["seconds"] += seconds
+            if trace_memory:
+                result["peak_mb"] = max(result["peak_mb"] or 0.0, peak_mb)
+
+    with tempfile.TemporaryDirectory() as store_path:
+        store = SeasonStore(store_path)
+        identity = IdentityIndex()
+        for season, (gameweeks_df, game_odds, end_of_season_df) in seasons.items():
+            season_players = end_of_season_df.rename(columns={"id": "element"})
+            season_players["name"] = season_players["first_name"] + "_" + season_players["second_name"]
+            measure("IdentityIndex.add_season", identity.add_season, season, season_players)
+            measure("IdentityIndex.add_teams", identity.add_teams, season, fpl_teams(gameweeks_df, game_odds))
+
+            end_of_season = EndOfSeason(end_of_season_df.copy())
+            measure("EndOfSeason.align_player_names", end_of_season.align_player_names)
+            measure("EndOfSeason.map_position", end_of_season.map_position)
+
+            gameweeks = Gameweeks(gameweeks_df.copy())
+            measure("Gameweeks.add_season", gameweeks.add_season, season)
+            measure("Gameweeks.align_player_names", gameweeks.align_player_names)
+            measure("Gameweeks.join_position", gameweeks.join_position, end_of_season)
+            measure("Gameweeks.add_player_ids", gameweeks.add_player_ids, identity, season)
+            measure("Gameweeks.add_value_delta", gameweeks.add_value_delta)
+            measure("Gameweeks.map_opponent_team", gameweeks.map_opponent_team, identity, season)
+            measure("Gameweeks.add_fixtures", gameweeks.add_fixtures)
+            measure("Gameweeks.add_teams", gameweeks.add_teams)
+            measure("Gameweeks.add_times_of_match", gameweeks.add_times_of_match)
+            measure("Gameweeks.join_odds", gameweeks.join_odds, game_odds, identity)
+            measure("Gameweeks.add_win_expectation", gameweeks.add_win_expectation)
+            measure("Gameweeks.add_won", gameweeks.add_won)
+            measure("Gameweeks.add_total_points_range", gameweeks.add_total_points_range)
+            measure("Gameweeks.rolling_mean_metrics", gameweeks.rolling_mean_metrics)
+            measure("Gameweeks.shift_match_info", gameweeks.shift_match_info)
+            measure("Gameweeks.take_useful_columns", gameweeks.take_useful_columns)
+            store.write(gameweeks.gameweeks, season)
+
+        all_seasons = AllSeasons(store.read(mmap=False))
+        as_of_seasons = AllSeasons(all_seasons.all_seasons.copy())
+        measure("AllSeasons.map_position_types", all_seasons.map_position_types)
+        measure("AllSeasons.form_against_shift_opponent", all_seasons.form_against_shift_opponent)
+        measure("AllSeasons.form_against_shift_opponent(as_of=True)", as_of_seasons.form_against_shift_opponent,
+                as_of=True)
+        measure("AllSeasons.means_against_opponent_as_of", as_of_seasons.means_against_opponent_as_of,
+                list(AGAINST_OPPONENT_METRICS.keys()))
+        measure("AllSeasons.only_take_minutes_played", all_seasons.only_take_minutes_played)
+        measure("AllSeasons.take_useful_columns", all_seasons.take_useful_columns)
+
+    training_data = all_seasons.all_seasons[all_seasons.all_seasons["shift_opponent"].notna()]
+    training_data = training_data.apply(lambda column: column.cat.remove_unused_categories()
+                                        if column.dtype == "category" else column)
+    for label, sparse_output in [("", False), ("(sparse_output=True)", True)]:
+        training = Training(training_data.copy())
+        measure("Training.dummify_categories" + label, training.dummify_categories, sparse_output=sparse_output)
+        measure("Training.split_into_train_and_test" + label, training.split_into_train_and_test)
+    return results
+
+
+def benchmark_size(size, repeat, seed):
+    """
+    benchmarks the pipeline on synthetic data of the size, taking the fastest time of the repeats for each method
+    :param size: dict
+    :param repeat: int
+    :param seed: int
+    :return: dict, int
+    """
+    seasons = synthetic_seasons(size["players"], size["gameweeks"], size["seasons"], seed=seed)
+    runs = [run_pipeline(seasons, trace_memory=False) for _ in range(repeat)]
+    memory = run_pipeline(seasons, trace_memory=True)
+    results = {}
+    for name, traced in memory.items():
+        timings = [run[name] for run in runs if name in run]
+        if "error" in traced or any("error" in timing for timing in timings):
+            results[name] = {"error": traced.get("error") or next(timing["error"] for timing in timings
+                                                                 if "error" in timing)}
+        else:
+            results[name] = {"seconds": min(timing["seconds"] for timing in timings), "peak_mb": traced["peak_mb"]}
+    rows = sum(len(gameweeks_df) for gameweeks_df, _, _ in seasons.values())
+    return results, rows
+
+
+def find_regressions(report, baseline, tolerance):
+    """
+    the methods slower, or with a larger peak memory, than the baseline by more than the tolerance, along with the
+    methods that raise where they did not in the baseline
+    :param report: dict
+    :param baseline: dict
+    :param tolerance: float
+    :return: list
+    """
+    regressions = []
+    for size, results in report["results"].items():
+        baseline_results = baseline["results"].get(size, {})
+        for name, result in results.items():
+            baseline_result = baseline_results.get(name)
+            if baseline_result is None or "error" in baseline_result:
+                continue
+            if "error" in result:
+                regressions.append({"size": size, "method": name, "measure": "error", "value": result["error"]})
+                continue
+            for measure, noise in [("seconds", MIN_SECONDS), ("peak_mb", MIN_PEAK_MB)]:
+                value, baseline_value = result[measure], baseline_result[measure]
+                if value > baseline_value * (1 + tolerance) and value - baseline_value > noise:
+                    regressions.append({"size": size, "method": name, "measure": measure, "value": value,
+                                        "baseline": baseline_value, "change": value / baseline_value - 1})
+    return regressions
+
+
+def print_results(size, results, baseline_results):
+    """
+    prints a table of the methods measurements, with the change in time from the baseline
+    :param size: str
+    :param results: dict
+    :param baseline_results: dict
+    :return: None
+    """
+    print("{:<55}{:>10}{:>12}{:>12}".format("{} method".format(size.capitalize()), "Seconds", "Peak (MB)",
+                                           "vs baseline"))
+    for name, result in results.items():
+        if "error" in result:
+            print("{:<55}{}".format(name, result["error"]))
+            continue
+        baseline_result = baseline_results.get(name, {})
+        change = ("{:+.0%}".format(result["seconds"] / baseline_result["seconds"] - 1)
+                  if baseline_result.get("seconds") else "")
+        print("{:<55}{:>10.3f}{:>12.1f}{:>12}".format(name, result["seconds"], result["peak_mb"], change))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the transformations on synthetic data.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"],
+                        help="the sizes of synthetic data to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="the number of timed runs of each size")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the synthetic data")
+    parser.add_argument("--report", default="../../data/benchmarks/report.json", help="the path of the report")
+    parser.add_argument("--baseline", default="../../data/benchmarks/baseline.json",
+                        help="the path of the baseline report")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="the relative increase in time or peak memory flagged as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="save the report as the baseline")
+    arguments = parser.parse_args()
+
+    baseline = None
+    if os.path.exists(arguments.baseline):
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    report = {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+              "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                              "numpy": np.__version__, "pandas": pd.__version__, "scikit-learn": sklearn.__version__},
+              "repeat": arguments.repeat, "seed": arguments.seed, "sizes": {}, "results": {}}
+    for size in arguments.sizes:
+        results, rows = benchmark_size(SIZES[size], arguments.repeat, arguments.seed)
+        report["sizes"][size] = dict(SIZES[size], rows=rows)
+        report["results"][size] = results
+        print_results(size, results, baseline["results"].get(size, {}) if baseline else {})
+        print()
+
+    regressions = find_regressions(report, baseline, arguments.tolerance) if baseline else []
+    report["regressions"] = regressions
+    for path in [arguments.report] + ([arguments.baseline] if arguments.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    print("Report written to {}".format(arguments.report))
+
+    if baseline is None and not arguments.save_baseline:
+        print("No baseline at {}, run with --save-baseline to store one".format(arguments.baseline))
+    for regression in regressions:
+        if regression["measure"] == "error":
+            print("REGRESSION {size} {method} now raises {value}".format(**regression))
+        else:
+            print("REGRESSION {size} {method} {measure} {value:.3f} against {baseline:.3f} ({change:+.0%})".format(
+                **regression))
+    if regressions:
+        sys.exit(1)
@@ -0,0 +1,138 @@
+"""
+Generate synthetic raw data in the schema of the gameweeks, game odds and end of season csv files, scaled by the number
+of players, gameweeks and seasons, so the transformations can be benchmarked at sizes beyond the real data.
+The players names are in the older seasons format, e.g. first1_last1_1, which aligns with the end of season data.
+"""
+import numpy as np
+import pandas as pd
+
+TEAMS = 20
+KICKOFF_SLOTS = [(0, "12:30"), (0, "15:00"), (0, "15:00"), (0, "17:30"), (1, "14:00"), (1, "16:30")]
+
+
+def round_robin(teams):
+    """
+    the rounds of a double round robin by the circle method, as lists of (home, away) pairs of team indexes, where
+    every team plays every other team once at home and once away
+    :param teams: int
+    :return: list
+    """
+    rotation = list(range(teams))
+    rounds = []
+    for _ in range(teams - 1):
+        rounds.append([(rotation[i], rotation[teams - 1 - i]) for i in range(teams // 2)])
+        rotation = [rotation[0], rotation[-1]] + rotation[1:-1]
+    return rounds + [[(away, home) for home, away in pairs] for pairs in rounds]
+
+
+def season_name(year):
+    """
+    the name of the season starting in the year, e.g. 2016-17
+    :param year: int
+    :return: str
+    """
+    return "{}-{:02d}".format(year, (year + 1) % 100)
+
+
+def synthetic_season(year, element_types, gameweeks, rng, teams=TEAMS):
+    """
+    the raw gameweeks, game odds and end of season data of a season, where every player plays every gameweek for a
+    team drawn for the season
+    :param year: int
+    :param element_types: np.array
+    :param gameweeks: int
+    :param rng: numpy.random.Generator
+    :param teams: int
+    :return: pandas.core.frame.DataFrame, pandas.core.frame.DataFrame, pandas.core.frame.DataFrame
+    """
+    players = len(element_types)
+    rounds = round_robin(teams)
+    if gameweeks > len(rounds):
+        raise ValueError("A season of {} teams has at most {} gameweeks".format(teams, len(rounds)))
+    team_names = ["Team {:02d}".format(team + 1) for team in range(teams)]
+    season_start = pd.Timestamp(year=year, month=8, day=8)
+
+    # The fixture, opponent, venue and kickoff of every team in every gameweek.
+    fixture = np.zeros((gameweeks, teams), dtype=int)
+    opponent = np.zeros((gameweeks, teams), dtype=int)
+    was_home = np.zeros((gameweeks, teams), dtype=bool)
+    kickoff = np.empty((gameweeks, teams), dtype=object)
+    odds = []
+    for gameweek, pairs in enumerate(rounds[:gameweeks]):
+        for match, (home, away) in enumerate(pairs):
+            day, time = KICKOFF_SLOTS[rng.integers(len(KICKOFF_SLOTS))]
+            kickoff_time = season_start + pd.Timedelta(days=7 * gameweek + day)
+            fixture[gameweek, [home, away]] = gameweek * len(pairs) + match + 1
+            opponent[gameweek, [home, away]] = [away + 1, home + 1]
+            was_home[gameweek, [home, away]] = [True, False]
+            kickoff[gameweek, [home, away]] = "{}T{}:00Z".format(kickoff_time.strftime("%Y-%m-%d"), time)
+            odds.append({"Div": "E0", "Date": kickoff_time.strftime("%d/%m/%Y"), "Time": time,
+                         "HomeTeam": team_names[home], "AwayTeam": team_names[away],
+                         "FTR": rng.choice(["H", "D", "A"], p=[0.45, 0.25, 0.3]),
+                         "B365H": round(rng.uniform(1.2, 9), 2), "B365A": round(rng.uniform(1.2, 9), 2)})
+
+    plays_for = rng.permutation(np.arange(players) % teams)
+    player = np.tile(np.arange(players), gameweeks)
+    gameweek = np.repeat(np.arange(gameweeks), players)
+    team = plays_for[player]
+    rows = len(player)
+
+    minutes = np.where(rng.random(rows) < 0.35, 0, rng.integers(1, 91, rows))
+    played = minutes > 0
+    goals_conceded = np.where(played, rng.poisson(1.2, rows), 0)
+    goals_scored = np.where(played, rng.poisson(0.12, rows), 0)
+    assists = np.where(played, rng.poisson(0.1, rows), 0)
+    clean_sheets = (played & (minutes >= 60) & (goals_conceded == 0)).astype(int)
+    value = rng.integers(40, 130, players)[player] + np.cumsum(
+        rng.choice([-1, 0, 0, 0, 1], rows).reshape(gameweeks, players), axis=0).ravel()
+    gameweeks_df = pd.DataFrame({
+        "name": ["first{0}_last{0}_{0}".format(index) for index in player],
+        "element": player + 1,
+        "team": np.array(team_names)[team],
+        "fixture": fixture[gameweek, team],
+        "opponent_team": opponent[gameweek, team],
+        "was_home": was_home[gameweek, team],
+        "kickoff_time": kickoff[gameweek, team],
+        "round": gameweek + 1,
+        "value": value,
+        "minutes": minutes,
+        "total_points": np.where(played, 1 + (minutes >= 60) + 4 * goals_scored + 3 * assists + 4 * clean_sheets
+                                 - goals_conceded // 2, 0),
+        "creativity": np.where(played, rng.gamma(0.8, 8, rows), 0).round(1),
+        "threat": np.where(played, rng.gamma(0.6, 10, rows), 0).round(1),
+        "influence": np.where(played, rng.gamma(1.5, 8, rows), 0).round(1),
+        "bps": np.where(played, rng.integers(-3, 40, rows), 0),
+        "goals_scored": goals_scored,
+        "assists": assists,
+        "goals_conceded": goals_conceded,
+        "clean_sheets": clean_sheets,
+        "saves": np.where(played, rng.poisson(0.3, rows), 0),
+        "own_goals": np.where(played, rng.binomial(1, 0.005, rows), 0),
+        "penalties_missed": np.where(played, rng.binomial(1, 0.003, rows), 0),
+        "penalties_saved": np.where(played, rng.binomial(1, 0.002, rows), 0),
+        "yellow_cards": np.where(played, rng.binomial(1, 0.08, rows), 0),
+        "red_cards": np.where(played, rng.binomial(1, 0.004, rows), 0)
+    })
+    end_of_season_df = pd.DataFrame({
+        "first_name": ["first{}".format(index) for index in range(players)],
+        "second_name": ["last{}".format(index) for index in range(players)],
+        "element_type": element_types,
+        "id": np.arange(players) + 1
+    })
+    return gameweeks_df, pd.DataFrame(odds), end_of_season_df
+
+
+def synthetic_seasons(players, gameweeks, seasons, seed=0, first_year=2016):
+    """
+    the raw data of consecutive seasons by season name, with the same players in the same positions in every season
+    :param players: int
+    :param gameweeks: int
+    :param seasons: int
+    :param seed: int
+    :param first_year: int
+    :return: dict
+    """
+    rng = np.random.default_rng(seed)
+    element_types = rng.choice([1, 2, 3, 4], players, p=[0.1, 0.35, 0.4, 0.15])
+    return {season_name(year): synthetic_season(year, element_types, gameweeks, rng)
+            for year in range(first_year, first_year + seasons)}
@@ -0,0 +1,63 @@
+"""
+Measure the peak memory and time of the union as the seasons grow, streaming one season partition at a time against
+loading every season into one dataframe first. The seasons are copies of the clean gameweeks partitions.
+"""
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from project.models.all_seasons import ALL_SEASONS_COLUMNS
+from project.models.season_store import SeasonStore
+from project.models.union_state import add_aggregates, frozen_aggregates, map_seasons, stream_union
+
+SEASONS = [1, 2, 4, 8, 16]
+
+
+def in_memory_union(clean_store, output_store):
+    """
+    the union of every season loaded into one dataframe
+    :param clean_store: SeasonStore
+    :param output_store: SeasonStore
+    :return: None
+    """
+    union = clean_store.read(columns=ALL_SEASONS_COLUMNS)
+    seasons = union["season"].astype(str).to_numpy()
+    aggregates = frozen_aggregates(union[seasons == season] for season in clean_store.partitions()[:-1])
+    positions, against = add_aggregates(aggregates, union[seasons == clean_store.partitions()[-1]])
+    all_seasons = map_seasons(union, positions, against)
+    all_seasons.take_useful_columns()
+    output_store.write_seasons(all_seasons.all_seasons)
+
+
+def measure(union):
+    """
+    :param union: function
+    :return: float, float
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    union()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024 ** 2
+
+
+clean_gameweeks = SeasonStore("../../data/clean_gameweeks")
+partitions = clean_gameweeks.partitions()
+print("{:<10}{:>12}{:>20}{:>20}".format("Seasons", "Rows", "In memory (MB, s)", "Streaming (MB, s)"))
+for seasons in SEASONS:
+    with tempfile.TemporaryDirectory() as temporary_path:
+        copies = SeasonStore(os.path.join(temporary_path, "clean"))
+        for i in range(seasons):
+            partition = partitions[i % len(partitions)]
+            shutil.copytree(os.path.join(clean_gameweeks.path, partition),
+                            os.path.join(copies.path, "{:02d}-{}".format(i, partition)))
+        names = copies.partitions()
+        rows = sum(copies.schema(name)["rows"] for name in names)
+        in_memory = measure(lambda: in_memory_union(copies, SeasonStore(os.path.join(temporary_path, "in_memory"))))
+        streaming = measure(lambda: stream_union(copies, SeasonStore(os.path.join(temporary_path, "streaming")),
+                                                 names[:-1], names[-1]))
+        print("{:<10}{:>12}{:>13.1f} {:>5.1f}s{:>13.1f} {:>5.1f}s".format(seasons, rows, in_memory[1], in_memory[0],
+                                                                          streaming[1], streaming[0]))
@@ -0,0 +1,209 @@
+"""
+Class to fetch urls concurrently over pooled connections, with retries and an on-disk cache of the responses.
+Each worker thread keeps one keep-alive connection per host, and a cached response is revalidated with its ETag and
+Last-Modified headers, so a re-run only transfers the responses that have changed.
+"""
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data",
+                          ".cache", "fetch")
+# The statuses worth retrying, as the server may answer the same request once it has recovered.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    def __init__(self, url, status):
+        """
+        :param url: str
+        :param status: int
+        """
+        super().__init__("Fetching {} failed with status {}".format(url, status))
+        self.url = url
+        self.status = status
+
+
+class CachedClient:
+    def __init__(self, cache_path=CACHE_PATH, workers=8, retries=4, backoff=0.5, timeout=30):
+        """
+        :param cache_path: str
+        :param workers: int
+        :param retries: int
+        :param backoff: float
+        :param timeout: float
+        """
+        self.cache_path = cache_path
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "downloaded": 0, "revalidated": 0, "retried": 0, "bytes": 0}
+
+    def count(self, stat, value=1):
+        """
+        :param stat: str
+        :param value: int
+        :return: None
+        """
+        with self.lock:
+            self.stats[stat] += value
+
+    def connection(self, scheme, host):
+        """
+        the connection of this thread to the host, opened on first use and kept alive between requests
+        :param scheme: str
+        :param host: str
+        :return: http.client.HTTPConnection
+        """
+        connections = self.local.__dict__.setdefault("connections", {})
+        if (scheme, host) not in connections:
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            connections[(scheme, host)] = connection_class(host, timeout=self.timeout)
+        return connections[(scheme, host)]
+
+    def close_connection(self, scheme, host):
+        """
+        :param scheme: str
+        :param host: str
+        :return: None
+        """
+        connection = self.local.__dict__.get("connections", {}).pop((scheme, host), None)
+        if connection is not None:
+            connection.close()
+
+    def cache_paths(self, url):
+        """
+        the paths of the cached body and headers of the url
+        :param url: str
+        :return: str, str
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.cache_path, key[:2], key), os.path.join(self.cache_path, key[:2], key + ".json")
+
+    def read_cache(self, url):
+        """
+        the cached body and headers of the url, or None if it is not cached
+        :param url: str
+        :return: bytes, dict
+        """
+        body_path, headers_path = self.cache_paths(url)
+        if not os.path.exists(headers_path) or not os.path.exists(body_path):
+            return None
+        with open(headers_path) as headers_file, open(body_path, "rb") as body_file:
+            return body_file.read(), json.load(headers_file)
+
+    def write_cache(self, url, body, headers):
+        """
+        writes the body and headers of the url to the cache, replacing them in one step so a reader never sees a
+        partial body
+        :param url: str
+        :param body: bytes
+        :param headers: dict
+        :return: None
+        """
+        body_path, headers_path = self.cache_paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        suffix = ".{}.tmp".format(threading.get_ident())
+        with open(body_path + suffix, "wb") as body_file:
+            body_file.write(body)
+        with open(headers_path + suffix, "w") as headers_file:
+            json.dump(dict(headers, url=url), headers_file)
+        os.replace(body_path + suffix, body_path)
+        os.replace(headers_path + suffix, headers_path)
+
+    def wait(self, attempt, retry_after=None):
+        """
+        sleeps before a retry, for the Retry-After of the response if given, or else an exponential backoff with jitter
+        :param attempt: int
+        :param retry_after: str
+        :return: None
+        """
+        self.count("retried")
+        if retry_after is not None and retry_after.isdigit():
+            time.sleep(int(retry_after))
+        else:
+            time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def get(self, url):
+        """
+        the body of the url, from the cache if the server confirms it has not changed
+        :param url: str
+        :return: bytes
+        """
+        parts = urlsplit(url)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        cached = self.read_cache(url)
+        headers = {"Accept-Encoding": "gzip", "User-Agent": "fantasy-football-predictor"}
+        if cached is not None:
+            if cached[1].get("etag"):
+                headers["If-None-Match"] = cached[1]["etag"]
+            if cached[1].get("last_modified"):
+                headers["If-Modified-Since"] = cached[1]["last_modified"]
+
+        for attempt in range(self.retries + 1):
+            self.count("requests")
+            try:
+                connection = self.connection(parts.scheme, parts.netloc)
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                self.close_connection(parts.scheme, parts.netloc)
+                if attempt == self.retries:
+                    raise
+                self.wait(attempt)
+                continue
+
+            if response.status == 304 and cached is not None:
+                self.count("revalidated")
+                return cached[0]
+            if response.status in RETRY_STATUSES and attempt < self.retries:
+                self.wait(attempt, response.getheader("Retry-After"))
+                continue
+            if response.status != 200:
+                raise FetchError(url, response.status)
+
+            self.count("downloaded")
+            self.count("bytes", len(body))
+            if response.getheader("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            self.write_cache(url, body, {"etag": response.getheader("ETag"),
+                                         "last_modified": response.getheader("Last-Modified")})
+            return body
+
+    def get_json(self, url):
+        """
+        :param url: str
+        :return: dict
+        """
+        return json.loads(self.get(url))
+
+    def map(self, function, items):
+        """
+        calls the function on every item with at most the clients number of workers at once, yielding each item with
+        its result as it completes
+        :param function: function
+        :param items: list
+        :return: generator
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(function, item): item for item in items}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def summary(self):
+        """
+        :return: str
+        """
+        return ("{requests} requests, {downloaded} downloaded ({megabytes:.2f}MB), {revalidated} unchanged, "
+                "{retried} retried".format(megabytes=self.stats["bytes"] / 1024 ** 2, **self.stats))
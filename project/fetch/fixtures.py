@@ -1,3 +1,60 @@
 """
 Scrape the fixtures in the next FPL gameweek.
+The next gameweek is found from the FPL api, and its fixtures are written with the home and away team names, as used
+by the gameweeks data, alongside the teams ids.
+
+Usage, from the root of the repository:
+    python -m project.fetch.fixtures [--season 2022-23] [--api-url URL]
+where the api url defaults to FPL_API_URL, so the fetch can be pointed at a local stub server.
 """
+import argparse
+import csv
+import json
+import os
+from project.fetch.client import CachedClient
+from project.fetch.gameweeks import FPL_API_URL
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parameters = json.load(open(os.path.join(ROOT, "project", "parameters.json")))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+
+FIXTURES_CSV_COLUMNS = ["fixture", "event", "kickoff_time", "team_h", "team_a", "HomeTeam", "AwayTeam"]
+
+
+def fetch_next_fixtures(client, path, api_url=FPL_API_URL):
+    """
+    fetches the fixtures of the next gameweek and writes them to the path
+    :param client: CachedClient
+    :param path: str
+    :param api_url: str
+    :return: int
+    """
+    bootstrap = client.get_json(api_url + "/bootstrap-static/")
+    teams = {team["id"]: team["name"] for team in bootstrap["teams"]}
+    next_events = [event["id"] for event in bootstrap["events"] if event.get("is_next")]
+    if not next_events:
+        raise ValueError("The season has no next gameweek")
+    fixtures = client.get_json("{}/fixtures/?event={}".format(api_url, next_events[0]))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w", newline="", encoding="utf-8") as fixtures_file:
+        writer = csv.writer(fixtures_file)
+        writer.writerow(FIXTURES_CSV_COLUMNS)
+        writer.writerows([fixture["id"], fixture["event"], fixture["kickoff_time"], fixture["team_h"],
+                          fixture["team_a"], teams[fixture["team_h"]], teams[fixture["team_a"]]]
+                         for fixture in fixtures)
+    os.replace(path + ".tmp", path)
+    return len(fixtures)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch the fixtures of the next gameweek.")
+    parser.add_argument("--season", default=CURRENT_SEASON, help="the season the api is serving")
+    parser.add_argument("--api-url", default=FPL_API_URL, help="the base url of the FPL api")
+    arguments = parser.parse_args()
+
+    fetch_client = CachedClient()
+    fixtures_path = os.path.join(ROOT, "data", "fixtures", "{}-next-fixtures.csv".format(arguments.season))
+    fixtures_written = fetch_next_fixtures(fetch_client, fixtures_path, arguments.api_url)
+    print("Wrote {} fixtures to {}: {}".format(fixtures_written, fixtures_path, fetch_client.summary()))
@@ -0,0 +1,92 @@
+"""
+Fetch every players gameweek history in the season from the FPL api, writing it in the raw gameweeks format read by
+transform/individual.py.
+The players histories are fetched concurrently and each match is converted to a gameweeks row as it arrives, then the
+rows are written ordered by gameweek, so that a later fetch appends the new gameweeks after the rows already
+transformed by the incremental current season transform.
+
+Usage, from the root of the repository:
+    python -m project.fetch.gameweeks [--season 2022-23] [--api-url URL] [--workers 8]
+where the api url defaults to FPL_API_URL, so the fetch can be pointed at a local stub server.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from project.fetch.client import CachedClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FPL_API_URL = os.environ.get("FPL_API_URL", "https://fantasy.premierleague.com/api")
+
+parameters = json.load(open(os.path.join(ROOT, "project", "parameters.json")))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+
+# The columns of the raw gameweeks csv taken from each match of a players history.
+HISTORY_COLUMNS = ["assists", "bonus", "bps", "clean_sheets", "creativity", "element", "fixture", "goals_conceded",
+                   "goals_scored", "ict_index", "influence", "kickoff_time", "minutes", "opponent_team", "own_goals",
+                   "penalties_missed", "penalties_saved", "red_cards", "round", "saves", "selected", "team_a_score",
+                   "team_h_score", "threat", "total_points", "transfers_balance", "transfers_in", "transfers_out",
+                   "value", "was_home", "yellow_cards"]
+GAMEWEEKS_CSV_COLUMNS = ["name", "position", "team"] + HISTORY_COLUMNS + ["GW"]
+
+
+def gameweeks_rows(player, history, teams, positions):
+    """
+    the raw gameweeks rows of a players matches
+    :param player: dict
+    :param history: list
+    :param teams: dict
+    :param positions: dict
+    :return: list
+    """
+    player_columns = ["{} {}".format(player["first_name"], player["second_name"]),
+                      positions[player["element_type"]], teams[player["team"]]]
+    return [player_columns + [match.get(column) for column in HISTORY_COLUMNS] + [match["round"]]
+            for match in history]
+
+
+def fetch_gameweeks(client, path, api_url=FPL_API_URL):
+    """
+    fetches every players history and writes the gameweeks rows to the path, replacing the file once it is complete
+    :param client: CachedClient
+    :param path: str
+    :param api_url: str
+    :return: int
+    """
+    bootstrap = client.get_json(api_url + "/bootstrap-static/")
+    teams = {team["id"]: team["name"] for team in bootstrap["teams"]}
+    positions = {element_type["id"]: element_type["singular_name_short"]
+                 for element_type in bootstrap["element_types"]}
+
+    def fetch_history(player):
+        return client.get_json("{}/element-summary/{}/".format(api_url, player["id"]))["history"]
+
+    rows = []
+    for player, history in client.map(fetch_history, bootstrap["elements"]):
+        rows += gameweeks_rows(player, history, teams, positions)
+    round_column, element_column = GAMEWEEKS_CSV_COLUMNS.index("round"), GAMEWEEKS_CSV_COLUMNS.index("element")
+    rows.sort(key=lambda row: (row[round_column], row[element_column]))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w", newline="", encoding="utf-8") as gameweeks_file:
+        writer = csv.writer(gameweeks_file)
+        writer.writerow(GAMEWEEKS_CSV_COLUMNS)
+        writer.writerows(rows)
+    os.replace(path + ".tmp", path)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch the players gameweeks history of the season.")
+    parser.add_argument("--season", default=CURRENT_SEASON, help="the season the api is serving")
+    parser.add_argument("--api-url", default=FPL_API_URL, help="the base url of the FPL api")
+    parser.add_argument("--workers", type=int, default=8, help="the most requests in flight at once")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    fetch_client = CachedClient(workers=arguments.workers)
+    gameweeks_path = os.path.join(ROOT, "data", "gameweeks", "{}-gameweeks.csv".format(arguments.season))
+    rows_written = fetch_gameweeks(fetch_client, gameweeks_path, arguments.api_url)
+    print("Wrote {} rows to {} in {:.1f}s: {}".format(rows_written, gameweeks_path, time.perf_counter() - start,
+                                                     fetch_client.summary()))
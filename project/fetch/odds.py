@@ -1,3 +1,89 @@
 """
 Scrape the bookies full-time result odds for all upcoming Premier League matches.
+The odds of the seasons played matches and of the upcoming matches are fetched concurrently from football-data, whose
+season files are the game odds format read by the transforms, so they are written as they are received.
+
+Usage, from the root of the repository:
+    python -m project.fetch.odds [--seasons 2022-23 ...] [--odds-url URL]
+where the odds url defaults to ODDS_URL, so the fetch can be pointed at a local stub server.
 """
+import argparse
+import json
+import os
+from project.fetch.client import CachedClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ODDS_URL = os.environ.get("ODDS_URL", "https://www.football-data.co.uk")
+# The division of the Premier League in the football-data files.
+DIVISION = "E0"
+
+parameters = json.load(open(os.path.join(ROOT, "project", "parameters.json")))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+
+
+def season_odds_url(season, odds_url=ODDS_URL):
+    """
+    the url of the seasons Premier League odds, e.g. .../mmz4281/2223/E0.csv for 2022-23
+    :param season: str
+    :param odds_url: str
+    :return: str
+    """
+    return "{}/mmz4281/{}{}/{}.csv".format(odds_url, season[2:4], season[5:7], DIVISION)
+
+
+def write_file(path, body):
+    """
+    writes the body to the path, replacing the file in one step
+    :param path: str
+    :param body: bytes
+    :return: None
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "wb") as output_file:
+        output_file.write(body)
+    os.replace(path + ".tmp", path)
+
+
+def upcoming_premier_league_odds(body):
+    """
+    the header and the Premier League rows of the upcoming fixtures file, which covers every division
+    :param body: bytes
+    :return: bytes
+    """
+    lines = body.splitlines(keepends=True)
+    return b"".join(lines[:1] + [line for line in lines[1:] if line.lstrip(b"\xef\xbb\xbf").startswith(
+        DIVISION.encode() + b",")])
+
+
+def fetch_odds(client, seasons, odds_path, odds_url=ODDS_URL):
+    """
+    fetches the odds of the seasons and of the upcoming fixtures, writing each as it is received
+    :param client: CachedClient
+    :param seasons: list
+    :param odds_path: str
+    :param odds_url: str
+    :return: list
+    """
+    urls = {season_odds_url(season, odds_url): os.path.join(odds_path, "{}-game-odds.csv".format(season))
+            for season in seasons}
+    urls[odds_url + "/fixtures.csv"] = os.path.join(odds_path, "upcoming-game-odds.csv")
+    written = []
+    for url, body in client.map(client.get, list(urls)):
+        if url.endswith("/fixtures.csv"):
+            body = upcoming_premier_league_odds(body)
+        write_file(urls[url], body)
+        written.append(urls[url])
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch the game odds of the seasons and the upcoming fixtures.")
+    parser.add_argument("--seasons", nargs="+", default=[CURRENT_SEASON], help="the seasons to fetch")
+    parser.add_argument("--odds-url", default=ODDS_URL, help="the base url of football-data")
+    arguments = parser.parse_args()
+
+    fetch_client = CachedClient()
+    for written_path in fetch_odds(fetch_client, arguments.seasons, os.path.join(ROOT, "data", "game_odds"),
+                                   arguments.odds_url):
+        print("Wrote {}".format(written_path))
+    print(fetch_client.summary())
@@ -0,0 +1,99 @@
+"""
+A local stub server of the FPL api and football-data, serving files from a directory, to run the fetchers against.
+A request path maps to the file at the same path under the directory, without a trailing slash and with any query
+appended after an @, e.g. /api/fixtures/?event=5 is served from <directory>/api/fixtures@event=5.
+Responses carry an ETag and Last-Modified, and a conditional request for an unchanged file is answered with 304. The
+server can be slowed down and made to fail some requests, to exercise the fetchers parallelism and retries.
+
+Usage, from the root of the repository:
+    python -m project.fetch.stub DIRECTORY [--port 8001] [--latency 0.05] [--failure-rate 0.1]
+then fetch with e.g. FPL_API_URL=http://127.0.0.1:8001/api ODDS_URL=http://127.0.0.1:8001
+"""
+import argparse
+import email.utils
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+def stub_server(directory, port=0, latency=0.0, failure_rate=0.0):
+    """
+    a stub server of the files in the directory on localhost, where port 0 picks a free port
+    :param directory: str
+    :param port: int
+    :param latency: float
+    :param failure_rate: float
+    :return: http.server.ThreadingHTTPServer
+    """
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            parts = urlsplit(self.path)
+            path = os.path.join(directory, parts.path.strip("/") + ("@" + parts.query if parts.query else ""))
+            if random.random() < failure_rate:
+                self.send_empty(503)
+                return
+            if not os.path.isfile(path):
+                self.send_empty(404)
+                return
+            with open(path, "rb") as served_file:
+                body = served_file.read()
+            etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+            last_modified = email.utils.formatdate(os.path.getmtime(path), usegmt=True)
+            if self.headers.get("If-None-Match") == etag:
+                self.send_empty(304, {"ETag": etag, "Last-Modified": last_modified})
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_empty(self, status, headers=None):
+            self.send_response(status)
+            for header, value in (headers or {}).items():
+                self.send_header(header, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, message_format, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+
+
+def start_stub_server(directory, port=0, latency=0.0, failure_rate=0.0):
+    """
+    starts a stub server in a background thread and returns it with its base url
+    :param directory: str
+    :param port: int
+    :param latency: float
+    :param failure_rate: float
+    :return: http.server.ThreadingHTTPServer, str
+    """
+    server = stub_server(directory, port, latency, failure_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:{}".format(server.server_address[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a directory as a stub of the FPL api and football-data.")
+    parser.add_argument("directory", help="the directory of the files to serve")
+    parser.add_argument("--port", type=int, default=8001, help="the port of the server")
+    parser.add_argument("--latency", type=float, default=0.0, help="the seconds each response is delayed")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="the share of requests answered with 503")
+    arguments = parser.parse_args()
+
+    stub = stub_server(arguments.directory, arguments.port, arguments.latency, arguments.failure_rate)
+    print("Serving {} on http://127.0.0.1:{}".format(arguments.directory, arguments.port))
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        stub.server_close()
@@ -1,4 +1,321 @@
 """
 Test different possible Machine Learning algorithms to find the best performing model with
 the training data.
+The feature matrix is built once from the all seasons data with sparse dummies, and each cross validation fold is
+scaled once, so every candidate reuses the same fold matrices rather than refitting the preprocessing.
+The candidates are every estimator and hyperparameter combination in CANDIDATES, evaluated in parallel by successive
+halving: each round fits the remaining candidates on a larger sample of each folds training rows and keeps the best
+1 / factor of them, so the weak candidates are dropped before they are fitted on all the rows.
+The folds are season aware by default, testing each season on a model trained on the seasons before it.
+The score of every candidate, fold and sample size is cached, so a repeated search only fits what has changed.
+The best candidate is then fitted on every training row and saved as a model bundle, with its scaler, category
+vocabularies and the hashes of the rows it was trained on, as the model used by predict.py and refreshed by
+refresh.py.
+
+Usage, from the root of the repository:
+    python -m project.gridsearch [--cv season|stratified] [--estimators name ...] [--factor 3] [--jobs N]
 """
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+import warnings
+import numpy as np
+from joblib import Parallel, delayed
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.svm import LinearSVC
+from project.models.bundle import ModelBundle
+from project.models.season_store import SeasonStore
+from project.models.training import Training, scale_and_stack, row_hashes, season_row_hashes
+from project.hashing import hash_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALL_SEASONS_PATH = "data/all_seasons"
+CACHE_PATH = os.path.join(ROOT, "data", ".cache", "gridsearch", "scores.json")
+REPORT_PATH = os.path.join(ROOT, "data", "models", "gridsearch.json")
+MODEL_PATH = os.path.join(ROOT, "data", "models", "model")
+
+# The estimators searched, which all accept sparse matrices, and the hyperparameter grid of each.
+CANDIDATES = {
+    "logistic_regression": (LogisticRegression(max_iter=1000),
+                            {"C": [0.01, 0.1, 1, 10], "class_weight": [None, "balanced"]}),
+    "sgd": (SGDClassifier(random_state=1),
+            {"loss": ["hinge", "modified_huber"], "alpha": [1e-5, 1e-4, 1e-3]}),
+    "linear_svc": (LinearSVC(),
+                   {"C": [0.01, 0.1, 1], "class_weight": [None, "balanced"]}),
+    "random_forest": (RandomForestClassifier(random_state=1),
+                      {"n_estimators": [100, 300], "max_depth": [10, 20, None], "min_samples_leaf": [1, 5]})
+}
+
+
+def build_features(store_path=os.path.join(ROOT, ALL_SEASONS_PATH)):
+    """
+    prepares the complete rows of the all seasons data for modelling with sparse dummies, as the training transform
+    does, along with the season and hash of each row
+    :param store_path: str
+    :return: Training, np.array, np.array
+    """
+    all_seasons = SeasonStore(store_path).read()
+    training_data = all_seasons[all_seasons["shift_opponent"].notna()]
+    training_data = training_data.apply(lambda column: column.cat.remove_unused_categories()
+                                        if column.dtype == "category" else column)
+    seasons = training_data["season"].astype(str).to_numpy()
+    hashes = row_hashes(training_data)
+    training = Training(training_data)
+    training.dummify_categories(sparse_output=True)
+    return training, seasons, hashes
+
+
+def season_splits(seasons, min_train_seasons=1):
+    """
+    time ordered splits, where each season after the first seasons is tested on a model trained on every season
+    before it
+    :param seasons: np.array
+    :param min_train_seasons: int
+    :return: list
+    """
+    ordered_seasons = sorted(set(seasons))
+    if len(ordered_seasons) <= min_train_seasons:
+        raise ValueError("Season splits need more than {} seasons, there are {}".format(min_train_seasons,
+                                                                                         len(ordered_seasons)))
+    return [(np.flatnonzero(np.isin(seasons, ordered_seasons[:i])), np.flatnonzero(seasons == ordered_seasons[i]))
+            for i in range(min_train_seasons, len(ordered_seasons))]
+
+
+def stratified_splits(labels, folds=3, random_state=1):
+    """
+    shuffled splits stratified by the labels, ignoring the order of the matches
+    :param labels: pandas.core.frame.Series
+    :param folds: int
+    :param random_state: int
+    :return: list
+    """
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+    return list(splitter.split(np.zeros(len(labels)), labels))
+
+
+def prepare_folds(training, splits):
+    """
+    scales and stacks the train and test rows of each split once, to be shared by every candidate
+    :param training: Training
+    :param splits: list
+    :return: list
+    """
+    labels = training.labels.to_numpy()
+    folds = []
+    for train_rows, test_rows in splits:
+        x_train, x_test, _ = scale_and_stack(training.training_data, training.dummies, train_rows, test_rows,
+                                             MinMaxScaler(), training.numerical_columns)
+        folds.append({"x_train": x_train, "x_test": x_test, "y_train": labels[train_rows],
+                      "y_test": labels[test_rows]})
+    return folds
+
+
+def list_candidates(estimators):
+    """
+    every hyperparameter combination of the estimators
+    :param estimators: list
+    :return: list
+    """
+    return [{"estimator": estimator, "params": params}
+            for estimator in estimators for params in ParameterGrid(CANDIDATES[estimator][1])]
+
+
+def evaluate(estimator, params, fold, rows, scoring):
+    """
+    fits the estimator with the params on the sampled training rows of the fold and scores it on the test rows
+    :param estimator: sklearn.base.BaseEstimator
+    :param params: dict
+    :param fold: dict
+    :param rows: np.array
+    :param scoring: str
+    :return: float, float
+    """
+    start = time.perf_counter()
+    estimator = clone(estimator).set_params(**params)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        estimator.fit(fold["x_train"][rows], fold["y_train"][rows])
+    return get_scorer(scoring)(estimator, fold["x_test"], fold["y_test"]), time.perf_counter() - start
+
+
+def score_key(data_key, fold_index, candidate, resources, scoring):
+    """
+    the key of a candidates score on a fold with a sample of the training rows
+    :param data_key: str
+    :param fold_index: int
+    :param candidate: dict
+    :param resources: int
+    :param scoring: str
+    :return: str
+    """
+    key = {"data": data_key, "fold": fold_index, "estimator": candidate["estimator"],
+           "params": candidate["params"], "resources": resources, "scoring": scoring}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def successive_halving(candidates, folds, scoring, data_key, factor=3, min_resources=500, jobs=None, cache=None,
+                       random_state=1):
+    """
+    evaluates the candidates in rounds, where each round samples factor times more of each folds training rows than
+    the last, and keeps the best 1 / factor of the candidates by their mean score over the folds
+    the last round takes every training row of each fold, and the samples of a fold are nested, so a candidate is
+    always scored on more of the same rows as it progresses
+    :param candidates: list
+    :param folds: list
+    :param scoring: str
+    :param data_key: str
+    :param factor: int
+    :param min_resources: int
+    :param jobs: int
+    :param cache: dict
+    :param random_state: int
+    :return: list
+    """
+    cache = {} if cache is None else cache
+    rng = np.random.default_rng(random_state)
+    fold_orders = [rng.permutation(fold["x_train"].shape[0]) for fold in folds]
+    max_resources = min(len(order) for order in fold_orders)
+    all_resources = max(len(order) for order in fold_orders)
+    rounds = max(1, math.ceil(math.log(len(candidates), factor)))
+    resources = max(min(min_resources, max_resources), max_resources // factor ** (rounds - 1))
+
+    history = []
+    remaining = candidates
+    for round_number in range(rounds):
+        resources = all_resources if round_number == rounds - 1 else min(resources, max_resources)
+        tasks = [(candidate, fold_index) for candidate in remaining for fold_index in range(len(folds))]
+        keys = [score_key(data_key, fold_index, candidate, resources, scoring) for candidate, fold_index in tasks]
+        uncached = [(task, key) for task, key in zip(tasks, keys) if key not in cache]
+        start = time.perf_counter()
+        scores = Parallel(n_jobs=jobs)(
+            delayed(evaluate)(CANDIDATES[candidate["estimator"]][0], candidate["params"], folds[fold_index],
+                              fold_orders[fold_index][:resources], scoring)
+            for (candidate, fold_index), _ in uncached)
+        for (_, key), (score, seconds) in zip(uncached, scores):
+            cache[key] = {"score": score, "seconds": seconds}
+
+        results = []
+        for i, candidate in enumerate(remaining):
+            fold_scores = [cache[key] for key in keys[i * len(folds):(i + 1) * len(folds)]]
+            results.append(dict(candidate, round=round_number, resources=resources,
+                                score=float(np.mean([fold_score["score"] for fold_score in fold_scores])),
+                                fold_scores=[fold_score["score"] for fold_score in fold_scores],
+                                fit_seconds=sum(fold_score["seconds"] for fold_score in fold_scores)))
+        results.sort(key=lambda result: result["score"], reverse=True)
+        history += results
+        print("Round {}: {} candidates on {} rows, {} fitted in {:.1f}s, best {:.4f}".format(
+            round_number + 1, len(remaining), resources, len(uncached), time.perf_counter() - start,
+            results[0]["score"]))
+
+        remaining = [{"estimator": result["estimator"], "params": result["params"]}
+                     for result in results[:math.ceil(len(results) / factor)]]
+        resources *= factor
+    return history
+
+
+def fit_model(training, candidate, trained_rows=None):
+    """
+    fits the candidate on every training row, with the numerical columns scaled by a scaler fitted to every row, and
+    bundles it as the model used by predict.py, with the row hashes of the training rows by season
+    :param training: Training
+    :param candidate: dict
+    :param trained_rows: dict
+    :return: ModelBundle
+    """
+    transformer = ColumnTransformer([('numerical', MinMaxScaler(), training.numerical_columns)])
+    numerical = transformer.fit_transform(training.training_data)
+    features = sparse.hstack([sparse.csr_matrix(numerical), training.dummies], format="csr")
+    estimator = clone(CANDIDATES[candidate["estimator"]][0]).set_params(**candidate["params"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        estimator.fit(features, training.labels.to_numpy())
+    return ModelBundle.from_training(training, estimator, transformer, {"candidate": candidate}, trained_rows)
+
+
+def load_cache(path=CACHE_PATH):
+    """
+    :param path: str
+    :return: dict
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as cache_file:
+        return json.load(cache_file)
+
+
+def save_cache(cache, path=CACHE_PATH):
+    """
+    :param cache: dict
+    :param path: str
+    :return: None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as cache_file:
+        json.dump(cache, cache_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the candidate models by successive halving.")
+    parser.add_argument("--cv", choices=["season", "stratified"], default="season",
+                        help="season tests each season on the seasons before it, stratified shuffles the rows")
+    parser.add_argument("--folds", type=int, default=3, help="the number of stratified folds")
+    parser.add_argument("--estimators", nargs="+", choices=list(CANDIDATES), default=list(CANDIDATES),
+                        help="the estimators to search")
+    parser.add_argument("--scoring", default="balanced_accuracy", help="the scikit-learn scorer to rank by")
+    parser.add_argument("--factor", type=int, default=3, help="the factor the candidates are cut by each round")
+    parser.add_argument("--min-resources", type=int, default=500,
+                        help="the fewest training rows sampled from each fold in the first round")
+    parser.add_argument("--jobs", type=int, default=-1, help="the number of parallel jobs, -1 for every core")
+    parser.add_argument("--no-cache", action="store_true", help="fit every candidate even if its score is cached")
+    parser.add_argument("--no-model", action="store_true", help="do not fit and save the best candidate")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    training, seasons, hashes = build_features()
+    if arguments.cv == "season":
+        splits = season_splits(seasons)
+    else:
+        splits = stratified_splits(training.labels, arguments.folds)
+    folds = prepare_folds(training, splits)
+    print("Built {} folds of {} features in {:.1f}s".format(len(folds), folds[0]["x_train"].shape[1],
+                                                             time.perf_counter() - start))
+
+    data_key = hashlib.sha256("{}:{}:{}".format(hash_path(ALL_SEASONS_PATH), arguments.cv,
+                                                arguments.folds).encode()).hexdigest()
+    cache = {} if arguments.no_cache else load_cache()
+    candidates = list_candidates(arguments.estimators)
+    history = successive_halving(candidates, folds, arguments.scoring, data_key, arguments.factor,
+                                 arguments.min_resources, arguments.jobs, cache)
+    if not arguments.no_cache:
+        save_cache(cache)
+
+    best = max((result for result in history if result["round"] == history[-1]["round"]),
+               key=lambda result: result["score"])
+    report = {"cv": arguments.cv, "scoring": arguments.scoring, "factor": arguments.factor,
+              "candidates": len(candidates), "seconds": time.perf_counter() - start, "best": best, "history": history}
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as report_file:
+        json.dump(report, report_file, indent=2, default=str)
+    if not arguments.no_model:
+        fit_model(training, {"estimator": best["estimator"], "params": best["params"]},
+                  season_row_hashes(hashes, seasons)).save(MODEL_PATH)
+
+    print("{:<22}{:<60}{:>9}{:>10}".format("Estimator", "Params", "Rows", "Score"))
+    for result in sorted(history, key=lambda result: (result["round"], result["score"]), reverse=True)[:10]:
+        print("{:<22}{:<60}{:>9}{:>10.4f}".format(result["estimator"], json.dumps(result["params"]),
+                                                  result["resources"], result["score"]))
+    print("Best: {} {} with {} {:.4f}, search took {:.1f}s".format(best["estimator"], json.dumps(best["params"]),
+                                                                   arguments.scoring, best["score"],
+                                                                   report["seconds"]))
+    if not arguments.no_model:
+        print("Model written to {}".format(MODEL_PATH))
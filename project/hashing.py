@@ -0,0 +1,31 @@
+"""
+Content hashes of the data and code files, used to key the caches of the pipeline stages, the grid search, the union
+and the backtest.
+"""
+import hashlib
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def hash_path(path):
+    """
+    a content hash of a file, or of every file under a directory along with their relative paths, where a relative
+    path is relative to the root of the repository
+    :param path: str
+    :return: str
+    """
+    full_path = os.path.join(ROOT, path)
+    digest = hashlib.sha256()
+    if os.path.isdir(full_path):
+        for directory, directories, files in sorted(os.walk(full_path)):
+            directories.sort()
+            for file in sorted(files):
+                file_path = os.path.join(directory, file)
+                digest.update(os.path.relpath(file_path, full_path).encode())
+                digest.update(hash_path(file_path).encode())
+    else:
+        with open(full_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,180 @@
+"""
+Opt-in instrumentation of the transformation classes, recording the wall time, cpu time, rows in and out and peak
+memory delta of every call to a public method.
+Instrumentation is enabled by INSTRUMENT in the parameters, or the FPL_INSTRUMENT environment variable, which takes
+precedence, e.g. FPL_INSTRUMENT=1. When disabled the classes are left untouched, so there is no overhead.
+Memory is traced with tracemalloc, which slows down the methods that allocate the most, so a setting of "time" records
+the calls without their memory.
+When enabled, each process writes its calls as a json trace to data/traces on exit and prints a summary table.
+"""
+import atexit
+import datetime
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRACES_PATH = os.path.join(ROOT, "data", "traces")
+
+
+def instrumentation_setting():
+    """
+    the instrumentation setting from the environment variable, or else from the parameters, as one of off, on or time
+    :return: str
+    """
+    setting = os.environ.get("FPL_INSTRUMENT")
+    if setting is None:
+        with open(os.path.join(ROOT, "project", "parameters.json")) as parameters_file:
+            setting = json.load(parameters_file).get("INSTRUMENT", False)
+    setting = str(setting).strip().lower()
+    if setting == "time":
+        return "time"
+    return "on" if setting in {"1", "true", "yes", "on"} else "off"
+
+
+SETTING = instrumentation_setting()
+ENABLED = SETTING != "off"
+TRACE_MEMORY = SETTING == "on"
+# The calls recorded in this process, in the order they finished, and the calls in progress, outermost first.
+CALLS = []
+ACTIVE_CALLS = []
+
+
+def frame_rows(instance, frame_attribute):
+    """
+    the number of rows of the dataframe the instance transforms, if it has one
+    :param instance: object
+    :param frame_attribute: str
+    :return: int
+    """
+    frame = getattr(instance, frame_attribute, None)
+    return len(frame) if hasattr(frame, "__len__") else None
+
+
+def instrument_method(class_name, method_name, method, frame_attribute):
+    """
+    wraps the method to record each call to it
+    the peak memory of a call includes the calls it makes, so a call passes its peak on to its caller when it returns
+    :param class_name: str
+    :param method_name: str
+    :param method: function
+    :param frame_attribute: str
+    :return: function
+    """
+    @functools.wraps(method)
+    def instrumented(self, *args, **kwargs):
+        if TRACE_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if ACTIVE_CALLS:
+            ACTIVE_CALLS[-1]["peak"] = max(ACTIVE_CALLS[-1]["peak"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        call = {"peak": memory_before}
+        ACTIVE_CALLS.append(call)
+        rows_in = frame_rows(self, frame_attribute)
+        started = datetime.datetime.now().isoformat()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            wall_seconds, cpu_seconds = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            ACTIVE_CALLS.pop()
+            peak = max(call["peak"], tracemalloc.get_traced_memory()[1])
+            if ACTIVE_CALLS:
+                ACTIVE_CALLS[-1]["peak"] = max(ACTIVE_CALLS[-1]["peak"], peak)
+            CALLS.append({"method": "{}.{}".format(class_name, method_name), "depth": len(ACTIVE_CALLS),
+                          "started": started, "process": os.getpid(), "wall_seconds": wall_seconds,
+                          "cpu_seconds": cpu_seconds, "rows_in": rows_in,
+                          "rows_out": frame_rows(self, frame_attribute),
+                          "peak_memory_delta_mb": (peak - memory_before) / 1024 ** 2 if TRACE_MEMORY else None})
+
+    return instrumented
+
+
+def instrument(frame_attribute):
+    """
+    a class decorator that instruments every public method of the class if instrumentation is enabled, where the rows
+    in and out of a call are the rows of the dataframe in the frame attribute of the instance
+    :param frame_attribute: str
+    :return: function
+    """
+    def decorator(cls):
+        if not ENABLED:
+            return cls
+        for name, method in list(vars(cls).items()):
+            if inspect.isfunction(method) and not name.startswith("_"):
+                setattr(cls, name, instrument_method(cls.__name__, name, method, frame_attribute))
+        return cls
+    return decorator
+
+
+def take_calls():
+    """
+    removes and returns the calls recorded in this process, so a worker process can pass them back to its parent
+    :return: list
+    """
+    calls = CALLS[:]
+    CALLS.clear()
+    return calls
+
+
+def add_calls(calls):
+    """
+    adds calls recorded in another process to the calls of this process
+    :param calls: list
+    :return: None
+    """
+    CALLS.extend(calls)
+
+
+def summarise(calls):
+    """
+    the calls totalled by method, in the order each method was first called
+    :param calls: list
+    :return: list
+    """
+    summary = {}
+    for call in calls:
+        method = summary.setdefault(call["method"], {"method": call["method"], "calls": 0, "wall_seconds": 0.0,
+                                                     "cpu_seconds": 0.0, "rows_in": 0, "rows_out": 0,
+                                                     "peak_memory_delta_mb": 0.0})
+        method["calls"] += 1
+        method["wall_seconds"] += call["wall_seconds"]
+        method["cpu_seconds"] += call["cpu_seconds"]
+        method["rows_in"] += call["rows_in"] or 0
+        method["rows_out"] += call["rows_out"] or 0
+        method["peak_memory_delta_mb"] = max(method["peak_memory_delta_mb"], call["peak_memory_delta_mb"] or 0.0)
+    return list(summary.values())
+
+
+def write_trace():
+    """
+    writes the calls recorded in this process to a json trace named after the script and prints the summary table
+    :return: str
+    """
+    if not CALLS:
+        return None
+    script = os.path.splitext(os.path.basename(sys.argv[0]))[0] if sys.argv[0] not in {"", "-c"} else "python"
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    trace_path = os.path.join(TRACES_PATH, "{}-{}-{}.json".format(script, timestamp, os.getpid()))
+    summary = summarise(CALLS)
+    os.makedirs(TRACES_PATH, exist_ok=True)
+    with open(trace_path, "w") as trace_file:
+        json.dump({"script": script, "argv": sys.argv, "written": timestamp, "summary": summary, "calls": CALLS},
+                  trace_file, indent=2)
+
+    print("{:<50}{:>7}{:>10}{:>10}{:>11}{:>11}{:>11}".format("Method", "Calls", "Wall (s)", "CPU (s)", "Rows in",
+                                                             "Rows out", "Peak (MB)"))
+    for method in sorted(summary, key=lambda method: method["wall_seconds"], reverse=True):
+        print("{method:<50}{calls:>7}{wall_seconds:>10.3f}{cpu_seconds:>10.3f}{rows_in:>11}{rows_out:>11}"
+              "{peak_memory_delta_mb:>11.1f}".format(**method))
+    print("Trace written to {}".format(trace_path))
+    return trace_path
+
+
+if ENABLED:
+    atexit.register(write_trace)
@@ -2,9 +2,189 @@
 Class to transform the unioned gameweeks data.
 """
 import numpy as np
-from tqdm import tqdm
+import pandas as pd
+from project.instrumentation import instrument
+from project.models.gameweeks import player_key_column
 
+# The metrics meaned against the players next opponent, with the column the mean is stored in and the rolling mean
+# column used when the player has not played the opponent.
+AGAINST_OPPONENT_METRICS = {
+    "total_points": ("points_against_shift_opponent", "mean_total_points"),
+    "creativity": ("creativity_against_shift_opponent", "mean_creativity"),
+    "threat": ("threat_against_shift_opponent", "mean_threat"),
+    "influence": ("influence_against_shift_opponent", "mean_influence"),
+    "bps": ("bps_against_shift_opponent", "mean_bps"),
+    "goals_scored": ("goals_against_shift_opponent", "mean_goals"),
+    "assists": ("assists_against_shift_opponent", "mean_assists"),
+    "goals_conceded": ("conceded_against_shift_opponent", "mean_conceded")
+}
 
+# The positions split into an attacking and a defensive type, by whether the players median of the metric is above the
+# threshold, with the attacking and defensive type.
+POSITION_TYPES = {
+    "DEF": ("creativity", 2, "AttDEF", "DefDEF"),
+    "MID": ("threat", 2, "AttMID", "DefMID")
+}
+
+# The columns of the clean gameweeks read by the transformations, so the union never loads the columns it would drop.
+ALL_SEASONS_COLUMNS = ["season", "round", "name", "player_id", "position", "plays_for", "opponent_team", "opponent_id",
+                       "date_of_match", "total_points", "creativity", "threat", "influence", "bps", "goals_scored",
+                       "assists", "goals_conceded", "mean_total_points", "mean_creativity", "mean_threat",
+                       "mean_influence", "mean_bps", "mean_goals", "mean_assists", "mean_conceded",
+                       "shift_total_points_range", "shift_value", "shift_value_delta", "shift_opponent",
+                       "shift_opponent_id", "shift_round", "shift_win_expectation", "shift_month_of_match",
+                       "shift_time_of_match", "shift_was_home", "shift_minutes", "shift_mean_minutes",
+                       "shift_mean_total_points", "shift_mean_creativity", "shift_mean_threat", "shift_mean_influence",
+                       "shift_mean_bps", "shift_mean_goals", "shift_mean_assists", "shift_mean_conceded"]
+
+# The columns of the clean gameweeks read to aggregate a season.
+AGGREGATE_COLUMNS = ["season", "player_id", "position", "opponent_id"] + list(AGAINST_OPPONENT_METRICS)
+
+
+def position_thresholds(thresholds=None):
+    """
+    the threshold of each position, from the position types unless given
+    :param thresholds: dict
+    :return: dict
+    """
+    return {position: (thresholds or {}).get(position, threshold)
+            for position, (_, threshold, _, _) in POSITION_TYPES.items()}
+
+
+def position_keys(positions, players, seasons=None):
+    """
+    the key each row is classified by, its position and player, along with its season when classifying per season
+    :param positions: np.array
+    :param players: np.array
+    :param seasons: np.array
+    :return: pandas.core.indexes.multi.MultiIndex
+    """
+    arrays = [np.asarray(positions, dtype=object)]
+    if seasons is not None:
+        arrays.append(np.asarray(seasons, dtype=object))
+    return pd.MultiIndex.from_arrays(arrays + [np.asarray(players)])
+
+
+def position_aggregates(dataframe, thresholds=None, per_season=False):
+    """
+    per position and player, the number of their matches in the position with the positions metric above the threshold
+    and at most the threshold, along with the largest value at most and the smallest value above the threshold
+    the side of the threshold of the players median follows from these alone, and unlike the median they can be
+    combined across seasons, so the seasons that no longer change are aggregated once
+    every position is aggregated in one grouped pass over only its metric, keyed by the position keys
+    :param dataframe: pandas.core.frame.DataFrame
+    :param thresholds: dict
+    :param per_season: bool
+    :return: pandas.core.frame.DataFrame
+    """
+    thresholds = position_thresholds(thresholds)
+    in_types = dataframe["position"].isin(list(POSITION_TYPES)).to_numpy()
+    positions = dataframe["position"].astype(str).to_numpy()[in_types]
+    values = np.full(len(positions), np.nan)
+    threshold = np.zeros(len(positions))
+    for position, (metric, _, _, _) in POSITION_TYPES.items():
+        in_position = positions == position
+        values[in_position] = dataframe[metric].to_numpy(dtype=float)[in_types][in_position]
+        threshold[in_position] = thresholds[position]
+
+    is_above = values > threshold
+    is_below = values <= threshold
+    keys = position_keys(positions, dataframe[player_key_column(dataframe)].to_numpy()[in_types],
+                         dataframe["season"].astype(str).to_numpy()[in_types] if per_season else None)
+    grouped = pd.DataFrame({"above": is_above, "below": is_below, "max_below": np.where(is_below, values, np.nan),
+                            "min_above": np.where(is_above, values, np.nan)}).groupby(
+        [keys.get_level_values(level) for level in range(keys.nlevels)])
+    return grouped.agg({"above": "sum", "below": "sum", "max_below": "max", "min_above": "min"})
+
+
+def combine_position_aggregates(aggregates):
+    """
+    :param aggregates: list
+    :return: pandas.core.frame.DataFrame
+    """
+    combined = pd.concat(aggregates)
+    return combined.groupby(level=list(range(combined.index.nlevels))).agg({"above": "sum", "below": "sum",
+                                                                            "max_below": "max", "min_above": "min"})
+
+
+def position_types(aggregates, thresholds=None):
+    """
+    the type of each position key, attacking if the players median of the positions metric is above the threshold
+    when the counts either side of the threshold are equal, the median is the mean of the values closest to it
+    :param aggregates: pandas.core.frame.DataFrame
+    :param thresholds: dict
+    :return: pandas.core.frame.Series
+    """
+    thresholds = position_thresholds(thresholds)
+    positions = aggregates.index.get_level_values(0).to_numpy()
+    threshold = np.zeros(len(aggregates))
+    attacking = np.empty(len(aggregates), dtype=object)
+    defensive = np.empty(len(aggregates), dtype=object)
+    for position, (_, _, attacking_type, defensive_type) in POSITION_TYPES.items():
+        in_position = positions == position
+        threshold[in_position] = thresholds[position]
+        attacking[in_position] = attacking_type
+        defensive[in_position] = defensive_type
+
+    is_attacking = ((aggregates["above"] > aggregates["below"])
+                    | ((aggregates["above"] == aggregates["below"]) & (aggregates["above"] > 0)
+                       & (aggregates["max_below"] + aggregates["min_above"] > 2 * threshold))).to_numpy()
+    return pd.Series(np.where(is_attacking, attacking, defensive), index=aggregates.index)
+
+
+def opponent_keys(opponents):
+    """
+    the team id of each opponent as an integer key, where a missing next opponent is -1, so the shifted opponents,
+    which are floats as they can be missing, key the same joins as the opponents
+    :param opponents: np.array
+    :return: np.array
+    """
+    return np.nan_to_num(np.asarray(opponents, dtype=float), nan=-1).astype(np.int16)
+
+
+def against_aggregates(dataframe):
+    """
+    the sum and count of each metric meaned against the next opponent, per player and opponent
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: pandas.core.frame.DataFrame
+    """
+    metric_columns = list(AGAINST_OPPONENT_METRICS.keys())
+    metrics = dataframe[metric_columns].astype(float)
+    keys = [dataframe[player_key_column(dataframe)].to_numpy(), opponent_keys(dataframe["opponent_id"])]
+    sums = metrics.groupby(keys).sum()
+    counts = metrics.notna().groupby(keys).sum()
+    return pd.concat([sums.add_prefix("sum_"), counts.add_prefix("count_")], axis=1)
+
+
+def combine_against_aggregates(aggregates):
+    """
+    adds the aggregates in order, so combining the same aggregates in the same order always gives the same sums
+    :param aggregates: list
+    :return: pandas.core.frame.DataFrame
+    """
+    combined = aggregates[0]
+    for aggregate in aggregates[1:]:
+        combined = combined.add(aggregate, fill_value=0)
+    return combined
+
+
+def means_against_opponent(aggregates, players, opponents):
+    """
+    the mean of each metric against the opponent of each row, or missing if the player has not played them
+    :param aggregates: pandas.core.frame.DataFrame
+    :param players: np.array
+    :param opponents: np.array
+    :return: np.array
+    """
+    metric_columns = list(AGAINST_OPPONENT_METRICS.keys())
+    lookup = aggregates.reindex(pd.MultiIndex.from_arrays([players, opponent_keys(opponents)]))
+    sums = lookup[["sum_" + metric for metric in metric_columns]].to_numpy(dtype=float)
+    counts = lookup[["count_" + metric for metric in metric_columns]].fillna(0).to_numpy(dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+@instrument("all_seasons")
 class AllSeasons:
     def __init__(self, dataframe):
         """
@@ -12,81 +192,95 @@ class AllSeasons:
         """
         self.all_seasons = dataframe
 
-    def map_defender_position(self):
+    def map_position_types(self, visible=None, aggregates=None, thresholds=None, per_season=False):
         """
-        maps the defenders into either attacking defender, i.e. full back, or defensive defender, i.e. central defender
-        important to note this isn"t completely accurate in mapping the defenders position
+        maps the defenders into either attacking defender, i.e. full back, or defensive defender, i.e. central defender,
+        and the midfielders into either attacking midfielder, i.e. 10"s or wingers, or defensive midfielder, by their
+        median of the positions metric, classifying per season when given, so a players role can change between years
+        important to note this isn"t completely accurate in mapping the players position
+        given the visible rows, only those rows are medianed, so the mapping uses no later matches, and given the
+        position aggregates, e.g. of the seasons that no longer change combined with the current season, the rows are
+        not aggregated at all
+        :param visible: np.array
+        :param aggregates: pandas.core.frame.DataFrame
+        :param thresholds: dict
+        :param per_season: bool
         :return: None
         """
-        defenders_creativity = self.all_seasons[(self.all_seasons["position"] == "DEF")].groupby(
-            ["name"]).median(numeric_only=True).reset_index()
-        defenders_creativity["type_of_def"] = ["AttDEF" if creativity > 2 else "DefDEF" for creativity in
-                                               defenders_creativity["creativity"]]
-        gameweeks = self.all_seasons.merge(defenders_creativity[["name", "type_of_def"]], on="name", how="left")
-        self.all_seasons["position"] = np.where(gameweeks["position"] == "DEF", gameweeks["type_of_def"],
-                                                gameweeks["position"])
-
-    def map_midfielder_position(self):
+        if aggregates is None:
+            visible_seasons = self.all_seasons if visible is None else self.all_seasons[visible]
+            aggregates = position_aggregates(visible_seasons, thresholds, per_season)
+        types = position_types(aggregates, thresholds)
+
+        positions = self.all_seasons["position"].astype(object).to_numpy().copy()
+        rows = np.flatnonzero(pd.Series(positions).isin(list(POSITION_TYPES)).to_numpy())
+        keys = position_keys(positions[rows], self.all_seasons[player_key_column(self.all_seasons)].to_numpy()[rows],
+                             self.all_seasons["season"].astype(str).to_numpy()[rows] if per_season else None)
+        positions[rows] = types.reindex(keys).to_numpy()
+        self.all_seasons["position"] = positions
+
+    def form_against_shift_opponent(self, as_of=False, aggregates=None):
         """
-        maps the midfielders into either attacking midfielder, i.e. 10"s or wingers, or defensive midfielder
-        important to note this isn"t completely accurate in mapping the defenders position
+        calculates the mean of the key metrics against the next opponent, falling back to the players rolling mean of
+        the metric when they have not played the opponent
+        the means are aggregated once per player and opponent and looked up by the player and next opponent of each
+        row, where the as of mode only aggregates the matches before the date of each row, and given the against
+        aggregates, e.g. of the seasons that no longer change combined with the current season, the rows are not
+        aggregated at all
+        :param as_of: bool
+        :param aggregates: pandas.core.frame.DataFrame
         :return: None
         """
-        defenders_creativity = self.all_seasons[(self.all_seasons["position"] == "MID")].groupby(
-            ["name"]).median(numeric_only=True).reset_index()
-        defenders_creativity["type_of_mid"] = ["AttMID" if creativity > 2 else "DefMID" for creativity in
-                                               defenders_creativity["threat"]]
-        gameweeks = self.all_seasons.merge(defenders_creativity[["name", "type_of_mid"]], on="name",
-                                           how="left")
-        self.all_seasons["position"] = np.where(gameweeks["position"] == "MID", gameweeks["type_of_mid"],
-                                                gameweeks["position"])
-
-    def form_against_shift_opponent(self):
+        metric_columns = list(AGAINST_OPPONENT_METRICS.keys())
+        if as_of:
+            means = self.means_against_opponent_as_of(metric_columns)
+        else:
+            aggregates = against_aggregates(self.all_seasons) if aggregates is None else aggregates
+            means = means_against_opponent(aggregates, self.all_seasons[player_key_column(self.all_seasons)].to_numpy(),
+                                           self.all_seasons["shift_opponent_id"].to_numpy())
+
+        for i, (against_column, mean_column) in enumerate(AGAINST_OPPONENT_METRICS.values()):
+            self.all_seasons[against_column] = means[:, i]
+            self.all_seasons[against_column] = self.all_seasons[against_column].fillna(self.all_seasons[mean_column])
+
+    def means_against_opponent_as_of(self, metric_columns):
         """
-        calculates the mean of the key metrics against the next opponent
-        :return: None
+        means the metrics of the players matches against their next opponent that were played before the date of each
+        row
+        the matches are sorted by date so the cumulative sums and counts within each player and opponent at the last
+        match before the date give the mean, without filtering the data for every row
+        :param metric_columns: list
+        :return: np.array
         """
-        points_ano, creativity_ano, threat_ano, influence_ano, bps_ano, goals_ano, assists_ano, conceded_ano = ([] for _
-                                                                                                                in
-                                                                                                                range(
-                                                                                                                    8))
-        zipped_opponent_info = zip(self.all_seasons["name"], self.all_seasons["shift_opponent"])
-        for player, opponent in tqdm(list(zipped_opponent_info)):
-            players_df = self.all_seasons[
-                (self.all_seasons["name"] == player) & (
-                    self.all_seasons["opponent_team"] == opponent)]
-            points_ano.append(players_df["total_points"].mean())
-            creativity_ano.append(players_df["creativity"].mean())
-            threat_ano.append(players_df["threat"].mean())
-            influence_ano.append(players_df["influence"].mean())
-            bps_ano.append(players_df["bps"].mean())
-            goals_ano.append(players_df["goals_scored"].mean())
-            assists_ano.append(players_df["assists"].mean())
-            conceded_ano.append(players_df["goals_conceded"].mean())
-        self.all_seasons["points_against_shift_opponent"] = points_ano
-        self.all_seasons["creativity_against_shift_opponent"] = creativity_ano
-        self.all_seasons["threat_against_shift_opponent"] = threat_ano
-        self.all_seasons["influence_against_shift_opponent"] = influence_ano
-        self.all_seasons["bps_against_shift_opponent"] = bps_ano
-        self.all_seasons["goals_against_shift_opponent"] = goals_ano
-        self.all_seasons["assists_against_shift_opponent"] = assists_ano
-        self.all_seasons["conceded_against_shift_opponent"] = conceded_ano
-        self.all_seasons["points_against_shift_opponent"] = self.all_seasons["points_against_shift_opponent"].fillna(
-            self.all_seasons["mean_total_points"])
-        self.all_seasons["creativity_against_shift_opponent"] = self.all_seasons[
-            "creativity_against_shift_opponent"].fillna(self.all_seasons["mean_creativity"])
-        self.all_seasons["threat_against_shift_opponent"] = self.all_seasons["threat_against_shift_opponent"].fillna(
-            self.all_seasons["mean_threat"])
-        self.all_seasons["influence_against_shift_opponent"] = self.all_seasons[
-            "influence_against_shift_opponent"].fillna(self.all_seasons["mean_influence"])
-        self.all_seasons["bps_against_shift_opponent"] = self.all_seasons["bps_against_shift_opponent"].fillna(
-            self.all_seasons["mean_bps"])
-        self.all_seasons["goals_against_shift_opponent"] = self.all_seasons["goals_against_shift_opponent"].fillna(
-            self.all_seasons["mean_goals"])
-        self.all_seasons["assists_against_shift_opponent"] = self.all_seasons["assists_against_shift_opponent"].fillna(
-            self.all_seasons["mean_assists"])
-        self.all_seasons["conceded_against_shift_opponent"] = self.all_seasons[
-            "conceded_against_shift_opponent"].fillna(self.all_seasons["mean_conceded"])
+        metrics = self.all_seasons[metric_columns].to_numpy(dtype=float)
+        dates = pd.to_datetime(self.all_seasons["date_of_match"]).to_numpy()
+        sum_columns = ["sum_" + metric for metric in metric_columns]
+        count_columns = ["count_" + metric for metric in metric_columns]
+        players = self.all_seasons[player_key_column(self.all_seasons)].to_numpy()
+
+        matches = pd.DataFrame({"player": players,
+                                "opponent": opponent_keys(self.all_seasons["opponent_id"]),
+                                "date_of_match": dates})
+        matches[sum_columns] = np.nan_to_num(metrics)
+        matches[count_columns] = (~np.isnan(metrics)).astype(float)
+        matches = matches.sort_values(by="date_of_match", kind="mergesort")
+        matches[sum_columns + count_columns] = matches.groupby(["player", "opponent"])[
+            sum_columns + count_columns].cumsum()
+
+        rows = pd.DataFrame({"player": players,
+                             "opponent": opponent_keys(self.all_seasons["shift_opponent_id"]),
+                             "date_of_match": dates,
+                             "row": np.arange(len(self.all_seasons))})
+        rows = rows.sort_values(by="date_of_match", kind="mergesort")
+        previous = pd.merge_asof(rows, matches, on="date_of_match", by=["player", "opponent"],
+                                 allow_exact_matches=False)
+
+        sums = previous[sum_columns].to_numpy(dtype=float)
+        counts = previous[count_columns].fillna(0).to_numpy(dtype=float)
+        means = np.empty(sums.shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[previous["row"].to_numpy()] = np.where(counts > 0, sums / counts, np.nan)
+        return means
 
     def only_take_minutes_played(self):
         """
@@ -102,11 +296,11 @@ class AllSeasons:
         :return: None
         """
         useful_columns = ["season", "name", "position", "plays_for", "shift_total_points_range", "shift_value",
-                          "shift_value_delta", "shift_opponent", "shift_win_expectation", "shift_month_of_match",
-                          "shift_time_of_match", "shift_was_home", "shift_mean_minutes", "shift_mean_total_points",
-                          "shift_mean_creativity", "shift_mean_threat", "shift_mean_influence", "shift_mean_bps",
-                          "shift_mean_goals", "shift_mean_assists", "shift_mean_conceded",
-                          "points_against_shift_opponent", "creativity_against_shift_opponent",
+                          "shift_value_delta", "shift_opponent", "shift_round", "shift_win_expectation",
+                          "shift_month_of_match", "shift_time_of_match", "shift_was_home", "shift_mean_minutes",
+                          "shift_mean_total_points", "shift_mean_creativity", "shift_mean_threat",
+                          "shift_mean_influence", "shift_mean_bps", "shift_mean_goals", "shift_mean_assists",
+                          "shift_mean_conceded", "points_against_shift_opponent", "creativity_against_shift_opponent",
                           "threat_against_shift_opponent", "influence_against_shift_opponent",
                           "bps_against_shift_opponent", "goals_against_shift_opponent",
                           "assists_against_shift_opponent", "conceded_against_shift_opponent"]
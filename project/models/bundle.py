@@ -0,0 +1,235 @@
+"""
+Class to keep a fitted model with everything needed to encode new predictors onto its training layout, saved as one
+versioned artifact.
+A bundle is a directory holding a json manifest, readable without loading the model, and a joblib file of the
+estimator, the fitted scaler, the category vocabulary of every categorical column and the training medians. The joblib
+file is uncompressed, so its large arrays, e.g. the trees of a forest, are memory mapped when the bundle is loaded.
+The schema hash identifies the training layout, so two bundles with the same hash encode predictors identically.
+A bundle whose estimator can be partially fitted is refreshed with newly labelled rows rather than refitted: the
+categories not seen before are given dummies after every existing feature, so the existing encoding keeps its shape,
+and the scaler's running minimum and maximum are updated before the estimator is partially fitted to the new rows.
+"""
+import datetime
+import hashlib
+import json
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy import sparse
+from project.models.season_store import SCHEMA
+from project.models.training import sparse_dummies
+
+# The version of the bundle format, raised whenever a bundle saved before cannot be loaded the same way.
+FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+MODEL_FILE = "model.joblib"
+
+
+def schema_hash(numerical_columns, categorical_columns, categories, extra_categories=()):
+    """
+    a hash of the training layout, the numerical columns and their types followed by the dummies of the categories
+    and then of the categories added since
+    :param numerical_columns: list
+    :param categorical_columns: list
+    :param categories: dict
+    :param extra_categories: list
+    :return: str
+    """
+    layout = {"numerical": [(column, SCHEMA.get(column)) for column in numerical_columns],
+              "categorical": [(column, [str(category) for category in categories[column]])
+                              for column in categorical_columns],
+              "extra": [(column, str(category)) for column, category in extra_categories]}
+    return hashlib.sha256(json.dumps(layout).encode()).hexdigest()
+
+
+class ModelBundle:
+    def __init__(self, estimator, transformer, numerical_columns, categorical_columns, categories, fill_values,
+                 metadata=None, trained_rows=None):
+        """
+        :param estimator: sklearn.base.BaseEstimator
+        :param transformer: sklearn.compose.ColumnTransformer
+        :param numerical_columns: list
+        :param categorical_columns: list
+        :param categories: dict
+        :param fill_values: dict
+        :param metadata: dict
+        :param trained_rows: dict
+        """
+        self.estimator = estimator
+        self.transformer = transformer
+        self.numerical_columns = list(numerical_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.categories = categories
+        self.extra_categories = []
+        self.fill_values = fill_values
+        self.metadata = metadata or {}
+        self.trained_rows = trained_rows or {}
+        self.update_layout()
+
+    @classmethod
+    def from_training(cls, training, estimator, transformer, metadata=None, trained_rows=None):
+        """
+        bundles an estimator and scaler fitted to the training data, which must have been dummified with sparse output
+        so its category vocabularies are known
+        given the row hashes of the training rows by season, a refresh only fits the rows not among them
+        :param training: Training
+        :param estimator: sklearn.base.BaseEstimator
+        :param transformer: sklearn.compose.ColumnTransformer
+        :param metadata: dict
+        :param trained_rows: dict
+        :return: ModelBundle
+        """
+        if training.categories is None:
+            raise ValueError("A model bundle needs the category vocabularies of the sparse dummies, dummify the "
+                             "training data with sparse_output=True")
+        return cls(estimator, transformer, training.numerical_columns, training.categorical_columns,
+                   training.categories, training.training_data[training.numerical_columns].median().to_dict(),
+                   metadata, trained_rows)
+
+    def update_layout(self):
+        """
+        sets the schema hash and feature names of the current layout
+        :return: None
+        """
+        self.schema_hash = schema_hash(self.numerical_columns, self.categorical_columns, self.categories,
+                                       self.extra_categories)
+        self.feature_names = (self.numerical_columns
+                              + ["{}_{}".format(column, category) for column in self.categorical_columns
+                                 for category in self.categories[column]]
+                              + ["{}_{}".format(column, category) for column, category in self.extra_categories])
+
+    def manifest(self):
+        """
+        :return: dict
+        """
+        return {"format_version": FORMAT_VERSION, "schema_hash": self.schema_hash,
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "sklearn_version": sklearn.__version__, "estimator": type(self.estimator).__name__,
+                "features": len(self.feature_names), "numerical_columns": self.numerical_columns,
+                "categorical_columns": self.categorical_columns, "extra_categories": len(self.extra_categories),
+                "trained_rows": sum(len(hashes) for hashes in self.trained_rows.values()), "metadata": self.metadata}
+
+    def save(self, path):
+        """
+        writes the bundle to its directory, replacing the manifest last so a reader never sees a manifest without its
+        model
+        :param path: str
+        :return: None
+        """
+        os.makedirs(path, exist_ok=True)
+        joblib.dump(self, os.path.join(path, MODEL_FILE + ".tmp"))
+        os.replace(os.path.join(path, MODEL_FILE + ".tmp"), os.path.join(path, MODEL_FILE))
+        with open(os.path.join(path, MANIFEST_FILE + ".tmp"), "w") as manifest_file:
+            json.dump(self.manifest(), manifest_file, indent=2, default=str)
+        os.replace(os.path.join(path, MANIFEST_FILE + ".tmp"), os.path.join(path, MANIFEST_FILE))
+
+    @staticmethod
+    def read_manifest(path):
+        """
+        :param path: str
+        :return: dict
+        """
+        with open(os.path.join(path, MANIFEST_FILE)) as manifest_file:
+            return json.load(manifest_file)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        loads a bundle, memory mapping its large arrays unless mmap is false
+        :param path: str
+        :param mmap: bool
+        :return: ModelBundle
+        """
+        manifest = cls.read_manifest(path)
+        if manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError("The model bundle at {} has format version {}, this code reads version {}".format(
+                path, manifest["format_version"], FORMAT_VERSION))
+        bundle = joblib.load(os.path.join(path, MODEL_FILE), mmap_mode="r" if mmap else None)
+        if bundle.schema_hash != manifest["schema_hash"]:
+            raise ValueError("The model bundle at {} does not match its manifest".format(path))
+        return bundle
+
+    def encode(self, predictors):
+        """
+        encodes the predictors onto the training layout, the scaled numerical columns followed by the dummies of the
+        training categories and of the categories added by refreshes, where missing numerical values are filled with
+        the training medians and a category not seen in training has no dummy
+        only the rows given are encoded, so the dummies never have to be rebuilt over the whole history
+        :param predictors: pandas.core.frame.DataFrame
+        :return: scipy.sparse.csr_matrix
+        """
+        missing_columns = [column for column in self.numerical_columns + self.categorical_columns
+                           if column not in predictors.columns]
+        if missing_columns:
+            raise KeyError("Columns {} of the model bundle are not in the predictors".format(missing_columns))
+        numerical = predictors[self.numerical_columns].fillna(self.fill_values)
+        dummies, _, _ = sparse_dummies(predictors, self.categorical_columns, self.categories)
+        return sparse.hstack([sparse.csr_matrix(self.transformer.transform(numerical)), dummies,
+                              self.extra_dummies(predictors)], format="csr")
+
+    def extra_dummies(self, predictors):
+        """
+        the dummies of the categories added by refreshes, in the order they were added
+        :param predictors: pandas.core.frame.DataFrame
+        :return: scipy.sparse.csr_matrix
+        """
+        extra_columns = pd.Series([column for column, _ in self.extra_categories], dtype=object)
+        extra_values = [category for _, category in self.extra_categories]
+        rows, columns = [], []
+        for column in extra_columns.unique():
+            positions = np.flatnonzero((extra_columns == column).to_numpy())
+            codes = pd.Categorical(predictors[column], categories=[extra_values[i] for i in positions]).codes
+            rows.append(np.flatnonzero(codes >= 0))
+            columns.append(positions[codes[codes >= 0]])
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        columns = np.concatenate(columns) if columns else np.empty(0, dtype=np.int64)
+        return sparse.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, columns)),
+                                 shape=(len(predictors), len(self.extra_categories)))
+
+    def extend_categories(self, predictors):
+        """
+        adds the categories of the predictors not in the vocabularies as dummies after every existing feature, and
+        gives the estimator a zero weight for each, so the existing features keep their columns and weights
+        :param predictors: pandas.core.frame.DataFrame
+        :return: int
+        """
+        new_categories = []
+        for column in self.categorical_columns:
+            known = set(self.categories[column]) | {category for extra_column, category in self.extra_categories
+                                                    if extra_column == column}
+            values = pd.Series(predictors[column].dropna().unique(), dtype=object)
+            new_categories += [(column, category) for category in sorted(values[~values.isin(known)].tolist())]
+        if new_categories:
+            coefficients = self.estimator.coef_
+            self.estimator.coef_ = np.pad(coefficients, [(0, 0)] * (coefficients.ndim - 1)
+                                          + [(0, len(new_categories))])
+            self.estimator.n_features_in_ += len(new_categories)
+            self.extra_categories += new_categories
+            self.update_layout()
+        return len(new_categories)
+
+    def refresh(self, predictors, labels, trained_rows):
+        """
+        updates the bundle with newly labelled rows: extends the vocabularies with their new categories, updates the
+        scaler's running minimum and maximum, and partially fits the estimator to the rows alone
+        :param predictors: pandas.core.frame.DataFrame
+        :param labels: pandas.core.frame.Series
+        :param trained_rows: dict
+        :return: dict
+        """
+        if not hasattr(self.estimator, "partial_fit") or getattr(self.estimator, "average", False):
+            raise ValueError("A {} cannot be refreshed, as it cannot be partially fitted without averaging, refit it "
+                             "with the grid search instead".format(type(self.estimator).__name__))
+        new_features = self.extend_categories(predictors)
+        numerical = predictors[self.numerical_columns].fillna(self.fill_values)
+        self.transformer.named_transformers_["numerical"].partial_fit(numerical)
+        self.estimator.partial_fit(self.encode(predictors), np.asarray(labels))
+        for season, hashes in trained_rows.items():
+            self.trained_rows[season] = np.union1d(self.trained_rows.get(season, np.empty(0, dtype=np.uint64)), hashes)
+
+        refresh = {"rows": len(predictors), "new_features": new_features,
+                   "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")}
+        self.metadata.setdefault("refreshes", []).append(refresh)
+        return refresh
@@ -1,8 +1,18 @@
 """
 Class to transform the end of season data.
 """
+from project.instrumentation import instrument
 
+# The columns of the end of season data read by the transformations, with the type each is parsed as.
+END_OF_SEASON_COLUMNS = {
+    "id": "int16",
+    "first_name": "str",
+    "second_name": "str",
+    "element_type": "int8"
+}
 
+
+@instrument("end_of_season")
 class EndOfSeason:
     def __init__(self, dataframe):
         """
@@ -15,8 +25,8 @@ class EndOfSeason:
         cleans the players names to align them with the end of season data
         :return: None
         """
-        zipped_player_names = zip(self.end_of_season["first_name"], self.end_of_season["second_name"])
-        self.end_of_season["name"] = [name[0].capitalize() + ' ' + name[1].capitalize() for name in zipped_player_names]
+        self.end_of_season["name"] = (self.end_of_season["first_name"].str.capitalize() + " "
+                                      + self.end_of_season["second_name"].str.capitalize())
 
     def map_position(self):
         """
@@ -1,10 +1,129 @@
 """
 Class to transform the gameweeks data.
 """
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
+from project.instrumentation import instrument
 
+# The columns of the raw gameweeks data read by the transformations, with the type each is parsed as, where a season may
+# not have them all. The other columns of the raw data are never read.
+GAMEWEEKS_COLUMNS = {
+    "name": "category",
+    "element": "int16",
+    "position": "category",
+    "team": "category",
+    "fixture": "int16",
+    "opponent_team": "int8",
+    "was_home": "bool",
+    "kickoff_time": "str",
+    "round": "int8",
+    "value": "int16",
+    "total_points": "int8",
+    "minutes": "int16",
+    "creativity": "float64",
+    "threat": "float64",
+    "influence": "float64",
+    "bps": "int16",
+    "goals_scored": "int8",
+    "assists": "int8",
+    "goals_conceded": "int8",
+    "saves": "int8",
+    "own_goals": "int8",
+    "penalties_missed": "int8",
+    "penalties_saved": "int8",
+    "clean_sheets": "int8",
+    "yellow_cards": "int8",
+    "red_cards": "int8"
+}
 
+# The columns of the game odds data read by fpl_teams and join_odds, out of the more than 100 bookmaker columns.
+ODDS_COLUMNS = {
+    "HomeTeam": "str",
+    "AwayTeam": "str",
+    "B365H": "float64",
+    "B365A": "float64",
+    "FTR": "str"
+}
+
+# The metrics meaned over a players previous matches, and the column each mean is stored in.
+ROLLING_METRICS = {
+    "total_points": "mean_total_points",
+    "minutes": "mean_minutes",
+    "creativity": "mean_creativity",
+    "threat": "mean_threat",
+    "influence": "mean_influence",
+    "bps": "mean_bps",
+    "goals_scored": "mean_goals",
+    "assists": "mean_assists",
+    "goals_conceded": "mean_conceded"
+}
+
+# The match info and key metrics shifted from a players next match, and the column each is shifted into.
+SHIFT_COLUMNS = {
+    "total_points_range": "shift_total_points_range",
+    "value": "shift_value",
+    "value_delta": "shift_value_delta",
+    "opponent_team": "shift_opponent",
+    "opponent_id": "shift_opponent_id",
+    "win_expectation": "shift_win_expectation",
+    "month_of_match": "shift_month_of_match",
+    "time_of_match": "shift_time_of_match",
+    "was_home": "shift_was_home",
+    "minutes": "shift_minutes",
+    "round": "shift_round",
+    "mean_minutes": "shift_mean_minutes",
+    "mean_total_points": "shift_mean_total_points",
+    "mean_creativity": "shift_mean_creativity",
+    "mean_threat": "shift_mean_threat",
+    "mean_influence": "shift_mean_influence",
+    "mean_bps": "shift_mean_bps",
+    "mean_goals": "shift_mean_goals",
+    "mean_assists": "shift_mean_assists",
+    "mean_conceded": "shift_mean_conceded"
+}
+
+
+def player_key_column(dataframe):
+    """
+    the column identifying the players, their player id once it is joined from the identity index, or else their FPL
+    element id, which is unique to a player within a season, or else their name
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: str
+    """
+    return next(column for column in ["player_id", "element", "name"] if column in dataframe.columns)
+
+
+def player_keys(dataframe):
+    """
+    the integer key of each rows player, numbered in order of appearance
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: np.array
+    """
+    return pd.factorize(dataframe[player_key_column(dataframe)])[0]
+
+
+def aligned_player_names(player_names):
+    """
+    the players names in the older seasons format, e.g. Mohamed_Salah_253, as in the end of season data
+    :param player_names: pandas.core.frame.Series
+    :return: pandas.core.frame.Series
+    """
+    split_player_names = player_names.str.split("_")
+    return split_player_names.str[0].str.capitalize() + " " + split_player_names.str[1].str.capitalize()
+
+
+def sort_by_player_and_kickoff(dataframe):
+    """
+    the positions of the rows sorted by player and then kickoff time, keeping the order of rows with equal keys
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: np.array
+    """
+    sort_keys = pd.DataFrame({"name": player_keys(dataframe),
+                              "kickoff_time": dataframe["kickoff_time"].array})
+    return sort_keys.sort_values(by=["name", "kickoff_time"], kind="mergesort").index.to_numpy()
+
+
+@instrument("gameweeks")
 class Gameweeks:
     def __init__(self, dataframe):
         """
@@ -19,112 +138,127 @@ class Gameweeks:
         """
         self.gameweeks["season"] = season
 
+    def add_player_ids(self, identity, season):
+        """
+        adds the players ids from the identity index, which identify a player across seasons
+        :param identity: IdentityIndex
+        :param season: str
+        :return: None
+        """
+        self.gameweeks["player_id"] = identity.player_ids(season, self.gameweeks["element"])
+
     def add_value_delta(self):
         """
         calculates the delta of the players value
         :return: None
         """
-        value_deltas = []
-        for player in self.gameweeks["name"].unique():
-            players_df = self.gameweeks[self.gameweeks["name"] == player]
-            value_deltas.append(players_df["value"].diff())
-        self.gameweeks["value_delta"] = pd.concat(value_deltas).sort_index()
-        self.gameweeks["value_delta"] = self.gameweeks["value_delta"].fillna(0)
+        self.gameweeks["value_delta"] = self.gameweeks.groupby(player_keys(self.gameweeks))["value"].diff().fillna(0)
 
     def align_player_names(self):
         """
-        cleans the players names to align them with the end of season data
+        cleans the players names to align them with the end of season data, keeping the element id at the end of the
+        name if the data has no element column
         :return: None
         """
-        player_names = self.gameweeks["name"]
-        split_player_names = [string.split(sep="_") for string in player_names]
-        self.gameweeks["name"] = [name[0].capitalize() + " " + name[1].capitalize() for name in split_player_names]
+        if "element" not in self.gameweeks.columns:
+            self.gameweeks["element"] = self.gameweeks["name"].str.rsplit("_", n=1).str[-1].astype(int)
+        self.gameweeks["name"] = aligned_player_names(self.gameweeks["name"])
 
     def join_position(self, end_of_season):
         """
-        joins the player position from the end of season data to the gameweeks data
+        joins the player position from the end of season data to the gameweeks data by the players element id, so
+        players who share a name are not joined to each others positions
         :param end_of_season: CleanEndOfSeason
         :return: None
         """
-        self.gameweeks = self.gameweeks.merge(end_of_season.end_of_season[["name", "position"]], on="name", how="left")
+        positions = end_of_season.end_of_season[["id", "position"]].rename(columns={"id": "element"})
+        self.gameweeks = self.gameweeks.merge(positions, on="element", how="left")
 
-    def map_opponent_team(self, game_odds):
+    def map_opponent_team(self, identity, season):
         """
-        maps the opponent team in the gameweeks data from an integer representing the teams position alphabetically in
-        the league using the team names in the game odds' data
-        :param game_odds: pandas.core.frame.DataFrame
+        maps the opponent team in the gameweeks data from the FPL team id of the season to its team id in the identity
+        index, which is the same in every season, along with its name in the game odds data
+        :param identity: IdentityIndex
+        :param season: str
         :return: None
         """
-        sorted_team_names = enumerate(sorted(game_odds["HomeTeam"].unique()))
-        team_name_dict = {key + 1: value for key, value in sorted_team_names}
-        self.gameweeks["opponent_team"] = self.gameweeks["opponent_team"].replace(team_name_dict)
+        self.gameweeks["opponent_id"] = identity.team_ids(season, self.gameweeks["opponent_team"])
+        self.gameweeks["opponent_team"] = identity.team_names(self.gameweeks["opponent_id"].to_numpy())
 
-    def add_teams(self):
+    def add_fixtures(self):
         """
-        using the distinct opponent teams in a fixture, we add the team the player plays for where the value is the
-        fixture team not equal to the opponent team
-        also, adds the home and away team, where the home team is the plays for team if the player was at home, and
-        the opponent team if not
+        builds a table of the home and away team of each fixture, where the home team is the opponent of the players
+        who were away and the away team is the opponent of the players who were at home
         :return: None
         """
-        fixture_ids = {}
-        for i in range(1, max(self.gameweeks["fixture"] + 1)):
-            fixture_ids[i] = set(self.gameweeks[self.gameweeks["fixture"] == i]["opponent_team"])
-
-        zipped_team_info = zip(self.gameweeks["was_home"], self.gameweeks["opponent_team"], self.gameweeks["fixture"])
-        plays_for, home_teams, away_teams = [], [], []
-        for was_home, opponent_team, fixture in zipped_team_info:
-            team_plays_for = [team for team in fixture_ids[fixture] if team != opponent_team][0]
-            plays_for.append(team_plays_for)
-            if was_home:
-                home_teams.append(team_plays_for)
-                away_teams.append(opponent_team)
-            else:
-                home_teams.append(opponent_team)
-                away_teams.append(team_plays_for)
+        opponents = self.gameweeks.groupby(["fixture", "was_home"])[["opponent_id", "opponent_team"]].first().unstack()
+        self.fixtures = pd.DataFrame({"home_id": opponents["opponent_id"][False],
+                                      "away_id": opponents["opponent_id"][True],
+                                      "HomeTeam": opponents["opponent_team"][False],
+                                      "AwayTeam": opponents["opponent_team"][True]})
 
-        self.gameweeks["plays_for"] = plays_for
-        self.gameweeks["HomeTeam"] = home_teams
-        self.gameweeks["AwayTeam"] = away_teams
+    def add_teams(self):
+        """
+        joins the home and away team ids of each fixture to the gameweeks data from the fixtures table, and adds the
+        team the player plays for, which is the home team if the player was at home and the away team if not
+        :return: None
+        """
+        self.add_fixtures()
+        fixture_teams = self.fixtures.reindex(self.gameweeks["fixture"])
+        was_home = self.gameweeks["was_home"].to_numpy()
+        self.gameweeks["team_id"] = np.where(was_home, fixture_teams["home_id"], fixture_teams["away_id"])
+        self.gameweeks["plays_for"] = np.where(was_home, fixture_teams["HomeTeam"], fixture_teams["AwayTeam"])
+        self.gameweeks["home_id"] = fixture_teams["home_id"].to_numpy()
+        self.gameweeks["away_id"] = fixture_teams["away_id"].to_numpy()
 
     def add_times_of_match(self):
         """
         convert the kickoff time to BST and then extract the date, month and time of the match
+        each distinct kickoff time, of which there is about one per fixture, is parsed once and its calendar features
+        are taken to the rows by the position of their kickoff time, where the date is a datetime64 column and the time
+        a categorical column of the kickoff time slots
         :return: None
         """
-        self.gameweeks["kickoff_time"] = pd.to_datetime(self.gameweeks["kickoff_time"], utc=True).dt.tz_convert(
-            "Europe/London")
-        self.gameweeks["date_of_match"] = self.gameweeks["kickoff_time"].dt.date
-        self.gameweeks["month_of_match"] = self.gameweeks["kickoff_time"].dt.month
-        self.gameweeks["time_of_match"] = self.gameweeks["kickoff_time"].dt.strftime("%H:%M")
+        rows, kickoff_times = pd.factorize(self.gameweeks["kickoff_time"])
+        # a missing kickoff time has the code -1, which takes the missing time appended after the distinct times
+        kickoff_times = pd.DatetimeIndex(pd.to_datetime(np.append(np.asarray(kickoff_times, dtype=object), None),
+                                                        utc=True)).tz_convert("Europe/London")
+        time_slots, slot_names = pd.factorize(kickoff_times.strftime("%H:%M"), sort=True)
+        self.gameweeks["kickoff_time"] = kickoff_times.take(rows)
+        self.gameweeks["date_of_match"] = kickoff_times.tz_localize(None).normalize().to_numpy()[rows]
+        self.gameweeks["month_of_match"] = kickoff_times.month.to_numpy()[rows]
+        self.gameweeks["time_of_match"] = pd.Categorical.from_codes(time_slots[rows], slot_names)
 
-    def join_odds(self, game_odds):
+    def join_odds(self, game_odds, identity):
         """
-        joins the BET365 home and away team odds to win the match from the game odds data to the gameweeks data
+        joins the BET365 home and away team odds to win the match from the game odds data to the gameweeks data, by the
+        team ids of the home and away teams
         :param game_odds: pandas.core.frame.DataFrame
+        :param identity: IdentityIndex
         :return: None
         """
-        self.gameweeks = self.gameweeks.merge(game_odds[["HomeTeam", "AwayTeam", "B365H", "B365A", "FTR"]],
-                                              on=["HomeTeam", "AwayTeam"], how="left")
+        game_odds = game_odds[list(ODDS_COLUMNS)].assign(home_id=identity.named_team_ids(game_odds["HomeTeam"]),
+                                                         away_id=identity.named_team_ids(game_odds["AwayTeam"]))
+        self.gameweeks = self.gameweeks.merge(game_odds.drop(columns=["HomeTeam", "AwayTeam"]),
+                                              on=["home_id", "away_id"], how="left")
 
     def add_win_expectation(self):
         """
         adds the win expectation of the players team from the BET365 odds
         :return: None
         """
-        zipped_bet_odds = zip(self.gameweeks["was_home"], self.gameweeks["B365H"], self.gameweeks["B365A"])
-        self.gameweeks["win_expectation"] = [B365A / B365H if was_home else B365H / B365A for was_home, B365H, B365A in
-                                             zipped_bet_odds]
+        self.gameweeks["win_expectation"] = np.where(self.gameweeks["was_home"],
+                                                     self.gameweeks["B365A"] / self.gameweeks["B365H"],
+                                                     self.gameweeks["B365H"] / self.gameweeks["B365A"])
 
     def add_won(self):
         """
-        adds a boolean column that's true if the players team won the match
+        adds a column that's 1 if the players team won the match, 0 if it was a draw and -1 if not
         :return: None
         """
-        home_or_away = ["H" if was_home else "A" for was_home in self.gameweeks["was_home"]]
-        zipped_results = zip(home_or_away, self.gameweeks["FTR"])
-        self.gameweeks["is_won"] = [0 if ftr == "D" else 1 if home_or_away == ftr else -1 for home_or_away, ftr in
-                                    zipped_results]
+        players_result = np.where(self.gameweeks["was_home"], "H", "A")
+        self.gameweeks["is_won"] = np.select([self.gameweeks["FTR"] == "D", self.gameweeks["FTR"] == players_result],
+                                             [0, 1], -1)
 
     def add_total_points_range(self):
         """
@@ -135,106 +269,76 @@ class Gameweeks:
         self.gameweeks["total_points_range"] = pd.cut(total_points, [total_points.min()-1, 0, 1, 4, 10,
                                                                      total_points.max()+1], labels=[0, 1, 2, 3, 4])
     
-    def rolling_mean_metrics(self):
-        """
-        takes the players 3 matches prior to the gameweek and means their metrics for a representation of their form
-        :return: None
-        """
-        mean_points, mean_minutes, mean_creativity, mean_threat, mean_influence, mean_bps, mean_goals, mean_assists, \
-            mean_conceded = ([] for _ in range(9))
-        zipped_names = zip(self.gameweeks["name"], self.gameweeks["date_of_match"])
-        for player, date in tqdm(list(zipped_names)):
-            players_df = self.gameweeks[
-                             (self.gameweeks["name"] == player) & (self.gameweeks["date_of_match"] < date)][
-                         :3]
-            mean_points.append(players_df["total_points"].mean())
-            mean_minutes.append(players_df["minutes"].mean())
-            mean_creativity.append(players_df["creativity"].mean())
-            mean_threat.append(players_df["threat"].mean())
-            mean_influence.append(players_df["influence"].mean())
-            mean_bps.append(players_df["bps"].mean())
-            mean_goals.append(players_df["goals_scored"].mean())
-            mean_assists.append(players_df["assists"].mean())
-            mean_conceded.append(players_df["goals_conceded"].mean())
-        self.gameweeks["mean_total_points"] = mean_points
-        self.gameweeks["mean_minutes"] = mean_minutes
-        self.gameweeks["mean_creativity"] = mean_creativity
-        self.gameweeks["mean_threat"] = mean_threat
-        self.gameweeks["mean_influence"] = mean_influence
-        self.gameweeks["mean_bps"] = mean_bps
-        self.gameweeks["mean_goals"] = mean_goals
-        self.gameweeks["mean_assists"] = mean_assists
-        self.gameweeks["mean_conceded"] = mean_conceded
-        self.gameweeks["mean_total_points"] = self.gameweeks["mean_total_points"].fillna(
-            self.gameweeks["total_points"])
-        self.gameweeks["mean_minutes"] = self.gameweeks["mean_minutes"].fillna(self.gameweeks["minutes"])
-        self.gameweeks["mean_creativity"] = self.gameweeks["mean_creativity"].fillna(self.gameweeks["creativity"])
-        self.gameweeks["mean_threat"] = self.gameweeks["mean_threat"].fillna(self.gameweeks["threat"])
-        self.gameweeks["mean_influence"] = self.gameweeks["mean_influence"].fillna(self.gameweeks["influence"])
-        self.gameweeks["mean_bps"] = self.gameweeks["mean_bps"].fillna(self.gameweeks["bps"])
-        self.gameweeks["mean_goals"] = self.gameweeks["mean_goals"].fillna(self.gameweeks["goals_scored"])
-        self.gameweeks["mean_assists"] = self.gameweeks["mean_assists"].fillna(self.gameweeks["assists"])
-        self.gameweeks["mean_conceded"] = self.gameweeks["mean_conceded"].fillna(self.gameweeks["goals_conceded"])
+    def rolling_mean_metrics(self, window=3):
+        """
+        takes the players matches prior to the date of the match, up to the window size, and means their metrics for a
+        representation of their form, falling back to the match's own metrics when there are no prior matches
+        the gameweeks are sorted once by player and kickoff time so each mean is read from the sorted metrics in a
+        single pass rather than filtering the data for every row
+        :param window: int
+        :return: None
+        """
+        metric_columns = list(ROLLING_METRICS.keys())
+        order = sort_by_player_and_kickoff(self.gameweeks)
+        names = player_keys(self.gameweeks)[order]
+        dates = pd.factorize(self.gameweeks["date_of_match"])[0][order]
+
+        positions = np.arange(len(order))
+        new_player = np.r_[True, names[1:] != names[:-1]]
+        new_date = new_player | np.r_[True, dates[1:] != dates[:-1]]
+        player_start = np.maximum.accumulate(np.where(new_player, positions, 0))
+        # matches on the same date as the current match are not prior to it, so the window ends at the first of them
+        window_end = np.maximum.accumulate(np.where(new_date, positions, 0))
+        window_start = np.maximum(player_start, window_end - window)
+
+        metrics = self.gameweeks[metric_columns].to_numpy(dtype=float)[order]
+        sums = np.zeros(metrics.shape)
+        counts = np.zeros(metrics.shape)
+        for lag in range(window, 0, -1):
+            previous = window_end - lag
+            in_window = previous >= window_start
+            previous_metrics = metrics[np.where(in_window, previous, 0)]
+            is_counted = in_window[:, None] & ~np.isnan(previous_metrics)
+            sums += np.where(is_counted, previous_metrics, 0)
+            counts += is_counted
+
+        means = np.empty(metrics.shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[order] = np.where(counts > 0, sums / counts, np.nan)
+
+        for i, (metric, mean_column) in enumerate(ROLLING_METRICS.items()):
+            self.gameweeks[mean_column] = means[:, i]
+            self.gameweeks[mean_column] = self.gameweeks[mean_column].fillna(self.gameweeks[metric])
 
     def shift_match_info(self):
         """
         shift match info and key metrics for each player for their next game
+        the gameweeks are sorted once by player and kickoff time and every column in SHIFT_COLUMNS is shifted back one
+        match within each player together
         :return: None
         """
-        shift_points_range, shift_value, shift_value_delta, shift_opponent, shift_we, shift_mean_minutes, shift_mom, \
-            shift_tom, shift_home, shift_mean_points, shift_mean_creativity, shift_mean_threat, shift_mean_influence, \
-            shift_mean_bps, shift_mean_goals, shift_mean_assists, shift_mean_conceded = ([] for _ in range(17))
-        for player in tqdm(list(self.gameweeks["name"].unique())):
-            players_df = self.gameweeks[self.gameweeks["name"] == player].sort_values(by="date_of_match", ascending=False)
-            shift_points_range.append(players_df["total_points_range"].shift())
-            shift_value.append(players_df["value"].shift())
-            shift_value_delta.append(players_df["value_delta"].shift())
-            shift_opponent.append(players_df["opponent_team"].shift())
-            shift_we.append(players_df["win_expectation"].shift())
-            shift_mom.append(players_df["month_of_match"].shift())
-            shift_tom.append(players_df["time_of_match"].shift())
-            shift_home.append(players_df["was_home"].shift())
-            shift_mean_minutes.append(players_df["mean_minutes"].shift())
-            shift_mean_points.append(players_df["mean_total_points"].shift())
-            shift_mean_creativity.append(players_df["mean_creativity"].shift())
-            shift_mean_threat.append(players_df["mean_threat"].shift())
-            shift_mean_influence.append(players_df["mean_influence"].shift())
-            shift_mean_bps.append(players_df["mean_bps"].shift())
-            shift_mean_goals.append(players_df["mean_goals"].shift())
-            shift_mean_assists.append(players_df["mean_assists"].shift())
-            shift_mean_conceded.append(players_df["mean_conceded"].shift())
-        self.gameweeks["shift_total_points_range"] = pd.concat(shift_points_range).sort_index()
-        self.gameweeks["shift_value"] = pd.concat(shift_value).sort_index()
-        self.gameweeks["shift_value_delta"] = pd.concat(shift_value_delta).sort_index()
-        self.gameweeks["shift_opponent"] = pd.concat(shift_opponent).sort_index()
-        self.gameweeks["shift_win_expectation"] = pd.concat(shift_we).sort_index()
-        self.gameweeks["shift_month_of_match"] = pd.concat(shift_mom).sort_index()
-        self.gameweeks["shift_time_of_match"] = pd.concat(shift_tom).sort_index()
-        self.gameweeks["shift_was_home"] = pd.concat(shift_home).sort_index()
-        self.gameweeks["shift_mean_minutes"] = pd.concat(shift_mean_minutes).sort_index()
-        self.gameweeks["shift_mean_total_points"] = pd.concat(shift_mean_points).sort_index()
-        self.gameweeks["shift_mean_creativity"] = pd.concat(shift_mean_creativity).sort_index()
-        self.gameweeks["shift_mean_threat"] = pd.concat(shift_mean_threat).sort_index()
-        self.gameweeks["shift_mean_influence"] = pd.concat(shift_mean_influence).sort_index()
-        self.gameweeks["shift_mean_bps"] = pd.concat(shift_mean_bps).sort_index()
-        self.gameweeks["shift_mean_goals"] = pd.concat(shift_mean_goals).sort_index()
-        self.gameweeks["shift_mean_assists"] = pd.concat(shift_mean_assists).sort_index()
-        self.gameweeks["shift_mean_conceded"] = pd.concat(shift_mean_conceded).sort_index()
+        order = sort_by_player_and_kickoff(self.gameweeks)
+        players = player_keys(self.gameweeks)[order]
+        next_match = self.gameweeks[list(SHIFT_COLUMNS.keys())].iloc[order].groupby(players).shift(-1)
+        next_match = next_match.iloc[np.argsort(order)].set_axis(self.gameweeks.index)
+        for column, shift_column in SHIFT_COLUMNS.items():
+            self.gameweeks[shift_column] = next_match[column]
 
     def take_useful_columns(self):
         """
         removes all depreciated columns
         :return: None
         """
-        useful_columns = ["season", "name", "position", "value", "value_delta", "minutes", "total_points",
-                          "total_points_range", "assists", "goals_scored", "goals_conceded", "saves", "own_goals",
-                          "penalties_missed", "penalties_saved", "clean_sheets", "creativity", "threat", "influence",
-                          "bps", "minutes", "yellow_cards", "red_cards", "plays_for", "opponent_team", "was_home",
-                          "is_won", "month_of_match", "time_of_match", "win_expectation", "date_of_match",
-                          "mean_total_points", "mean_minutes", "mean_creativity", "mean_threat", "mean_influence",
-                          "mean_bps", "mean_goals", "mean_assists", "mean_conceded", "shift_total_points_range",
-                          "shift_value", "shift_value_delta", "shift_opponent", "shift_win_expectation",
-                          "shift_month_of_match", "shift_time_of_match", "shift_was_home", "shift_mean_minutes",
+        useful_columns = ["season", "round", "name", "player_id", "position", "value", "value_delta", "minutes",
+                          "total_points", "total_points_range", "assists", "goals_scored", "goals_conceded", "saves",
+                          "own_goals", "penalties_missed", "penalties_saved", "clean_sheets", "creativity", "threat",
+                          "influence", "bps", "yellow_cards", "red_cards", "plays_for", "team_id", "opponent_team",
+                          "opponent_id", "was_home", "is_won", "month_of_match", "time_of_match", "win_expectation",
+                          "date_of_match", "mean_total_points", "mean_minutes", "mean_creativity", "mean_threat",
+                          "mean_influence", "mean_bps", "mean_goals", "mean_assists", "mean_conceded",
+                          "shift_total_points_range", "shift_value", "shift_value_delta", "shift_opponent",
+                          "shift_opponent_id", "shift_win_expectation", "shift_month_of_match", "shift_time_of_match",
+                          "shift_was_home", "shift_minutes", "shift_round", "shift_mean_minutes",
                           "shift_mean_total_points", "shift_mean_creativity", "shift_mean_threat",
                           "shift_mean_influence", "shift_mean_bps", "shift_mean_goals", "shift_mean_assists",
                           "shift_mean_conceded"]
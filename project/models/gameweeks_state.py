@@ -0,0 +1,156 @@
+"""
+Class to keep the per player state of a seasons transformed gameweeks data, so that newly appended gameweeks can be
+transformed without transforming the whole season again.
+"""
+import numpy as np
+import pandas as pd
+from project.models.gameweeks import Gameweeks, SHIFT_COLUMNS, sort_by_player_and_kickoff, player_key_column
+
+
+def hash_rows(dataframe):
+    """
+    a hash of the rows of the raw gameweeks data, used to check the rows already transformed have not changed
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: int
+    """
+    return int(pd.util.hash_pandas_object(dataframe, index=False).sum())
+
+
+class GameweeksState:
+    def __init__(self, history, history_rows, rows_processed, rows_hash, window=3):
+        """
+        :param history: pandas.core.frame.DataFrame
+        :param history_rows: np.array
+        :param rows_processed: int
+        :param rows_hash: int
+        :param window: int
+        """
+        self.history = history
+        self.history_rows = history_rows
+        self.rows_processed = rows_processed
+        self.rows_hash = rows_hash
+        self.window = window
+
+    @classmethod
+    def from_gameweeks(cls, dataframe, window=3):
+        """
+        builds the state from all the raw gameweeks data of the season transformed so far
+        :param dataframe: pandas.core.frame.DataFrame
+        :param window: int
+        :return: GameweeksState
+        """
+        rows = np.arange(len(dataframe))
+        history = select_history(dataframe, window)
+        return cls(dataframe.iloc[history].reset_index(drop=True), rows[history], len(dataframe),
+                   hash_rows(dataframe), window)
+
+    def can_extend(self, dataframe):
+        """
+        the raw gameweeks data can be transformed incrementally if the rows already transformed are unchanged, and
+        no new match kicks off before a players latest match
+        :param dataframe: pandas.core.frame.DataFrame
+        :return: bool
+        """
+        if len(dataframe) < self.rows_processed or hash_rows(dataframe.iloc[:self.rows_processed]) != self.rows_hash:
+            return False
+        key = player_key_column(self.history)
+        latest_kickoffs = pd.to_datetime(self.history["kickoff_time"], utc=True).groupby(self.history[key]).max()
+        new_kickoffs = pd.to_datetime(dataframe["kickoff_time"].iloc[self.rows_processed:], utc=True)
+        previous_kickoffs = latest_kickoffs.reindex(dataframe[key].iloc[self.rows_processed:]).to_numpy()
+        return not (new_kickoffs.to_numpy() < previous_kickoffs).any()
+
+    def combine(self, dataframe):
+        """
+        the history rows followed by the new rows of the raw gameweeks data, in the order of the raw data
+        :param dataframe: pandas.core.frame.DataFrame
+        :return: pandas.core.frame.DataFrame
+        """
+        new_rows = dataframe.iloc[self.rows_processed:]
+        return pd.concat([self.history, new_rows], ignore_index=True)
+
+    def pending_rows(self):
+        """
+        the positions in the history of each players latest match, whose shifted next match info is pending
+        :return: np.array
+        """
+        key = player_key_column(self.history)
+        matches = pd.DataFrame({key: self.history[key],
+                                "kickoff_time": pd.to_datetime(self.history["kickoff_time"], utc=True)})
+        order = sort_by_player_and_kickoff(matches)
+        players = pd.factorize(matches[key])[0][order]
+        is_latest = np.r_[players[1:] != players[:-1], True]
+        return np.sort(order[is_latest])
+
+    def update_clean_rows(self, clean, transformed):
+        """
+        updates the clean gameweeks with the transformed history and new rows, where the shifted columns of the
+        pending rows are overwritten and the new rows are appended
+        :param clean: pandas.core.frame.DataFrame
+        :param transformed: pandas.core.frame.DataFrame
+        :return: pandas.core.frame.DataFrame
+        """
+        pending = self.pending_rows()
+        players = transformed[player_key_column(transformed)]
+        pending = pending[players.iloc[pending].isin(players.iloc[len(self.history):])]
+        clean = clean.astype({column: object for column in clean.columns if clean[column].dtype == "category"})
+        for column in SHIFT_COLUMNS.values():
+            clean_column = clean.columns.get_loc(column)
+            clean.iloc[self.history_rows[pending], clean_column] = transformed[column].iloc[pending].to_numpy()
+        return pd.concat([clean, transformed.iloc[len(self.history):]], ignore_index=True)
+
+    def advance(self, dataframe):
+        """
+        moves the state on to include the new rows of the raw gameweeks data
+        :param dataframe: pandas.core.frame.DataFrame
+        :return: None
+        """
+        combined = self.combine(dataframe)
+        rows = np.r_[self.history_rows, np.arange(self.rows_processed, len(dataframe))]
+        history = select_history(combined, self.window)
+        self.history = combined.iloc[history].reset_index(drop=True)
+        self.history_rows = rows[history]
+        self.rows_processed = len(dataframe)
+        self.rows_hash = hash_rows(dataframe)
+
+    def save(self, path):
+        """
+        :param path: str
+        :return: None
+        """
+        pd.to_pickle(self, path)
+
+    @staticmethod
+    def load(path):
+        """
+        :param path: str
+        :return: GameweeksState
+        """
+        return pd.read_pickle(path)
+
+
+def select_history(dataframe, window):
+    """
+    the positions of the raw gameweeks rows needed to transform a players next matches: their matches on their latest
+    date and the window of matches before it for the rolling means, and their last row for the value delta
+    :param dataframe: pandas.core.frame.DataFrame
+    :param window: int
+    :return: np.array
+    """
+    key = player_key_column(dataframe)
+    matches = Gameweeks(dataframe[[key, "kickoff_time"]].copy())
+    matches.add_times_of_match()
+    order = sort_by_player_and_kickoff(matches.gameweeks)
+    players = pd.factorize(matches.gameweeks[key])[0][order]
+    dates = pd.factorize(matches.gameweeks["date_of_match"])[0][order]
+
+    positions = np.arange(len(order))
+    new_date = np.r_[True, (players[1:] != players[:-1]) | (dates[1:] != dates[:-1])]
+    date_start = np.maximum.accumulate(np.where(new_date, positions, 0))
+    is_latest = np.r_[players[1:] != players[:-1], True]
+    latest_date_start = pd.Series(date_start[is_latest], index=players[is_latest]).reindex(players).to_numpy()
+    in_window = positions >= latest_date_start - window
+
+    last_rows = ~dataframe[key].duplicated(keep="last").to_numpy()
+    history = np.zeros(len(dataframe), dtype=bool)
+    history[order[in_window]] = True
+    return np.flatnonzero(history | last_rows)
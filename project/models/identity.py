@@ -0,0 +1,209 @@
+"""
+Class to keep a persistent index of the players and teams across seasons as stable integer ids.
+A player is identified within a season by their FPL element id, and linked to the same player in other seasons by
+their FPL code where the end of season data gives it, or else by their normalized name when only one player in the
+index and one player in the season have that name, or else by their normalized name and team when that pair is unique,
+so players who share a name keep separate ids.
+Teams are identified by their name in the game odds data, with the other names the FPL data uses for them as aliases,
+and linked to the FPL team id they have in each season, which is what the gameweeks data gives as the opponent.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+# The names the FPL data uses for a team that differ from its name in the game odds data.
+TEAM_ALIASES = {
+    "Man Utd": "Man United",
+    "Sheffield Utd": "Sheffield United",
+    "Spurs": "Tottenham"
+}
+
+PLAYERS_COLUMNS = ["player_id", "season", "element", "code", "name", "normalized_name", "team"]
+TEAMS_COLUMNS = ["team_id", "season", "fpl_team", "name"]
+
+
+def normalize_names(names):
+    """
+    normalizes the names for matching, removing accents, case, punctuation and repeated spaces
+    :param names: pandas.core.frame.Series
+    :return: pandas.core.frame.Series
+    """
+    return (names.astype(str).str.normalize("NFKD").str.encode("ascii", errors="ignore").str.decode("ascii")
+            .str.lower().str.replace(r"[^a-z]+", " ", regex=True).str.strip())
+
+
+def canonical_team_names(names):
+    """
+    the game odds name of each team name
+    :param names: pandas.core.frame.Series
+    :return: pandas.core.frame.Series
+    """
+    return names.replace(TEAM_ALIASES)
+
+
+def fpl_teams(gameweeks, game_odds):
+    """
+    the FPL team id of each team of the season, with its name
+    where the gameweeks data has the team of each player, a team's id is the opponent of the players on the other side
+    of its fixtures, taking the name most of its players have, as a player transferred away keeps their new team, and
+    otherwise the ids number the teams of the game odds data alphabetically, as the FPL api does
+    :param gameweeks: pandas.core.frame.DataFrame
+    :param game_odds: pandas.core.frame.DataFrame
+    :return: pandas.core.frame.DataFrame
+    """
+    if "team" not in gameweeks.columns:
+        names = np.sort(game_odds["HomeTeam"].unique())
+        return pd.DataFrame({"fpl_team": np.arange(1, len(names) + 1), "name": names})
+    sides = gameweeks[["fixture", "was_home", "team", "opponent_team"]]
+    opponents = sides.drop_duplicates(["fixture", "was_home"]).set_index(["fixture", "was_home"])["opponent_team"]
+    fpl_team = opponents.reindex(pd.MultiIndex.from_arrays([sides["fixture"], ~sides["was_home"]])).to_numpy()
+    teams = pd.DataFrame({"fpl_team": fpl_team, "name": sides["team"].astype(str).to_numpy()}).dropna()
+    teams = teams.groupby(["fpl_team", "name"]).size().rename("players").reset_index()
+    teams = teams.sort_values("players", ascending=False, kind="mergesort").drop_duplicates("fpl_team")
+    if teams["name"].duplicated().any():
+        raise ValueError("Teams {} of the gameweeks data have more than one FPL team id".format(
+            sorted(teams.loc[teams["name"].duplicated(), "name"])))
+    return teams.astype({"fpl_team": int}).sort_values("fpl_team")[["fpl_team", "name"]].reset_index(drop=True)
+
+
+class IdentityIndex:
+    def __init__(self, players=None, teams=None):
+        """
+        :param players: pandas.core.frame.DataFrame
+        :param teams: pandas.core.frame.DataFrame
+        """
+        self.players = pd.DataFrame(columns=PLAYERS_COLUMNS) if players is None else players
+        self.teams = pd.DataFrame(columns=TEAMS_COLUMNS) if teams is None else teams
+
+    @classmethod
+    def load(cls, path):
+        """
+        loads the index from its directory, or an empty index if it has not been saved
+        :param path: str
+        :return: IdentityIndex
+        """
+        if not os.path.exists(os.path.join(path, "players.csv")):
+            return cls()
+        players = pd.read_csv(os.path.join(path, "players.csv"), dtype={"season": str, "name": str,
+                                                                         "normalized_name": str, "team": str})
+        players["code"] = players["code"].astype("Int64")
+        teams_path = os.path.join(path, "teams.csv")
+        teams = pd.read_csv(teams_path, dtype={"season": str, "name": str}) if os.path.exists(teams_path) else None
+        return cls(players, teams)
+
+    def save(self, path):
+        """
+        :param path: str
+        :return: None
+        """
+        os.makedirs(path, exist_ok=True)
+        self.players.sort_values(["player_id", "season"]).to_csv(os.path.join(path, "players.csv"), index=False)
+        self.teams.sort_values(["team_id", "season"]).to_csv(os.path.join(path, "teams.csv"), index=False)
+
+    def add_season(self, season, season_players):
+        """
+        gives each player of the season a player id, keeping the id of a player already in the index
+        the players of the season have the columns element and name, and code and team where they are known
+        :param season: str
+        :param season_players: pandas.core.frame.DataFrame
+        :return: None
+        """
+        season_players = season_players.drop_duplicates("element").reset_index(drop=True)
+        missing = pd.Series(pd.NA, season_players.index, dtype=object)
+        codes = season_players["code"] if "code" in season_players.columns else missing
+        teams = canonical_team_names(season_players["team"]) if "team" in season_players.columns else missing
+        season_players = pd.DataFrame({"season": season, "element": season_players["element"].astype(int),
+                                       "code": codes.astype("Int64"), "name": season_players["name"].astype(str),
+                                       "normalized_name": normalize_names(season_players["name"]), "team": teams})
+
+        known = self.players[self.players["season"] == season].set_index("element")["player_id"]
+        player_ids = season_players["element"].map(known)
+
+        # Link by code, then by a name, then by a name and team, unique to one player in both the index and the season.
+        other_seasons = self.players[self.players["season"] != season].sort_values("season")
+        codes = other_seasons.dropna(subset=["code"]).drop_duplicates("code").set_index("code")["player_id"]
+        player_ids = player_ids.fillna(season_players["code"].map(codes).astype(float))
+        latest_seasons = other_seasons.drop_duplicates("player_id", keep="last")
+        for keys in [["normalized_name"], ["normalized_name", "team"]]:
+            index_players = latest_seasons.dropna(subset=keys)
+            index_players = index_players[~index_players.duplicated(keys, keep=False)]
+            by_keys = season_players[keys].merge(index_players[keys + ["player_id"]], on=keys, how="left")["player_id"]
+            by_keys = by_keys.where(~season_players.duplicated(keys, keep=False).to_numpy())
+            by_keys = by_keys.where(~by_keys.isin(player_ids.dropna()))
+            player_ids = player_ids.fillna(by_keys)
+
+        is_new = player_ids.isna().to_numpy()
+        next_id = int(self.players["player_id"].max()) + 1 if len(self.players) else 1
+        player_ids[is_new] = np.arange(next_id, next_id + is_new.sum())
+        season_players.insert(0, "player_id", player_ids.astype(int))
+
+        self.players = pd.concat([self.players[self.players["season"] != season], season_players],
+                                 ignore_index=True)[PLAYERS_COLUMNS]
+
+    def player_ids(self, season, elements):
+        """
+        the player id of each element of the season
+        :param season: str
+        :param elements: pandas.core.frame.Series
+        :return: np.array
+        """
+        season_ids = self.players[self.players["season"] == season].set_index("element")["player_id"]
+        player_ids = season_ids.reindex(elements.astype(int).to_numpy())
+        if player_ids.isna().any():
+            missing = sorted(set(elements[player_ids.isna().to_numpy()].astype(int)))
+            raise KeyError("Elements {} of season {} are not in the identity index".format(missing, season))
+        return player_ids.to_numpy(dtype=np.int32)
+
+    def add_teams(self, season, season_teams):
+        """
+        links the FPL team ids of the season to team ids, keeping the id of a team already in the index by its name,
+        and giving the new teams the next ids in alphabetical order
+        :param season: str
+        :param season_teams: pandas.core.frame.DataFrame
+        :return: None
+        """
+        season_teams = pd.DataFrame({"season": season, "fpl_team": season_teams["fpl_team"].astype(int).to_numpy(),
+                                     "name": canonical_team_names(season_teams["name"].astype(str)).to_numpy()})
+        known = self.teams.drop_duplicates("name").set_index("name")["team_id"]
+        new_names = np.sort(season_teams.loc[~season_teams["name"].isin(known.index), "name"].unique())
+        next_id = int(self.teams["team_id"].max()) + 1 if len(self.teams) else 1
+        known = pd.concat([known, pd.Series(np.arange(next_id, next_id + len(new_names)), index=new_names)])
+        season_teams.insert(0, "team_id", season_teams["name"].map(known).astype(int))
+
+        self.teams = pd.concat([self.teams[self.teams["season"] != season], season_teams],
+                               ignore_index=True)[TEAMS_COLUMNS]
+
+    def team_ids(self, season, fpl_teams):
+        """
+        the team id of each FPL team id of the season
+        :param season: str
+        :param fpl_teams: pandas.core.frame.Series
+        :return: np.array
+        """
+        season_ids = self.teams[self.teams["season"] == season].set_index("fpl_team")["team_id"]
+        team_ids = season_ids.reindex(fpl_teams.astype(int).to_numpy())
+        if team_ids.isna().any():
+            missing = sorted(set(fpl_teams[team_ids.isna().to_numpy()].astype(int)))
+            raise KeyError("FPL teams {} of season {} are not in the identity index".format(missing, season))
+        return team_ids.to_numpy(dtype=np.int16)
+
+    def named_team_ids(self, names):
+        """
+        the team id of each team name, in the game odds data or the FPL data
+        :param names: pandas.core.frame.Series
+        :return: np.array
+        """
+        ids = self.teams.drop_duplicates("name").set_index("name")["team_id"]
+        team_ids = ids.reindex(canonical_team_names(pd.Series(names).astype(str)).to_numpy())
+        if team_ids.isna().any():
+            missing = sorted(set(pd.Series(names)[team_ids.isna().to_numpy()].astype(str)))
+            raise KeyError("Teams {} are not in the identity index".format(missing))
+        return team_ids.to_numpy(dtype=np.int16)
+
+    def team_names(self, team_ids):
+        """
+        the game odds name of each team id
+        :param team_ids: np.array
+        :return: np.array
+        """
+        return self.teams.drop_duplicates("team_id").set_index("team_id")["name"].reindex(team_ids).to_numpy()
@@ -1,3 +1,149 @@
 """
-Class to transform the predictors data.
+Class to build the predictors of the next FPL gameweek from the current seasons clean gameweeks.
+Each player whose team has a fixture in the next gameweek has a row per fixture, with the next match info the training
+rows have shifted from their next match: the opponent, whether they are at home, the month and time of the kickoff and
+the win expectation from the upcoming odds, along with their latest value and their form over their latest matches,
+which is what the rolling means of the next match will be.
 """
+import numpy as np
+import pandas as pd
+from project.models.all_seasons import AGAINST_OPPONENT_METRICS, AllSeasons
+from project.models.gameweeks import Gameweeks, ROLLING_METRICS, SHIFT_COLUMNS
+
+# The columns of the current seasons clean gameweeks read to build the predictors.
+PREDICTORS_COLUMNS = (["season", "name", "player_id", "position", "plays_for", "team_id", "value", "date_of_match"]
+                      + list(ROLLING_METRICS) + [mean_column for _, mean_column in AGAINST_OPPONENT_METRICS.values()])
+
+# The columns of the next gameweeks fixtures read, with the type each is parsed as.
+NEXT_FIXTURES_COLUMNS = {
+    "kickoff_time": "str",
+    "HomeTeam": "str",
+    "AwayTeam": "str"
+}
+
+# The columns of the upcoming game odds read, with the type each is parsed as.
+UPCOMING_ODDS_COLUMNS = {
+    "HomeTeam": "str",
+    "AwayTeam": "str",
+    "B365H": "float64",
+    "B365A": "float64"
+}
+
+
+class Predictors:
+    def __init__(self, dataframe):
+        """
+        :param dataframe: pandas.core.frame.DataFrame
+        """
+        self.predictors = dataframe
+
+    def take_latest_matches(self, window=3):
+        """
+        keeps each players latest match, with the mean of their metrics over their latest matches, up to the window
+        size, as the form of their next match, which has all their matches before it
+        :param window: int
+        :return: None
+        """
+        matches = self.predictors.sort_values(by=["player_id", "date_of_match"], kind="mergesort")
+        players = matches["player_id"].to_numpy()
+        latest = matches.groupby(players).tail(window)
+        form = latest[list(ROLLING_METRICS)].astype(float).groupby(latest["player_id"].to_numpy()).mean()
+
+        self.predictors = matches[np.r_[players[1:] != players[:-1], True]].reset_index(drop=True)
+        for metric, mean_column in ROLLING_METRICS.items():
+            self.predictors[SHIFT_COLUMNS[mean_column]] = form[metric].reindex(
+                self.predictors["player_id"].to_numpy()).to_numpy()
+
+    def join_fixtures(self, fixtures, identity):
+        """
+        joins the next gameweeks fixtures to the players by the team id of the team they play for, a row for each of
+        their teams fixtures, and adds the opponent, whether the player is at home and the month and time of the kickoff
+        the players whose team has no fixture are dropped, as they have no next match to predict
+        :param fixtures: pandas.core.frame.DataFrame
+        :param identity: IdentityIndex
+        :return: None
+        """
+        home_ids = identity.named_team_ids(fixtures["HomeTeam"])
+        away_ids = identity.named_team_ids(fixtures["AwayTeam"])
+        fixtures = fixtures.assign(home_id=home_ids, away_id=away_ids, HomeTeam=identity.team_names(home_ids),
+                                   AwayTeam=identity.team_names(away_ids)).reset_index(drop=True)
+        calendar = Gameweeks(fixtures[["kickoff_time"]].copy())
+        calendar.add_times_of_match()
+        fixtures["shift_month_of_match"] = calendar.gameweeks["month_of_match"].to_numpy()
+        fixtures["shift_time_of_match"] = calendar.gameweeks["time_of_match"].to_numpy()
+
+        sides = [fixtures.assign(team_id=fixtures["home_id"], shift_opponent_id=fixtures["away_id"],
+                                 shift_opponent=fixtures["AwayTeam"], shift_was_home=True),
+                 fixtures.assign(team_id=fixtures["away_id"], shift_opponent_id=fixtures["home_id"],
+                                 shift_opponent=fixtures["HomeTeam"], shift_was_home=False)]
+        team_fixtures = pd.concat(sides, ignore_index=True).drop(columns=["kickoff_time"])
+        self.predictors = self.predictors.merge(team_fixtures, on="team_id", how="inner")
+
+    def join_odds(self, game_odds, identity):
+        """
+        joins the BET365 odds of the upcoming matches to the fixtures by the team ids of the home and away teams and
+        adds the win expectation of the players team
+        a fixture without odds raises rather than being given a made up win expectation
+        :param game_odds: pandas.core.frame.DataFrame
+        :param identity: IdentityIndex
+        :return: None
+        """
+        game_odds = game_odds[["B365H", "B365A"]].assign(home_id=identity.named_team_ids(game_odds["HomeTeam"]),
+                                                         away_id=identity.named_team_ids(game_odds["AwayTeam"]))
+        self.predictors = self.predictors.merge(game_odds.drop_duplicates(["home_id", "away_id"], keep="last"),
+                                                on=["home_id", "away_id"], how="left")
+        missing_odds = self.predictors[self.predictors[["B365H", "B365A"]].isna().any(axis=1)]
+        if len(missing_odds):
+            raise ValueError("The upcoming odds have no BET365 odds for the fixtures {}".format(
+                sorted(set(zip(missing_odds["HomeTeam"], missing_odds["AwayTeam"])))))
+        self.predictors["shift_win_expectation"] = np.where(self.predictors["shift_was_home"],
+                                                            self.predictors["B365A"] / self.predictors["B365H"],
+                                                            self.predictors["B365H"] / self.predictors["B365A"])
+
+    def add_next_value(self):
+        """
+        the players value at their next match is their latest value, as the price changes before the deadline are
+        not known
+        :return: None
+        """
+        self.predictors["shift_value"] = self.predictors["value"]
+        self.predictors["shift_value_delta"] = 0
+
+    def map_position_types(self, positions, thresholds=None, per_season=False):
+        """
+        maps the players positions to their types from the position aggregates of every season, as the union does
+        :param positions: pandas.core.frame.DataFrame
+        :param thresholds: dict
+        :param per_season: bool
+        :return: None
+        """
+        all_seasons = AllSeasons(self.predictors)
+        all_seasons.map_position_types(aggregates=positions, thresholds=thresholds, per_season=per_season)
+        self.predictors = all_seasons.all_seasons
+
+    def form_against_next_opponent(self, against):
+        """
+        means the key metrics against the next opponent from the against aggregates of every season, falling back to
+        the players rolling mean of the metric when they have not played the opponent, as the union does
+        :param against: pandas.core.frame.DataFrame
+        :return: None
+        """
+        all_seasons = AllSeasons(self.predictors)
+        all_seasons.form_against_shift_opponent(aggregates=against)
+        self.predictors = all_seasons.all_seasons
+
+    def take_useful_columns(self):
+        """
+        removes all columns the training rows do not have
+        :return: None
+        """
+        useful_columns = ["season", "name", "position", "plays_for", "shift_value", "shift_value_delta",
+                          "shift_opponent", "shift_win_expectation", "shift_month_of_match", "shift_time_of_match",
+                          "shift_was_home", "shift_mean_minutes", "shift_mean_total_points", "shift_mean_creativity",
+                          "shift_mean_threat", "shift_mean_influence", "shift_mean_bps", "shift_mean_goals",
+                          "shift_mean_assists", "shift_mean_conceded", "points_against_shift_opponent",
+                          "creativity_against_shift_opponent", "threat_against_shift_opponent",
+                          "influence_against_shift_opponent", "bps_against_shift_opponent",
+                          "goals_against_shift_opponent", "assists_against_shift_opponent",
+                          "conceded_against_shift_opponent"]
+        self.predictors = self.predictors[useful_columns]
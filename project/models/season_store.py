@@ -0,0 +1,248 @@
+"""
+Class to store the transformed gameweeks data in a typed columnar format, partitioned by season.
+Each partition is a directory holding a numpy array per column and a json schema of the columns types, so that a stage
+can load only the columns it needs, memory mapped, without parsing text or inferring types.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# The type each column is stored as, where categories are stored as integer codes into the partitions categories.
+SCHEMA = {
+    "season": "category",
+    "round": "int8",
+    "name": "category",
+    "player_id": "int32",
+    "position": "category",
+    "value": "int16",
+    "value_delta": "float32",
+    "minutes": "int16",
+    "total_points": "int8",
+    "total_points_range": "int8",
+    "assists": "int8",
+    "goals_scored": "int8",
+    "goals_conceded": "int8",
+    "saves": "int8",
+    "own_goals": "int8",
+    "penalties_missed": "int8",
+    "penalties_saved": "int8",
+    "clean_sheets": "int8",
+    "creativity": "float64",
+    "threat": "float64",
+    "influence": "float64",
+    "bps": "int16",
+    "yellow_cards": "int8",
+    "red_cards": "int8",
+    "plays_for": "category",
+    "team_id": "int16",
+    "opponent_team": "category",
+    "opponent_id": "int16",
+    "was_home": "bool",
+    "is_won": "int8",
+    "month_of_match": "int8",
+    "time_of_match": "category",
+    "win_expectation": "float64",
+    "date_of_match": "datetime64[ns]",
+    "mean_total_points": "float64",
+    "mean_minutes": "float64",
+    "mean_creativity": "float64",
+    "mean_threat": "float64",
+    "mean_influence": "float64",
+    "mean_bps": "float64",
+    "mean_goals": "float64",
+    "mean_assists": "float64",
+    "mean_conceded": "float64",
+    "shift_total_points_range": "float32",
+    "shift_value": "float32",
+    "shift_value_delta": "float32",
+    "shift_opponent": "category",
+    "shift_opponent_id": "float32",
+    "shift_win_expectation": "float64",
+    "shift_month_of_match": "float32",
+    "shift_time_of_match": "category",
+    "shift_was_home": "float32",
+    "shift_minutes": "float32",
+    "shift_round": "float32",
+    "shift_mean_minutes": "float64",
+    "shift_mean_total_points": "float64",
+    "shift_mean_creativity": "float64",
+    "shift_mean_threat": "float64",
+    "shift_mean_influence": "float64",
+    "shift_mean_bps": "float64",
+    "shift_mean_goals": "float64",
+    "shift_mean_assists": "float64",
+    "shift_mean_conceded": "float64",
+    "points_against_shift_opponent": "float64",
+    "creativity_against_shift_opponent": "float64",
+    "threat_against_shift_opponent": "float64",
+    "influence_against_shift_opponent": "float64",
+    "bps_against_shift_opponent": "float64",
+    "goals_against_shift_opponent": "float64",
+    "assists_against_shift_opponent": "float64",
+    "conceded_against_shift_opponent": "float64"
+}
+
+
+def apply_schema(dataframe):
+    """
+    casts every column of the dataframe to its type in the schema, where the categories of a categorical column are
+    sorted
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: pandas.core.frame.DataFrame
+    """
+    missing_columns = [column for column in dataframe.columns if column not in SCHEMA]
+    if missing_columns:
+        raise KeyError("Columns {} have no type in the season store schema".format(missing_columns))
+    typed_columns = {}
+    for column in dataframe.columns:
+        values = dataframe[column]
+        if SCHEMA[column] == "category":
+            typed_columns[column] = pd.Categorical(values.astype(object).where(values.notna(), None))
+        elif SCHEMA[column] == "datetime64[ns]":
+            typed_columns[column] = pd.to_datetime(values).to_numpy(dtype="datetime64[ns]")
+        elif SCHEMA[column] in {"float32", "float64"}:
+            typed_columns[column] = values.astype(float).to_numpy(dtype=SCHEMA[column])
+        else:
+            typed_columns[column] = values.to_numpy(dtype=SCHEMA[column])
+    return pd.DataFrame(typed_columns, index=dataframe.index)
+
+
+class SeasonStore:
+    def __init__(self, path):
+        """
+        :param path: str
+        """
+        self.path = path
+
+    def partitions(self):
+        """
+        the seasons stored, in order
+        :return: list
+        """
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(partition for partition in os.listdir(self.path)
+                      if os.path.exists(os.path.join(self.path, partition, "schema.json")))
+
+    def write(self, dataframe, partition):
+        """
+        writes the dataframe as a partition of the store, replacing the partition if it exists
+        :param dataframe: pandas.core.frame.DataFrame
+        :param partition: str
+        :return: None
+        """
+        dataframe = apply_schema(dataframe)
+        partition_path = os.path.join(self.path, partition)
+        os.makedirs(partition_path, exist_ok=True)
+        schema = {"rows": len(dataframe), "columns": list(dataframe.columns), "types": {}, "categories": {}}
+        for column in dataframe.columns:
+            values = dataframe[column]
+            schema["types"][column] = SCHEMA[column]
+            if SCHEMA[column] == "category":
+                codes_type = np.int16 if len(values.cat.categories) < np.iinfo(np.int16).max else np.int32
+                schema["categories"][column] = values.cat.categories.tolist()
+                values = values.cat.codes.to_numpy(dtype=codes_type)
+            np.save(os.path.join(partition_path, column + ".npy"), np.asarray(values), allow_pickle=False)
+        with open(os.path.join(partition_path, "schema.json"), "w") as schema_file:
+            json.dump(schema, schema_file)
+
+    def update_rows(self, partition, rows, values):
+        """
+        overwrites the rows of the columns given in place, without rewriting the rest of the partition
+        a value of a categorical column outside its categories is appended to them, so the codes already written stay
+        valid
+        :param partition: str
+        :param rows: np.array
+        :param values: dict
+        :return: None
+        """
+        schema = self.schema(partition)
+        for column, column_values in values.items():
+            array = np.load(os.path.join(self.path, partition, column + ".npy"), mmap_mode="r+", allow_pickle=False)
+            if schema["types"][column] == "category":
+                categories = schema["categories"][column]
+                column_values = pd.Series(column_values, dtype=object)
+                new_categories = [value for value in column_values.dropna().unique() if value not in categories]
+                if len(categories) + len(new_categories) > np.iinfo(array.dtype).max:
+                    raise ValueError("Column {} of partition {} has too many categories to update in place".format(
+                        column, partition))
+                categories += new_categories
+                column_values = pd.Categorical(column_values, categories=categories).codes
+            array[np.asarray(rows)] = np.asarray(column_values, dtype=array.dtype)
+            array.flush()
+        with open(os.path.join(self.path, partition, "schema.json"), "w") as schema_file:
+            json.dump(schema, schema_file)
+
+    def write_seasons(self, dataframe):
+        """
+        writes each season of the dataframe as a partition of the store
+        :param dataframe: pandas.core.frame.DataFrame
+        :return: None
+        """
+        for season, season_df in dataframe.groupby("season", sort=True, observed=True):
+            self.write(season_df, str(season))
+
+    def schema(self, partition):
+        """
+        :param partition: str
+        :return: dict
+        """
+        with open(os.path.join(self.path, partition, "schema.json")) as schema_file:
+            return json.load(schema_file)
+
+    def read_columns(self, partition, columns=None, mmap=True):
+        """
+        reads the columns given from a partition of the store, as numpy arrays or categoricals by column name
+        :param partition: str
+        :param columns: list
+        :param mmap: bool
+        :return: dict
+        """
+        schema = self.schema(partition)
+        columns = schema["columns"] if columns is None else columns
+        mmap_mode = "r" if mmap else None
+        typed_columns = {}
+        for column in columns:
+            values = np.load(os.path.join(self.path, partition, column + ".npy"), mmap_mode=mmap_mode,
+                             allow_pickle=False)
+            if schema["types"][column] == "category":
+                values = pd.Categorical.from_codes(values, categories=schema["categories"][column])
+            typed_columns[column] = values
+        return typed_columns
+
+    def read_partition(self, partition, columns=None, mmap=True):
+        """
+        reads a partition of the store, only loading the columns given
+        :param partition: str
+        :param columns: list
+        :param mmap: bool
+        :return: pandas.core.frame.DataFrame
+        """
+        typed_columns = self.read_columns(partition, columns, mmap)
+        return pd.DataFrame(typed_columns, columns=list(typed_columns.keys()), copy=False)
+
+    def read(self, partitions=None, columns=None, mmap=True):
+        """
+        reads the partitions of the store into one dataframe, where the categories of a categorical column are the
+        union of its categories in each partition
+        :param partitions: list
+        :param columns: list
+        :param mmap: bool
+        :return: pandas.core.frame.DataFrame
+        """
+        partitions = self.partitions() if partitions is None else partitions
+        if not partitions:
+            raise FileNotFoundError("No partitions in the season store at {}".format(self.path))
+        partition_columns = [self.read_columns(partition, columns, mmap) for partition in partitions]
+        combined = {}
+        for column in partition_columns[0].keys():
+            values = [typed_columns[column] for typed_columns in partition_columns]
+            if len(values) == 1:
+                combined[column] = values[0]
+            elif isinstance(values[0], pd.Categorical):
+                combined[column] = union_categoricals(values, sort_categories=True)
+            else:
+                combined[column] = np.concatenate(values)
+        return pd.DataFrame(combined, columns=list(combined.keys()), copy=False)
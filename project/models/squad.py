@@ -0,0 +1,463 @@
+"""
+Functions to pick the FPL squad and starting XI with the most predicted points, and to score transfer scenarios.
+The players are kept in a PlayerTable of numpy arrays, one entry per player, so every constraint and score is an array
+operation over the table.
+The squad is solved exactly. Players that enough cheaper and better players of their position could replace, whatever
+else is picked, are pruned first. Each position's players are then picked by a dynamic program over the number of
+players, starters and the cost, and the positions are combined within the budget; the at most three players per team
+rule is enforced by branch and bound, excluding one of the players of a team with too many in each branch.
+Transfer scenarios are scored in batches of squads at once, split across processes, where the best XI of a squad is the
+best goalkeeper, the best players of each outfield position up to its minimum in the XI, and the best of the rest.
+"""
+import heapq
+import itertools
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from project.models.all_seasons import POSITION_TYPES
+
+BUDGET = 1000
+MAX_PER_TEAM = 3
+STARTERS = 11
+# The dynamic programs of the positions kept while branching, as a program is reused by every branch that does not
+# change its players.
+MAX_PROGRAMS = 64
+# The players of each position in the squad, and the fewest and most of them in the starting XI.
+SQUAD_QUOTAS = {"GK": 2, "DEF": 5, "MID": 5, "FWD": 3}
+STARTING_LIMITS = {"GK": (1, 1), "DEF": (3, 5), "MID": (2, 5), "FWD": (1, 3)}
+GROUPS = list(SQUAD_QUOTAS)
+# The position of each position type, where the defenders and midfielders are split into attacking and defensive types.
+POSITION_GROUPS = dict({group: group for group in GROUPS},
+                       **{position_type: position for position, (_, _, attacking, defensive) in POSITION_TYPES.items()
+                          for position_type in (attacking, defensive)})
+
+
+class PlayerTable:
+    def __init__(self, names, positions, teams, values, points):
+        """
+        :param names: np.array
+        :param positions: np.array
+        :param teams: np.array
+        :param values: np.array
+        :param points: np.array
+        """
+        self.names = np.asarray(names, dtype=object)
+        self.positions = np.asarray(positions, dtype=object)
+        unknown_positions = set(self.positions) - set(POSITION_GROUPS)
+        if unknown_positions:
+            raise ValueError("Positions {} are not FPL positions or position types".format(sorted(unknown_positions)))
+        self.groups = pd.Series(self.positions).map(POSITION_GROUPS).map(GROUPS.index).to_numpy(dtype=np.int8)
+        self.teams, self.team_names = pd.factorize(np.asarray(teams, dtype=object))
+        self.values = np.asarray(values, dtype=np.int64)
+        self.points = np.asarray(points, dtype=float)
+
+    @classmethod
+    def from_dataframe(cls, dataframe, points_column="expected_points"):
+        """
+        :param dataframe: pandas.core.frame.DataFrame
+        :param points_column: str
+        :return: PlayerTable
+        """
+        return cls(dataframe["name"].astype(str).to_numpy(), dataframe["position"].astype(str).to_numpy(),
+                   dataframe["plays_for"].astype(str).to_numpy(), dataframe["value"].to_numpy(),
+                   dataframe[points_column].to_numpy())
+
+    def __len__(self):
+        return len(self.names)
+
+    def describe(self, rows, starters=None):
+        """
+        the players of the rows, with whether each starts
+        :param rows: np.array
+        :param starters: np.array
+        :return: list
+        """
+        return [dict({"name": self.names[row], "position": self.positions[row],
+                      "plays_for": self.team_names[self.teams[row]], "value": int(self.values[row]),
+                      "points": float(self.points[row])},
+                     **({} if starters is None else {"starts": bool(starters[i])}))
+                for i, row in enumerate(rows)]
+
+
+class Squad:
+    def __init__(self, rows, starters, score, cost):
+        """
+        :param rows: np.array
+        :param starters: np.array
+        :param score: float
+        :param cost: int
+        """
+        self.rows = rows
+        self.starters = starters
+        self.score = score
+        self.cost = cost
+
+
+def tracked_type(group, position_limits):
+    """
+    the attacking type of the position whose count is tracked by its dynamic program, if the position types of the
+    position are limited
+    :param group: str
+    :param position_limits: dict
+    :return: str
+    """
+    limited = [position_type for position_type in position_limits if POSITION_GROUPS.get(position_type) == group]
+    if not limited:
+        return None
+    if group not in POSITION_TYPES or any(position_type == group for position_type in limited):
+        raise ValueError("Only the attacking and defensive types of {} can be limited, not {}".format(
+            ", ".join(POSITION_TYPES), limited))
+    return POSITION_TYPES[group][2]
+
+
+def prune_dominated(table, rows):
+    """
+    removes the players that can always be swapped for a player of the same position type costing no more and
+    predicted no fewer points, i.e. who have cheaper and better players from enough teams that one of them is always
+    left out of the squad and from a team with room for them
+    :param table: PlayerTable
+    :param rows: np.array
+    :return: np.array
+    """
+    kept = []
+    full_teams = sum(SQUAD_QUOTAS.values()) // MAX_PER_TEAM
+    for position in np.unique(table.positions[rows]):
+        position_rows = rows[table.positions[rows] == position]
+        values, points = table.values[position_rows], table.points[position_rows]
+        order = np.lexsort((position_rows, -points, values))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        dominates = ((values[:, None] <= values[None, :]) & (points[:, None] >= points[None, :])
+                     & (rank[:, None] < rank[None, :]))
+        teams = pd.get_dummies(table.teams[position_rows]).to_numpy(dtype=np.int64)
+        dominating_teams = ((dominates.T.astype(np.int64) @ teams) > 0).sum(axis=1)
+        quota = SQUAD_QUOTAS[POSITION_GROUPS[position]]
+        kept.append(position_rows[dominating_teams < quota + full_teams])
+    return np.sort(np.concatenate(kept))
+
+
+class GroupProgram:
+    def __init__(self, table, group, rows, forced, budget, bench_weight, position_limits, reserved=0):
+        """
+        the dynamic program of the players of a position, the best points of picking its squad quota with each number
+        of starters for each cost, where the forced players are always picked
+        the costs are only followed up to the budget less the cost reserved for the other positions, and the choice of
+        each player in each state is kept to backtrack the players picked, rather than every layer of the program
+        :param table: PlayerTable
+        :param group: str
+        :param rows: np.array
+        :param forced: set
+        :param budget: int
+        :param bench_weight: float
+        :param position_limits: dict
+        :param reserved: int
+        """
+        self.rows = rows
+        self.quota = SQUAD_QUOTAS[group]
+        self.low, self.high = STARTING_LIMITS[group]
+        attacking = tracked_type(group, position_limits)
+        self.is_attacking = (table.positions[rows] == attacking) if attacking else np.zeros(len(rows), dtype=bool)
+        self.costs = table.values[rows]
+        self.start_points = table.points[rows]
+        self.bench_points = bench_weight * table.points[rows]
+        self.forced = np.isin(rows, list(forced))
+
+        types = 1
+        if attacking:
+            defensive = POSITION_TYPES[group][3]
+            low_attacking, high_attacking = position_limits.get(attacking, (0, self.quota))
+            low_defensive, high_defensive = position_limits.get(defensive, (0, self.quota))
+            types = max(0, min(self.quota, high_attacking, self.quota - low_defensive)) + 1
+        values = np.full((self.quota + 1, self.high + 1, types, max(0, budget - reserved) + 1), -np.inf)
+        values[0, 0, 0, 0] = 0
+        self.choices = []
+        for i in range(len(rows)):
+            values = self.add_player(values, i)
+
+        allowed = np.zeros(types, dtype=bool)
+        if attacking:
+            counts = np.arange(types)
+            allowed = ((counts >= low_attacking) & (counts <= high_attacking)
+                       & (self.quota - counts >= low_defensive) & (self.quota - counts <= high_defensive))
+        else:
+            allowed[0] = True
+        picked = np.where(allowed[None, :, None], values[self.quota], -np.inf)
+        self.attacking_counts = picked.argmax(axis=1)
+        self.table = np.pad(picked.max(axis=1), [(0, 0), (0, budget + 1 - picked.shape[2])], constant_values=-np.inf)
+        self.table[:self.low] = -np.inf
+
+    def add_player(self, values, i):
+        """
+        the program after the player, where the player is left out, started or benched in each state
+        :param values: np.array
+        :param i: int
+        :return: np.array
+        """
+        cost = self.costs[i]
+        added = np.full(values.shape, -np.inf) if self.forced[i] else values.copy()
+        choices = np.zeros(values.shape, dtype=np.int8)
+        self.choices.append(choices)
+        if cost >= values.shape[3]:
+            return added
+        shift = int(self.is_attacking[i])
+        previous = values[:-1, :, :values.shape[2] - shift, :values.shape[3] - cost]
+        started = (slice(1, None), slice(1, None), slice(shift, None), slice(cost, None))
+        benched = (slice(1, None), slice(None), slice(shift, None), slice(cost, None))
+        for starts, target, candidate in [(1, started, previous[:, :-1] + self.start_points[i]),
+                                          (2, benched, previous + self.bench_points[i])]:
+            is_better = candidate > added[target]
+            np.copyto(added[target], candidate, where=is_better)
+            np.copyto(choices[target], starts, where=is_better)
+        return added
+
+    def backtrack(self, starters, cost):
+        """
+        the rows picked for the number of starters and the cost, and whether each starts
+        :param starters: int
+        :param cost: int
+        :return: np.array, np.array
+        """
+        picked, starts = [], []
+        count, attacking = self.quota, self.attacking_counts[starters, cost]
+        for i in range(len(self.rows) - 1, -1, -1):
+            choice = self.choices[i][count, starters, attacking, cost]
+            if choice:
+                picked.append(self.rows[i])
+                starts.append(choice == 1)
+                count, starters = count - 1, starters - int(choice == 1)
+                attacking, cost = attacking - int(self.is_attacking[i]), cost - self.costs[i]
+        return np.array(picked[::-1]), np.array(starts[::-1])
+
+
+def convolve(first, second, budget):
+    """
+    the best points of two positions combined, for each number of starters and cost
+    :param first: np.array
+    :param second: np.array
+    :param budget: int
+    :return: np.array
+    """
+    combined = np.full((first.shape[0] + second.shape[0] - 1, budget + 1), -np.inf)
+    for starters, cost in zip(*np.nonzero(np.isfinite(first))):
+        target = combined[starters:starters + second.shape[0], cost:]
+        np.maximum(target, first[starters, cost] + second[:, :budget + 1 - cost], out=target)
+    return combined
+
+
+def split_convolution(first, second, starters, cost):
+    """
+    the starters and cost of the first position of a combined number of starters and cost
+    :param first: np.array
+    :param second: np.array
+    :param starters: int
+    :param cost: int
+    :return: int, int
+    """
+    best, split = -np.inf, None
+    for first_starters in range(max(0, starters - second.shape[0] + 1), min(starters, first.shape[0] - 1) + 1):
+        totals = first[first_starters, :cost + 1] + second[starters - first_starters, cost::-1]
+        first_cost = int(np.argmax(totals))
+        if totals[first_cost] > best:
+            best, split = totals[first_cost], (first_starters, first_cost)
+    return split
+
+
+def solve_relaxed(programs, budget):
+    """
+    the best squad of the positions dynamic programs, ignoring the players per team rule
+    :param programs: list
+    :param budget: int
+    :return: Squad
+    """
+    goalkeepers, defenders, midfielders, forwards = (program.table for program in programs)
+    back = convolve(goalkeepers, defenders, budget)
+    front = convolve(forwards, midfielders, budget)
+    best_front = np.maximum.accumulate(front, axis=1)
+    best, split = -np.inf, None
+    for back_starters in range(max(0, STARTERS - front.shape[0] + 1), min(STARTERS, back.shape[0] - 1) + 1):
+        totals = back[back_starters] + best_front[STARTERS - back_starters, ::-1]
+        back_cost = int(np.argmax(totals))
+        if totals[back_cost] > best:
+            best, split = totals[back_cost], (back_starters, back_cost)
+    if not np.isfinite(best):
+        return None
+
+    back_starters, back_cost = split
+    front_starters = STARTERS - back_starters
+    front_cost = int(np.argmax(front[front_starters, :budget - back_cost + 1]))
+    positions = []
+    for (first, second), (starters, cost) in [((goalkeepers, defenders), (back_starters, back_cost)),
+                                              ((forwards, midfielders), (front_starters, front_cost))]:
+        first_starters, first_cost = split_convolution(first, second, starters, cost)
+        positions += [(first_starters, first_cost), (starters - first_starters, cost - first_cost)]
+    goalkeeper, defender, forward, midfielder = positions
+
+    rows, starts = [], []
+    for program, (starters, cost) in zip(programs, [goalkeeper, defender, midfielder, forward]):
+        program_rows, program_starts = program.backtrack(starters, cost)
+        rows.append(program_rows)
+        starts.append(program_starts)
+    return Squad(np.concatenate(rows), np.concatenate(starts), float(best), back_cost + front_cost)
+
+
+def select_squad(table, budget=BUDGET, bench_weight=0.1, position_limits=None, rows=None):
+    """
+    the squad with the most predicted points in its starting XI, plus the bench weight of its benchs points, within the
+    budget, the squad quotas, the XI's limits of each position, the players per team rule and the limits on the number
+    of each position type in the squad
+    :param table: PlayerTable
+    :param budget: int
+    :param bench_weight: float
+    :param position_limits: dict
+    :param rows: np.array
+    :return: Squad
+    """
+    position_limits = position_limits or {}
+    rows = np.arange(len(table)) if rows is None else np.asarray(rows)
+    rows = prune_dominated(table, rows[table.values[rows] <= budget])
+    cheapest = {group: np.sort(table.values[rows[table.groups[rows] == group_index]])[:SQUAD_QUOTAS[group]].sum()
+                for group_index, group in enumerate(GROUPS)}
+    programs = {}
+
+    def solve(excluded, forced):
+        group_programs = []
+        for group_index, group in enumerate(GROUPS):
+            group_rows = rows[(table.groups[rows] == group_index) & ~np.isin(rows, list(excluded))]
+            group_forced = frozenset(forced) & frozenset(group_rows.tolist())
+            group_excluded = frozenset(excluded) & frozenset(rows[table.groups[rows] == group_index].tolist())
+            key = (group, group_excluded, group_forced)
+            if key not in programs:
+                if len(programs) >= MAX_PROGRAMS:
+                    programs.pop(next(iter(programs)))
+                programs[key] = GroupProgram(table, group, group_rows, group_forced, budget, bench_weight,
+                                             position_limits, sum(cheapest.values()) - cheapest[group])
+            group_programs.append(programs[key])
+        return solve_relaxed(group_programs, budget)
+
+    counter = itertools.count()
+    squad = solve(frozenset(), frozenset())
+    nodes = [] if squad is None else [(-squad.score, next(counter), squad, frozenset(), frozenset())]
+    while nodes:
+        _, _, squad, excluded, forced = heapq.heappop(nodes)
+        teams, counts = np.unique(table.teams[squad.rows], return_counts=True)
+        if counts.max() <= MAX_PER_TEAM:
+            return squad
+        team = teams[np.argmax(counts)]
+        team_rows = squad.rows[table.teams[squad.rows] == team][:MAX_PER_TEAM + 1]
+        for i, row in enumerate(team_rows):
+            child_excluded, child_forced = excluded | {row}, forced | set(team_rows[:i].tolist())
+            child = solve(child_excluded, child_forced)
+            if child is not None:
+                heapq.heappush(nodes, (-child.score, next(counter), child, child_excluded, child_forced))
+    raise ValueError("No squad fits the budget of {} and the squad rules".format(budget))
+
+
+def score_squads(table, squads, budget=BUDGET, bench_weight=0.1, position_limits=None):
+    """
+    the points of the best starting XI of each squad plus the bench weight of its benchs points, or minus infinity if
+    the squad breaks a rule
+    as every outfield position can fill its whole squad quota in the XI, the best XI is the best players of each
+    position up to its minimum in the XI followed by the best of the outfield players left
+    :param table: PlayerTable
+    :param squads: np.array
+    :param budget: int
+    :param bench_weight: float
+    :param position_limits: dict
+    :return: np.array
+    """
+    squads = np.asarray(squads)
+    groups = table.groups[squads]
+    order = np.argsort(groups, axis=1, kind="stable")
+    groups = np.take_along_axis(groups, order, axis=1)
+    points = np.take_along_axis(table.points[squads], order, axis=1)
+    composition = np.repeat(np.arange(len(GROUPS)), list(SQUAD_QUOTAS.values()))
+    is_valid = (groups == composition).all(axis=1)
+
+    starters, remaining = np.zeros(len(squads)), []
+    start = 0
+    for group in GROUPS:
+        block = -np.sort(-points[:, start:start + SQUAD_QUOTAS[group]], axis=1)
+        low, high = STARTING_LIMITS[group]
+        starters += block[:, :low].sum(axis=1)
+        if high > low:
+            remaining.append(block[:, low:])
+        start += SQUAD_QUOTAS[group]
+    flexible = STARTERS - sum(low for low, _ in STARTING_LIMITS.values())
+    starters += -np.sort(-np.concatenate(remaining, axis=1), axis=1)[:, :flexible].sum(axis=1)
+    scores = starters + bench_weight * (points.sum(axis=1) - starters)
+
+    sorted_rows = np.sort(squads, axis=1)
+    teams = np.sort(table.teams[squads], axis=1)
+    is_valid &= (sorted_rows[:, 1:] != sorted_rows[:, :-1]).all(axis=1)
+    is_valid &= ~(teams[:, MAX_PER_TEAM:] == teams[:, :-MAX_PER_TEAM]).any(axis=1)
+    is_valid &= table.values[squads].sum(axis=1) <= budget
+    for position_type, (low, high) in (position_limits or {}).items():
+        counts = (table.positions[squads] == position_type).sum(axis=1)
+        is_valid &= (counts >= low) & (counts <= high)
+    return np.where(is_valid, scores, -np.inf)
+
+
+def transfer_scenarios(table, squad_rows, transfers=1, candidates=None):
+    """
+    every squad made by swapping the transfers number of players of the squad for players of the same positions not
+    in it, as the squads and the rows transferred out and in
+    given the candidates, only the candidates best predicted players of each position are transferred in
+    :param table: PlayerTable
+    :param squad_rows: np.array
+    :param transfers: int
+    :param candidates: int
+    :return: np.array, np.array, np.array
+    """
+    squad_rows = np.asarray(squad_rows)
+    incoming = {}
+    for group_index in range(len(GROUPS)):
+        group_rows = np.flatnonzero((table.groups == group_index) & ~np.isin(np.arange(len(table)), squad_rows))
+        group_rows = group_rows[np.argsort(-table.points[group_rows], kind="stable")]
+        incoming[group_index] = group_rows[:candidates]
+
+    squads, outs, ins = [], [], []
+    for slots in itertools.combinations(range(len(squad_rows)), transfers):
+        slots = np.array(slots)
+        slot_groups = table.groups[squad_rows[slots]]
+        options = [incoming[group] for group in slot_groups]
+        replacements = np.array(np.meshgrid(*options, indexing="ij")).reshape(transfers, -1).T
+        for group in np.unique(slot_groups):
+            same_group = np.flatnonzero(slot_groups == group)
+            if len(same_group) > 1:
+                replacements = replacements[(np.diff(replacements[:, same_group], axis=1) > 0).all(axis=1)]
+        scenario_squads = np.repeat(squad_rows[None, :], len(replacements), axis=0)
+        scenario_squads[:, slots] = replacements
+        squads.append(scenario_squads)
+        outs.append(np.repeat(squad_rows[slots][None, :], len(replacements), axis=0))
+        ins.append(replacements)
+    return np.concatenate(squads), np.concatenate(outs), np.concatenate(ins)
+
+
+def best_transfers(table, squad_rows, budget=BUDGET, transfers=1, free_transfers=1, hit=4, bench_weight=0.1,
+                   position_limits=None, candidates=None, top=10, batch_size=100000, jobs=None):
+    """
+    scores every transfer scenario of the squad in batches across the jobs, less the points hit of each transfer
+    beyond the free transfers, and the top scenarios by their gain over keeping the squad
+    :param table: PlayerTable
+    :param squad_rows: np.array
+    :param budget: int
+    :param transfers: int
+    :param free_transfers: int
+    :param hit: int
+    :param bench_weight: float
+    :param position_limits: dict
+    :param candidates: int
+    :param top: int
+    :param batch_size: int
+    :param jobs: int
+    :return: list
+    """
+    current = score_squads(table, np.asarray(squad_rows)[None, :], np.inf, bench_weight)[0]
+    squads, outs, ins = transfer_scenarios(table, squad_rows, transfers, candidates)
+    scores = np.concatenate(Parallel(n_jobs=jobs)(
+        delayed(score_squads)(table, squads[start:start + batch_size], budget, bench_weight, position_limits)
+        for start in range(0, len(squads), batch_size)))
+    gains = scores - current - hit * max(0, transfers - free_transfers)
+    best = np.argsort(-gains, kind="stable")[:top]
+    return [{"out": table.describe(outs[i]), "in": table.describe(ins[i]), "score": float(scores[i]),
+             "gain": float(gains[i])} for i in best if np.isfinite(gains[i])]
@@ -5,7 +5,36 @@ from sklearn.model_selection import train_test_split
 from sklearn.compose import ColumnTransformer
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.preprocessing import MinMaxScaler
+from project.instrumentation import instrument
+from project.models.all_seasons import AGAINST_OPPONENT_METRICS
+
+
+def row_hashes(dataframe):
+    """
+    a hash of each row of the all seasons data, leaving out the columns the incremental union rewrites in place, so a
+    row trained on keeps its hash
+    rows that are otherwise identical are told apart by how many of them came before
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: np.array
+    """
+    rewritten_columns = {"position"} | {against_column for against_column, _ in AGAINST_OPPONENT_METRICS.values()}
+    hashes = pd.util.hash_pandas_object(dataframe[[column for column in dataframe.columns
+                                                   if column not in rewritten_columns]], index=False)
+    occurrences = hashes.groupby(hashes.to_numpy()).cumcount()
+    return pd.util.hash_pandas_object(pd.DataFrame({"hash": hashes.to_numpy(), "occurrence": occurrences.to_numpy()}),
+                                      index=False).to_numpy()
+
+
+def season_row_hashes(hashes, seasons):
+    """
+    the sorted unique row hashes of each season
+    :param hashes: np.array
+    :param seasons: np.array
+    :return: dict
+    """
+    return {season: np.unique(hashes[seasons == season]) for season in np.unique(seasons)}
 
 
 def split_and_scale(predictors, labels, scaler, numerical_columns, test_size=0.2, stratify=None, random_state=1):
@@ -30,30 +59,119 @@ def split_and_scale(predictors, labels, scaler, numerical_columns, test_size=0.2
     return np.array(x_train), np.array(x_test), y_train, y_test, transformer
 
 
+def sparse_dummies(dataframe, categorical_columns, categories=None):
+    """
+    dummifies the categorical columns into a sparse matrix, with the same columns in the same order as
+    pandas.get_dummies, built directly from the category codes of each column so the dummies are never dense
+    given the categories of each column, e.g. those of the training data, the dummies have those columns instead, and
+    a value outside its columns categories has no dummy
+    :param dataframe: pandas.core.frame.DataFrame
+    :param categorical_columns: list
+    :param categories: dict
+    :return: scipy.sparse.csr_matrix, list, dict
+    """
+    rows, columns, dummy_columns, column_categories = [], [], [], {}
+    for column in categorical_columns:
+        values = dataframe[column]
+        if categories is not None:
+            values = pd.Categorical(values, categories=categories[column])
+        elif not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype("category")
+        values = pd.Series(values, copy=False)
+        codes = values.cat.codes.to_numpy()
+        is_known = codes >= 0
+        rows.append(np.flatnonzero(is_known))
+        columns.append(codes[is_known].astype(np.int64) + len(dummy_columns))
+        column_categories[column] = values.cat.categories.tolist()
+        dummy_columns += ["{}_{}".format(column, category) for category in column_categories[column]]
+    rows, columns = np.concatenate(rows), np.concatenate(columns)
+    dummies = sparse.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, columns)),
+                                shape=(len(dataframe), len(dummy_columns)))
+    return dummies, dummy_columns, column_categories
+
+
+def scale_and_stack(predictors, dummies, train_rows, test_rows, scaler, numerical_columns):
+    """
+    scales the numerical columns of the train and test rows with a feature scaler fitted to the train rows, and stacks
+    them with the rows sparse dummies, so the one-hot block stays sparse
+    :param predictors: pandas.core.frame.DataFrame
+    :param dummies: scipy.sparse.csr_matrix
+    :param train_rows: np.array
+    :param test_rows: np.array
+    :param scaler: sklearn.preprocessing._data.Transformer
+    :param numerical_columns: list
+    :return: scipy.sparse.csr_matrix, scipy.sparse.csr_matrix, sklearn.compose.ColumnTransformer
+    """
+    transformer = ColumnTransformer([('numerical', scaler, numerical_columns)])
+    x_train = transformer.fit_transform(predictors.iloc[train_rows])
+    x_test = transformer.transform(predictors.iloc[test_rows])
+    x_train = sparse.hstack([sparse.csr_matrix(x_train), dummies[train_rows]], format="csr")
+    x_test = sparse.hstack([sparse.csr_matrix(x_test), dummies[test_rows]], format="csr")
+    return x_train, x_test, transformer
+
+
+def split_and_scale_sparse(predictors, dummies, labels, scaler, numerical_columns, test_size=0.2, stratify=None,
+                           random_state=1):
+    """
+    performs the same train-test split as split_and_scale, then scales only the numerical columns with a feature
+    scaler fitted to the training set and stacks them with the sparse dummies
+    the columns are in the same order as split_and_scale, the numerical columns followed by the dummies
+    :param predictors: pandas.core.frame.DataFrame
+    :param dummies: scipy.sparse.csr_matrix
+    :param labels: pandas.core.frame.Series
+    :param scaler: sklearn.preprocessing._data.Transformer
+    :param numerical_columns: list
+    :param test_size: float
+    :param stratify: list
+    :param random_state: int
+    :return: scipy.sparse.csr_matrix, scipy.sparse.csr_matrix, list, list, sklearn.preprocessing._data.Transformer
+    """
+    train_rows, test_rows = train_test_split(np.arange(len(predictors)), test_size=test_size, stratify=stratify,
+                                             random_state=random_state)
+    x_train, x_test, transformer = scale_and_stack(predictors, dummies, train_rows, test_rows, scaler,
+                                                   numerical_columns)
+    return x_train, x_test, labels.iloc[train_rows], labels.iloc[test_rows], transformer
+
+
+@instrument("training_data")
 class Training:
     def __init__(self, dataframe):
         """
         :param dataframe: pandas.core.frame.DataFrame
         """
         self.labels = dataframe.pop("shift_total_points_range")
-        self.training_data = dataframe
+        # The gameweek of the next match only orders the rows, so it is not a feature.
+        self.training_data = dataframe.drop(columns=["shift_round"], errors="ignore")
 
         self.categorical_columns = ["season", "name", "position", "plays_for", "shift_opponent", "shift_month_of_match",
                                     "shift_time_of_match"]
-        self.numerical_columns = [col for col in dataframe.columns if col not in self.categorical_columns]
+        self.numerical_columns = [col for col in self.training_data.columns if col not in self.categorical_columns]
+        self.dummies = None
+        self.dummy_columns = None
+        self.categories = None
 
-    def dummify_categories(self):
+    def dummify_categories(self, sparse_output=False):
         """
         dummify the categorical columns in the training data
+        with sparse output, the dummies are kept apart from the numerical training data as a sparse matrix
+        :param sparse_output: bool
         :return: None
         """
-
-        self.training_data = pd.get_dummies(self.training_data, columns=self.categorical_columns)
+        if sparse_output:
+            self.dummies, self.dummy_columns, self.categories = sparse_dummies(self.training_data,
+                                                                               self.categorical_columns)
+            self.training_data = self.training_data[self.numerical_columns]
+        else:
+            self.training_data = pd.get_dummies(self.training_data, columns=self.categorical_columns)
 
     def split_into_train_and_test(self):
         """
         split the training data into the test set and the train set for modelling.
+        the sets are sparse matrices if the categories were dummified with sparse output
         :return: np.array, np.array, list, list, sklearn.preprocessing._data.Transformer
         """
+        if self.dummies is not None:
+            return split_and_scale_sparse(self.training_data, self.dummies, self.labels, MinMaxScaler(),
+                                          self.numerical_columns, stratify=self.labels)
         return split_and_scale(self.training_data, self.labels, MinMaxScaler(), self.numerical_columns,
                                stratify=self.labels)
@@ -0,0 +1,249 @@
+"""
+Functions to union the clean gameweeks one season partition at a time, and class to keep the aggregates of the
+finished seasons, which no longer change, so the union can merge in only the current seasons rows instead of rebuilding
+every season.
+A full rebuild streams the partitions twice: first adding each seasons position and against aggregates to the running
+totals, then mapping each season from the totals and writing it as its own partition, so only one season is ever
+loaded, along with the aggregates, which grow with the players and opponents rather than the rows.
+The position types and the means against the next opponent of a finished seasons rows depend on the current season
+through the combined aggregates, so the rows written from the previous totals are kept, and only those whose player
+type or player and opponent totals have changed are updated in place.
+"""
+import numpy as np
+import pandas as pd
+from project.models.all_seasons import (AllSeasons, AGAINST_OPPONENT_METRICS, AGGREGATE_COLUMNS, ALL_SEASONS_COLUMNS,
+                                        POSITION_TYPES, position_keys, position_aggregates,
+                                        combine_position_aggregates, position_types, against_aggregates,
+                                        combine_against_aggregates, means_against_opponent, opponent_keys)
+from project.models.gameweeks import player_key_column
+
+# The columns of a finished seasons rows kept to update them in place.
+FROZEN_ROWS_COLUMNS = ["season", "player_id", "position", "shift_opponent_id"] + [
+    mean_column for _, mean_column in AGAINST_OPPONENT_METRICS.values()]
+
+
+def add_aggregates(aggregates, season_df, thresholds=None, per_season=False):
+    """
+    adds the position and against aggregates of a season to the running aggregates, or starts them if they are None
+    the aggregates are always added in the order of the seasons, so a full rebuild and an incremental update give the
+    same sums
+    :param aggregates: tuple
+    :param season_df: pandas.core.frame.DataFrame
+    :param thresholds: dict
+    :param per_season: bool
+    :return: tuple
+    """
+    positions = position_aggregates(season_df, thresholds, per_season)
+    against = against_aggregates(season_df)
+    if aggregates is None:
+        return positions, against
+    return (combine_position_aggregates([aggregates[0], positions]),
+            combine_against_aggregates([aggregates[1], against]))
+
+
+def frozen_aggregates(seasons, thresholds=None, per_season=False):
+    """
+    the position and against aggregates of the finished seasons, added one season at a time
+    :param seasons: iterable
+    :param thresholds: dict
+    :param per_season: bool
+    :return: tuple
+    """
+    aggregates = None
+    for season_df in seasons:
+        aggregates = add_aggregates(aggregates, season_df, thresholds, per_season)
+    return aggregates
+
+
+def map_seasons(dataframe, positions, against, thresholds=None, per_season=False):
+    """
+    maps the position types and means against the next opponent from the aggregates, keeping the rows played
+    :param dataframe: pandas.core.frame.DataFrame
+    :param positions: pandas.core.frame.DataFrame
+    :param against: pandas.core.frame.DataFrame
+    :param thresholds: dict
+    :param per_season: bool
+    :return: AllSeasons
+    """
+    all_seasons = AllSeasons(dataframe)
+    all_seasons.map_position_types(aggregates=positions, thresholds=thresholds, per_season=per_season)
+    all_seasons.form_against_shift_opponent(aggregates=against)
+    all_seasons.only_take_minutes_played()
+    return all_seasons
+
+
+def stream_union(clean_store, output_store, frozen_seasons, current_season, thresholds=None, per_season=False):
+    """
+    rebuilds every season of the union one partition at a time, returning the finished seasons aggregates, the
+    combined aggregates and the finished seasons rows kept to update them in place
+    :param clean_store: SeasonStore
+    :param output_store: SeasonStore
+    :param frozen_seasons: list
+    :param current_season: str
+    :param thresholds: dict
+    :param per_season: bool
+    :return: tuple, pandas.core.frame.DataFrame, pandas.core.frame.DataFrame, pandas.core.frame.DataFrame
+    """
+    seasons = clean_store.partitions()
+    aggregates = frozen_aggregates((clean_store.read_partition(season, columns=AGGREGATE_COLUMNS)
+                                    for season in frozen_seasons), thresholds, per_season)
+    totals = aggregates
+    if current_season in seasons:
+        totals = add_aggregates(aggregates, clean_store.read_partition(current_season, columns=AGGREGATE_COLUMNS),
+                                thresholds, per_season)
+    positions, against = totals
+
+    frozen_rows = []
+    for season in seasons:
+        season_df = clean_store.read_partition(season, columns=ALL_SEASONS_COLUMNS)
+        raw_positions = season_df["position"].copy()
+        all_seasons = map_seasons(season_df, positions, against, thresholds, per_season)
+        if season in frozen_seasons:
+            frozen_rows.append(all_seasons.all_seasons.assign(
+                position=raw_positions.loc[all_seasons.all_seasons.index])[FROZEN_ROWS_COLUMNS])
+        all_seasons.take_useful_columns()
+        output_store.write(all_seasons.all_seasons, season)
+    return aggregates, positions, against, pd.concat(frozen_rows, ignore_index=True) if frozen_rows else None
+
+
+class UnionState:
+    def __init__(self, frozen_key, frozen_seasons, aggregates, frozen_rows, written_types, written_against,
+                 thresholds=None, per_season=False):
+        """
+        :param frozen_key: str
+        :param frozen_seasons: list
+        :param aggregates: tuple
+        :param frozen_rows: pandas.core.frame.DataFrame
+        :param written_types: pandas.core.frame.Series
+        :param written_against: pandas.core.frame.DataFrame
+        :param thresholds: dict
+        :param per_season: bool
+        """
+        self.frozen_key = frozen_key
+        self.frozen_seasons = frozen_seasons
+        self.aggregates = aggregates
+        self.frozen_rows = frozen_rows
+        self.written_types = written_types
+        self.written_against = written_against
+        self.thresholds = thresholds
+        self.per_season = per_season
+
+    @classmethod
+    def from_union(cls, frozen_key, frozen_seasons, aggregates, union_rows, positions, against, thresholds=None,
+                   per_season=False):
+        """
+        builds the state from a full rebuild, given the rows of the finished seasons kept by the union before their
+        positions were mapped, and the combined aggregates their output was written from
+        :param frozen_key: str
+        :param frozen_seasons: list
+        :param aggregates: tuple
+        :param union_rows: pandas.core.frame.DataFrame
+        :param positions: pandas.core.frame.DataFrame
+        :param against: pandas.core.frame.DataFrame
+        :param thresholds: dict
+        :param per_season: bool
+        :return: UnionState
+        """
+        union_rows = union_rows[union_rows["season"].isin(frozen_seasons)]
+        mean_columns = [mean_column for _, mean_column in AGAINST_OPPONENT_METRICS.values()]
+        frozen_rows = pd.DataFrame({"season": union_rows["season"].astype(str).to_numpy(),
+                                    "row": union_rows.groupby("season", observed=True).cumcount().to_numpy(),
+                                    "player": union_rows[player_key_column(union_rows)].to_numpy(),
+                                    "position": union_rows["position"].astype(str).to_numpy(),
+                                    "shift_opponent_id": opponent_keys(union_rows["shift_opponent_id"])})
+        frozen_rows[mean_columns] = union_rows[mean_columns].to_numpy(dtype=float)
+        return cls(frozen_key, list(frozen_seasons), aggregates, frozen_rows, position_types(positions, thresholds),
+                   against, thresholds, per_season)
+
+    def frozen_keys(self, rows):
+        """
+        the position keys of the frozen rows
+        :param rows: pandas.core.frame.DataFrame
+        :return: pandas.core.indexes.multi.MultiIndex
+        """
+        return position_keys(rows["position"].to_numpy(), rows["player"].to_numpy(),
+                             rows["season"].to_numpy() if self.per_season else None)
+
+    def changed_rows(self, positions, against):
+        """
+        the frozen rows whose position type or means against their next opponent differ between the totals written and
+        the new totals
+        :param positions: pandas.core.frame.DataFrame
+        :param against: pandas.core.frame.DataFrame
+        :return: np.array, pandas.core.frame.Series
+        """
+        types = position_types(positions, self.thresholds)
+        keys = types.index.union(self.written_types.index)
+        changed_keys = keys[types.reindex(keys).ne(self.written_types.reindex(keys)).to_numpy()]
+        changed = self.frozen_keys(self.frozen_rows).isin(changed_keys)
+
+        pairs = against.index.union(self.written_against.index)
+        changed_pairs = pairs[against.reindex(pairs).ne(self.written_against.reindex(pairs)).any(axis=1).to_numpy()]
+        changed |= pd.MultiIndex.from_arrays([self.frozen_rows["player"], self.frozen_rows["shift_opponent_id"]]).isin(
+            changed_pairs)
+        return np.flatnonzero(changed), types
+
+    def update(self, store, current_seasons):
+        """
+        merges the current seasons rows into the totals and updates the frozen rows of the store whose output changed
+        returns the new totals, to map the current seasons rows, and the number of frozen rows updated
+        the totals written are only kept in memory, so the state must be saved once the current season is written
+        :param store: SeasonStore
+        :param current_seasons: pandas.core.frame.DataFrame
+        :return: pandas.core.frame.DataFrame, pandas.core.frame.DataFrame, int
+        """
+        positions, against = add_aggregates(self.aggregates, current_seasons, self.thresholds, self.per_season)
+        changed, types = self.changed_rows(positions, against)
+        rows = self.frozen_rows.iloc[changed]
+
+        mapped = rows["position"].to_numpy(dtype=object)
+        typed = np.flatnonzero(rows["position"].isin(list(POSITION_TYPES)).to_numpy())
+        mapped[typed] = types.reindex(self.frozen_keys(rows.iloc[typed])).to_numpy()
+        means = means_against_opponent(against, rows["player"].to_numpy(), rows["shift_opponent_id"].to_numpy())
+
+        values = {"position": mapped}
+        for i, (against_column, mean_column) in enumerate(AGAINST_OPPONENT_METRICS.values()):
+            values[against_column] = np.where(np.isnan(means[:, i]), rows[mean_column].to_numpy(), means[:, i])
+        season_rows = rows["season"].to_numpy()
+        for season in pd.unique(season_rows):
+            in_season = season_rows == season
+            store.update_rows(season, rows["row"].to_numpy()[in_season],
+                              {column: column_values[in_season] for column, column_values in values.items()})
+
+        self.written_types = types
+        self.written_against = against
+        return positions, against, len(rows)
+
+    def merge(self, store, current_seasons, current_season, path):
+        """
+        merges the current seasons rows into the store, updating the frozen rows whose output changed and rewriting
+        the current season, then saves the state
+        the state is saved only after the store is written, so a failed merge leaves the state of the last merge and
+        the next merge updates the same rows again
+        :param store: SeasonStore
+        :param current_seasons: pandas.core.frame.DataFrame
+        :param current_season: str
+        :param path: str
+        :return: int
+        """
+        positions, against, updated = self.update(store, current_seasons)
+        all_seasons = map_seasons(current_seasons, positions, against, self.thresholds, self.per_season)
+        all_seasons.take_useful_columns()
+        store.write(all_seasons.all_seasons, current_season)
+        self.save(path)
+        return updated
+
+    def save(self, path):
+        """
+        :param path: str
+        :return: None
+        """
+        pd.to_pickle(self, path)
+
+    @staticmethod
+    def load(path):
+        """
+        :param path: str
+        :return: UnionState
+        """
+        return pd.read_pickle(path)
@@ -0,0 +1,106 @@
+"""
+Pick the FPL squad and starting XI with the most expected points in the upcoming gameweek, or the best transfers for a
+squad.
+A players expected points are the probabilities of the predicted points ranges weighted by the mean points of each
+range in the clean gameweeks, or the mean points of the predicted range if the model has no probabilities, summed over
+their fixtures, and their value is their latest value in the current seasons clean gameweeks.
+
+Usage, from the root of the repository:
+    python -m project.optimize [--budget 1000] [--bench-weight 0.1] [--limit AttDEF 0 2 ...]
+    python -m project.optimize --squad name ... [--transfers 1] [--free-transfers 1] [--candidates 40] [--jobs N]
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from project.models.season_store import SeasonStore
+from project.models.squad import PlayerTable, select_squad, best_transfers, score_squads, BUDGET
+from project.predict import PredictionService, CURRENT_SEASON
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLEAN_GAMEWEEKS_PATH = os.path.join(ROOT, "data", "clean_gameweeks")
+
+
+def points_by_range(store_path=CLEAN_GAMEWEEKS_PATH):
+    """
+    the mean points of each points range in the clean gameweeks
+    :param store_path: str
+    :return: pandas.core.frame.Series
+    """
+    gameweeks = SeasonStore(store_path).read(columns=["total_points", "total_points_range"])
+    return gameweeks["total_points"].groupby(gameweeks["total_points_range"].astype(float)).mean()
+
+
+def load_players(service, store_path=CLEAN_GAMEWEEKS_PATH, season=CURRENT_SEASON):
+    """
+    the player table of the predicted players with a known value
+    :param service: PredictionService
+    :param store_path: str
+    :param season: str
+    :return: PlayerTable
+    """
+    range_points = points_by_range(store_path)
+    if service.probabilities is not None:
+        classes = service.model.estimator.classes_.astype(float)
+        expected_points = service.probabilities @ range_points.reindex(classes).fillna(0).to_numpy()
+    else:
+        expected_points = range_points.reindex(service.predicted_ranges.astype(float)).to_numpy()
+
+    gameweeks = SeasonStore(store_path).read(partitions=[season], columns=["name", "plays_for", "value"])
+    values = gameweeks.astype({"name": str, "plays_for": str}).drop_duplicates(["name", "plays_for"], keep="last")
+    players = service.predictors[["name", "position", "plays_for"]].astype(str).assign(expected_points=expected_points)
+    # a player with two fixtures in a double gameweek has a row for each, and scores the points of both
+    players = players.groupby(["name", "position", "plays_for"], sort=False, as_index=False)["expected_points"].sum()
+    players = players.merge(values, on=["name", "plays_for"], how="inner")
+    return PlayerTable.from_dataframe(players[players["position"] != "nan"])
+
+
+def squad_rows(table, names):
+    """
+    the rows of the players of the squad, by name
+    :param table: PlayerTable
+    :param names: list
+    :return: np.array
+    """
+    rows = []
+    for name in names:
+        matches = np.flatnonzero(table.names == name)
+        if not len(matches):
+            raise KeyError("Player {} is not in the player table".format(name))
+        rows.append(matches[0])
+    return np.array(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick the best squad or transfers by expected points.")
+    parser.add_argument("--budget", type=int, default=BUDGET, help="the budget in tenths of a million")
+    parser.add_argument("--bench-weight", type=float, default=0.1, help="the weight of the bench's points")
+    parser.add_argument("--limit", nargs=3, action="append", default=[], metavar=("TYPE", "MIN", "MAX"),
+                        help="the fewest and most players of a position type, e.g. AttDEF 0 2")
+    parser.add_argument("--squad", nargs="+", help="the names of the current squad, to find the best transfers")
+    parser.add_argument("--transfers", type=int, default=1, help="the number of transfers of each scenario")
+    parser.add_argument("--free-transfers", type=int, default=1, help="the transfers without a points hit")
+    parser.add_argument("--candidates", type=int, default=None,
+                        help="only transfer in the best predicted players of each position")
+    parser.add_argument("--top", type=int, default=10, help="the number of transfer scenarios shown")
+    parser.add_argument("--jobs", type=int, default=-1, help="the number of parallel jobs, -1 for every core")
+    arguments = parser.parse_args()
+    position_limits = {position_type: (int(low), int(high)) for position_type, low, high in arguments.limit}
+
+    start = time.perf_counter()
+    players = load_players(PredictionService())
+    print("Loaded {} players in {:.2f}s".format(len(players), time.perf_counter() - start))
+    start = time.perf_counter()
+    if arguments.squad:
+        rows = squad_rows(players, arguments.squad)
+        current_score = score_squads(players, rows[None, :], np.inf, arguments.bench_weight)[0]
+        scenarios = best_transfers(players, rows, arguments.budget, arguments.transfers, arguments.free_transfers,
+                                   bench_weight=arguments.bench_weight, position_limits=position_limits,
+                                   candidates=arguments.candidates, top=arguments.top, jobs=arguments.jobs)
+        print(json.dumps({"score": float(current_score), "transfers": scenarios}, indent=2))
+    else:
+        squad = select_squad(players, arguments.budget, arguments.bench_weight, position_limits)
+        print(json.dumps({"score": squad.score, "cost": int(squad.cost),
+                          "players": players.describe(squad.rows, squad.starters)}, indent=2))
+    print("Optimized in {:.3f}s".format(time.perf_counter() - start))
@@ -0,0 +1,225 @@
+"""
+Run the transform scripts as a dependency graph of stages, skipping the stages whose inputs have not changed.
+Each stages outputs are cached under a key built from the content hashes of its input files and code, and the values
+of the parameters it uses, so an unchanged stage is restored from the cache rather than run again.
+
+Usage, from the root of the repository:
+    python -m project.pipeline [stage ...] [--force] [--cache PATH]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from project.hashing import hash_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSFORM_PATH = os.path.join(ROOT, "project", "transform")
+
+parameters = json.load(open(os.path.join(ROOT, "project", "parameters.json")))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+FINISHED_SEASONS = ["2016-17", "2017-18", "2018-19", "2019-20", "2020-21", "2021-22"]
+
+# The code every stage imports, hashed into the key of every stage.
+SHARED_CODE = ["project/hashing.py", "project/instrumentation.py"]
+
+
+class Stage:
+    def __init__(self, name, script, code, inputs, outputs, parameter_names=(), dependencies=()):
+        """
+        :param name: str
+        :param script: str
+        :param code: list
+        :param inputs: list
+        :param outputs: list
+        :param parameter_names: list
+        :param dependencies: list
+        """
+        self.name = name
+        self.script = script
+        self.code = [script] + SHARED_CODE + list(code)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.parameter_names = list(parameter_names)
+        self.dependencies = list(dependencies)
+
+    def key(self):
+        """
+        the cache key of the stage, a hash of its code, inputs and parameters
+        :return: str
+        """
+        missing_inputs = [path for path in self.inputs if not os.path.exists(os.path.join(ROOT, path))]
+        if missing_inputs:
+            raise FileNotFoundError("Stage {} is missing inputs: {}".format(self.name, ", ".join(missing_inputs)))
+        key = {
+            "stage": self.name,
+            "code": {path: hash_path(path) for path in self.code},
+            "inputs": {path: hash_path(path) for path in self.inputs},
+            "parameters": {name: parameters[name] for name in self.parameter_names}
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def run(self):
+        """
+        runs the stages script from the transform directory, as the scripts read and write relative to it
+        :return: None
+        """
+        environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        subprocess.run([sys.executable, os.path.join(ROOT, self.script)], cwd=TRANSFORM_PATH, env=environment,
+                       check=True)
+
+
+def copy_path(source, destination):
+    """
+    copies a file or directory, replacing the destination
+    :param source: str
+    :param destination: str
+    :return: None
+    """
+    if os.path.isdir(destination):
+        shutil.rmtree(destination)
+    elif os.path.exists(destination):
+        os.remove(destination)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if os.path.isdir(source):
+        shutil.copytree(source, destination)
+    else:
+        shutil.copy2(source, destination)
+
+
+def clean_gameweeks(seasons):
+    """
+    :param seasons: list
+    :return: list
+    """
+    return ["data/clean_gameweeks/{}".format(season) for season in seasons]
+
+
+GAMEWEEKS_CODE = ["project/transform/individual.py", "project/models/gameweeks.py", "project/models/end_of_season.py",
+                  "project/models/identity.py", "project/models/season_store.py"]
+
+STAGES = {
+    "identity": Stage(
+        "identity", "project/transform/identity.py",
+        code=["project/transform/individual.py", "project/models/gameweeks.py", "project/models/end_of_season.py",
+              "project/models/identity.py"],
+        inputs=["data/gameweeks", "data/end_of_season", "data/game_odds"],
+        outputs=["data/identity"]),
+    "finished": Stage(
+        "finished", "project/transform/finished.py",
+        code=GAMEWEEKS_CODE,
+        inputs=(["data/gameweeks/{}-gameweeks.csv".format(season) for season in FINISHED_SEASONS]
+                + ["data/game_odds/{}-game-odds.csv".format(season) for season in FINISHED_SEASONS]
+                + ["data/end_of_season", "data/identity"]),
+        outputs=clean_gameweeks(FINISHED_SEASONS),
+        dependencies=["identity"]),
+    "current": Stage(
+        "current", "project/transform/current.py",
+        code=GAMEWEEKS_CODE + ["project/models/gameweeks_state.py"],
+        inputs=["data/gameweeks/{}-gameweeks.csv".format(CURRENT_SEASON),
+                "data/game_odds/{}-game-odds.csv".format(CURRENT_SEASON), "data/identity"],
+        outputs=clean_gameweeks([CURRENT_SEASON]) + ["data/clean_gameweeks/{}-state.pkl".format(CURRENT_SEASON)],
+        parameter_names=["CURRENT_SEASON", "INCREMENTAL_CURRENT_SEASON"],
+        dependencies=["identity"]),
+    "union": Stage(
+        "union", "project/transform/union.py",
+        code=["project/models/all_seasons.py", "project/models/gameweeks.py", "project/models/season_store.py",
+              "project/models/union_state.py"],
+        inputs=clean_gameweeks(FINISHED_SEASONS + [CURRENT_SEASON]),
+        outputs=["data/all_seasons"],
+        parameter_names=["CURRENT_SEASON", "INCREMENTAL_UNION", "POSITION_THRESHOLDS", "POSITIONS_PER_SEASON"],
+        dependencies=["finished", "current"]),
+    "training": Stage(
+        "training", "project/transform/training.py",
+        code=["project/models/training.py", "project/models/season_store.py"],
+        inputs=["data/all_seasons"],
+        outputs=[],
+        parameter_names=["SPARSE_DUMMIES"],
+        dependencies=["union"]),
+    "predictors": Stage(
+        "predictors", "project/transform/predictors.py",
+        code=["project/models/season_store.py"],
+        inputs=["data/all_seasons"],
+        outputs=[],
+        parameter_names=["CURRENT_SEASON"],
+        dependencies=["union"])
+}
+
+
+def resolve(targets):
+    """
+    the stages needed to run the targets, ordered so every stage comes after its dependencies
+    :param targets: list
+    :return: list
+    """
+    ordered, visiting = [], set()
+
+    def visit(name):
+        if name not in STAGES:
+            raise KeyError("Unknown stage {}, the stages are {}".format(name, ", ".join(STAGES)))
+        if name in ordered:
+            return
+        if name in visiting:
+            raise ValueError("The stages have a cycle through {}".format(name))
+        visiting.add(name)
+        for dependency in STAGES[name].dependencies:
+            visit(dependency)
+        visiting.discard(name)
+        ordered.append(name)
+
+    for target in targets:
+        visit(target)
+    return ordered
+
+
+def run_pipeline(targets, cache_path, force=False):
+    """
+    runs the stages needed for the targets, restoring a stages outputs from the cache when its key is cached
+    a stage without outputs has nothing to restore, so it always runs
+    :param targets: list
+    :param cache_path: str
+    :param force: bool
+    :return: list
+    """
+    report = []
+    for name in resolve(targets):
+        stage = STAGES[name]
+        start = time.perf_counter()
+        key = stage.key()
+        stage_cache = os.path.join(cache_path, name, key)
+        if stage.outputs and not force and os.path.exists(os.path.join(stage_cache, "complete")):
+            for output in stage.outputs:
+                cached_output = os.path.join(stage_cache, output)
+                if not os.path.exists(os.path.join(ROOT, output)) or hash_path(output) != hash_path(cached_output):
+                    copy_path(cached_output, os.path.join(ROOT, output))
+            status = "hit"
+        else:
+            print("Running {}".format(name))
+            stage.run()
+            for output in stage.outputs:
+                copy_path(os.path.join(ROOT, output), os.path.join(stage_cache, output))
+            if stage.outputs:
+                open(os.path.join(stage_cache, "complete"), "w").close()
+            status = "rebuilt" if stage.outputs else "ran"
+        report.append({"stage": name, "status": status, "key": key, "seconds": time.perf_counter() - start})
+
+    os.makedirs(cache_path, exist_ok=True)
+    with open(os.path.join(cache_path, "report.json"), "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print("{:<12}{:<10}{:>10}  {}".format("Stage", "Status", "Seconds", "Key"))
+    for stage in report:
+        print("{:<12}{:<10}{:>10.2f}  {}".format(stage["stage"], stage["status"], stage["seconds"], stage["key"][:12]))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the transform stages, skipping the unchanged stages.")
+    parser.add_argument("stages", nargs="*", default=["training", "predictors"],
+                        help="the stages to run, along with their dependencies: {}".format(", ".join(STAGES)))
+    parser.add_argument("--force", action="store_true", help="run every stage even if it is cached")
+    parser.add_argument("--cache", default=os.path.join(ROOT, "data", ".cache"), help="the cache directory")
+    arguments = parser.parse_args()
+    run_pipeline(arguments.stages, arguments.cache, arguments.force)
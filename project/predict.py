@@ -1,3 +1,208 @@
 """
 Use the best performing model to predict the players points haul in the upcoming FPL gameweek.
+The model bundle saved by gridsearch.py and the current seasons predictors are loaded once, the predictors are encoded
+onto the training layout by the bundle and the whole gameweek is predicted in one call, so a players prediction is a
+lookup.
+The predictors are built from each players latest matches in the current seasons clean gameweeks and the fixtures and
+upcoming odds of the next gameweek, as fetched by project.fetch.fixtures and project.fetch.odds, so every player is
+predicted for their own next match. The service refuses to load without them, and any predictor still missing, e.g. the
+form of a player whose metrics were never recorded, is counted when it is filled with the training median.
+
+Usage, from the root of the repository:
+    python -m project.predict [player ...] [--top N]
+    python -m project.predict --serve [--port 8000]
+where the server answers GET /players, GET /players/<name> and GET /health with json.
 """
+import argparse
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+import numpy as np
+import pandas as pd
+from project.models.all_seasons import AGGREGATE_COLUMNS
+from project.models.bundle import ModelBundle
+from project.models.identity import IdentityIndex
+from project.models.predictors import Predictors, PREDICTORS_COLUMNS, NEXT_FIXTURES_COLUMNS, UPCOMING_ODDS_COLUMNS
+from project.models.season_store import SeasonStore, apply_schema
+from project.models.union_state import frozen_aggregates
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(ROOT, "data", "models", "model")
+CLEAN_GAMEWEEKS_PATH = os.path.join(ROOT, "data", "clean_gameweeks")
+IDENTITY_PATH = os.path.join(ROOT, "data", "identity")
+UPCOMING_ODDS_PATH = os.path.join(ROOT, "data", "game_odds", "upcoming-game-odds.csv")
+
+parameters = json.load(open(os.path.join(ROOT, "project", "parameters.json")))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+POSITION_THRESHOLDS = parameters["POSITION_THRESHOLDS"]
+POSITIONS_PER_SEASON = parameters["POSITIONS_PER_SEASON"]
+NEXT_FIXTURES_PATH = os.path.join(ROOT, "data", "fixtures", "{}-next-fixtures.csv".format(CURRENT_SEASON))
+
+
+def read_fetched(path, columns, fetcher):
+    """
+    reads the used columns of a fetched file, parsed as their declared types
+    :param path: str
+    :param columns: dict
+    :param fetcher: str
+    :return: pandas.core.frame.DataFrame
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError("{} has not been fetched, run python -m {} first".format(path, fetcher))
+    return pd.read_csv(path, usecols=list(columns), dtype=columns)
+
+
+def load_predictors(store_path=CLEAN_GAMEWEEKS_PATH, season=CURRENT_SEASON, fixtures_path=NEXT_FIXTURES_PATH,
+                    odds_path=UPCOMING_ODDS_PATH, identity_path=IDENTITY_PATH):
+    """
+    the predictors of each player for each of their fixtures in the next gameweek, built from the seasons clean
+    gameweeks, the next fixtures and the upcoming odds, where the positions and the form against the opponent are
+    taken from the aggregates of every season in the store, as the union takes them, and the teams are joined by their
+    ids in the identity index
+    :param store_path: str
+    :param season: str
+    :param fixtures_path: str
+    :param odds_path: str
+    :param identity_path: str
+    :return: pandas.core.frame.DataFrame
+    """
+    fixtures = read_fetched(fixtures_path, NEXT_FIXTURES_COLUMNS, "project.fetch.fixtures")
+    game_odds = read_fetched(odds_path, UPCOMING_ODDS_COLUMNS, "project.fetch.odds")
+    identity = IdentityIndex.load(identity_path)
+    store = SeasonStore(store_path)
+    positions, against = frozen_aggregates((store.read_partition(partition, columns=AGGREGATE_COLUMNS)
+                                            for partition in store.partitions()),
+                                           POSITION_THRESHOLDS, POSITIONS_PER_SEASON)
+
+    predictors = Predictors(store.read_partition(season, columns=PREDICTORS_COLUMNS, mmap=False))
+    predictors.take_latest_matches()
+    predictors.join_fixtures(fixtures, identity)
+    predictors.join_odds(game_odds, identity)
+    predictors.add_next_value()
+    predictors.map_position_types(positions, POSITION_THRESHOLDS, POSITIONS_PER_SEASON)
+    predictors.form_against_next_opponent(against)
+    predictors.take_useful_columns()
+    return apply_schema(predictors.predictors)
+
+
+class PredictionService:
+    def __init__(self, model_path=MODEL_PATH, store_path=CLEAN_GAMEWEEKS_PATH, season=CURRENT_SEASON,
+                 fixtures_path=NEXT_FIXTURES_PATH, odds_path=UPCOMING_ODDS_PATH):
+        """
+        :param model_path: str
+        :param store_path: str
+        :param season: str
+        :param fixtures_path: str
+        :param odds_path: str
+        """
+        self.model = ModelBundle.load(model_path)
+        self.predictors = load_predictors(store_path, season, fixtures_path, odds_path)
+        if not len(self.predictors):
+            raise ValueError("No player plays for a team with a fixture in {}".format(fixtures_path))
+        missing_values = int(self.predictors[self.model.numerical_columns].isna().to_numpy().sum())
+        if missing_values:
+            print("Filled {} missing predictor values with the training medians".format(missing_values))
+        self.features = self.model.encode(self.predictors)
+
+        estimator = self.model.estimator
+        self.predicted_ranges = estimator.predict(self.features)
+        self.probabilities = estimator.predict_proba(self.features) if hasattr(estimator, "predict_proba") else None
+        self.rows_by_player = {}
+        for row, name in enumerate(self.predictors["name"].astype(str)):
+            self.rows_by_player.setdefault(name, []).append(row)
+
+    def describe_row(self, row):
+        """
+        the prediction of a row of the predictors
+        :param row: int
+        :return: dict
+        """
+        prediction = {"name": str(self.predictors.at[row, "name"]),
+                      "position": str(self.predictors.at[row, "position"]),
+                      "plays_for": str(self.predictors.at[row, "plays_for"]),
+                      "predicted_points_range": int(self.predicted_ranges[row])}
+        if self.probabilities is not None:
+            prediction["probabilities"] = {str(int(points_range)): float(probability) for points_range, probability
+                                           in zip(self.model.estimator.classes_, self.probabilities[row])}
+        return prediction
+
+    def predict_player(self, name):
+        """
+        the predictions of the players with the name, as players can share a name
+        :param name: str
+        :return: list
+        """
+        return [self.describe_row(row) for row in self.rows_by_player.get(name, [])]
+
+    def predict_gameweek(self, top=None):
+        """
+        the predictions of every player, ordered by the predicted points range and then by the probability of the
+        highest points range
+        :param top: int
+        :return: list
+        """
+        if self.probabilities is not None:
+            order = np.lexsort((-self.probabilities[:, -1], -self.predicted_ranges))
+        else:
+            order = np.argsort(-self.predicted_ranges, kind="stable")
+        return [self.describe_row(row) for row in order[:top]]
+
+
+def serve(service, port):
+    """
+    serves the predictions as json over http on localhost until interrupted
+    :param service: PredictionService
+    :param port: int
+    :return: None
+    """
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = unquote(self.path.split("?")[0]).rstrip("/")
+            if path == "/health":
+                status, body = 200, {"players": len(service.predictors)}
+            elif path == "/players":
+                status, body = 200, service.predict_gameweek()
+            elif path.startswith("/players/"):
+                body = service.predict_player(path[len("/players/"):])
+                status = 200 if body else 404
+            else:
+                status, body = 404, {"error": "Unknown path {}".format(path)}
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), PredictionHandler)
+    print("Serving predictions for {} players on http://127.0.0.1:{}".format(len(service.predictors), port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict the players points range in the upcoming gameweek.")
+    parser.add_argument("players", nargs="*", help="the players to predict, or every player if none are given")
+    parser.add_argument("--top", type=int, default=None, help="only show the top players of the gameweek")
+    parser.add_argument("--serve", action="store_true", help="serve the predictions over http")
+    parser.add_argument("--port", type=int, default=8000, help="the port of the server")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    prediction_service = PredictionService()
+    print("Loaded the model and {} players in {:.2f}s".format(len(prediction_service.predictors),
+                                                             time.perf_counter() - start))
+    if arguments.serve:
+        serve(prediction_service, arguments.port)
+    else:
+        if arguments.players:
+            predictions = [prediction for player in arguments.players
+                           for prediction in prediction_service.predict_player(player) or [{"name": player,
+                                                                                            "error": "Not found"}]]
+        else:
+            predictions = prediction_service.predict_gameweek(arguments.top)
+        print(json.dumps(predictions, indent=2))
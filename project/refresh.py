@@ -0,0 +1,86 @@
+"""
+Refresh the saved model bundle with the rows of the all seasons data labelled since it was trained, instead of
+rebuilding the training matrix and refitting the model on every season.
+Only the partitions of the current season and of seasons the bundle has not seen are read, and a row is new if its hash
+is not among the hashes of the rows the bundle was trained on, so a weeks refresh costs a gameweeks worth of rows.
+The estimator must be partially fittable, e.g. the sgd candidates of the grid search; the refreshed model drifts from a
+full refit over time, which benchmarks/refresh.py measures, so a full grid search should still be rerun now and then.
+
+Usage, from the root of the repository:
+    python -m project.refresh [--season 2022-23] [--dry-run]
+"""
+import argparse
+import json
+import os
+import time
+import warnings
+import numpy as np
+from project.gridsearch import ALL_SEASONS_PATH, MODEL_PATH
+from project.models.bundle import ModelBundle
+from project.models.season_store import SeasonStore
+from project.models.training import row_hashes, season_row_hashes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+parameters = json.load(open(os.path.join(ROOT, "project", "parameters.json")))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+LABEL = "shift_total_points_range"
+
+
+def new_training_rows(bundle, store, season=CURRENT_SEASON):
+    """
+    the labelled rows of the season and of the seasons the bundle has not been trained on, that it has not been
+    trained on, with their row hashes by season
+    :param bundle: ModelBundle
+    :param store: SeasonStore
+    :param season: str
+    :return: pandas.core.frame.DataFrame, pandas.core.frame.Series, dict
+    """
+    partitions = [partition for partition in store.partitions()
+                  if partition == season or partition not in bundle.trained_rows]
+    if not partitions:
+        raise FileNotFoundError("No partitions to refresh from in the season store at {}".format(store.path))
+    rows = store.read(partitions=partitions, mmap=False)
+    rows = rows[rows["shift_opponent"].notna()]
+    seasons = rows["season"].astype(str).to_numpy()
+    hashes = row_hashes(rows)
+    is_new = np.ones(len(rows), dtype=bool)
+    for partition in partitions:
+        in_partition = seasons == partition
+        is_new[in_partition] = ~np.isin(hashes[in_partition], bundle.trained_rows.get(partition, []))
+    rows = rows[is_new]
+    labels = rows.pop(LABEL)
+    return rows, labels, season_row_hashes(hashes[is_new], seasons[is_new])
+
+
+def refresh_model(model_path=MODEL_PATH, store_path=os.path.join(ROOT, ALL_SEASONS_PATH), season=CURRENT_SEASON,
+                  save=True):
+    """
+    partially fits the saved bundle to the rows labelled since it was trained, and saves it in place
+    :param model_path: str
+    :param store_path: str
+    :param season: str
+    :param save: bool
+    :return: dict
+    """
+    bundle = ModelBundle.load(model_path, mmap=False)
+    predictors, labels, trained_rows = new_training_rows(bundle, SeasonStore(store_path), season)
+    if not len(predictors):
+        return {"rows": 0, "new_features": 0}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        refresh = bundle.refresh(predictors, labels, trained_rows)
+    if save:
+        bundle.save(model_path)
+    return refresh
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the saved model with the newly labelled rows.")
+    parser.add_argument("--season", default=CURRENT_SEASON, help="the season whose new rows are fitted")
+    parser.add_argument("--dry-run", action="store_true", help="fit the new rows without saving the model")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    refresh = refresh_model(season=arguments.season, save=not arguments.dry_run)
+    print("Refreshed the model with {} new rows and {} new features in {:.2f}s".format(
+        refresh["rows"], refresh["new_features"], time.perf_counter() - start))
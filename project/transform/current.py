@@ -1,35 +1,75 @@
 """
 Transform the current seasons data so that it is aligned with the finished seasons' data.
+In incremental mode, only the gameweeks appended since the last run are transformed, using the per player state kept
+from that run, and the clean gameweeks are updated in place.
 """
 import json
-import pandas as pd
-from project.transform.individual import gameweeks_2022_23
+import os
+from project.transform.individual import load_gameweeks, read_game_odds
 from project.models.gameweeks import Gameweeks
+from project.models.gameweeks_state import GameweeksState
+from project.models.identity import IdentityIndex
+from project.models.season_store import SeasonStore
 
 parameters = json.load(open("../../project/parameters.json"))
 CURRENT_SEASON = parameters["CURRENT_SEASON"]
+INCREMENTAL = parameters["INCREMENTAL_CURRENT_SEASON"]
 
-gameweeks = Gameweeks(gameweeks_2022_23)
+clean_gameweeks = SeasonStore("../../data/clean_gameweeks")
+STATE_PATH = "../../data/clean_gameweeks/{}-state.pkl".format(CURRENT_SEASON)
 
-gameweeks.add_season(CURRENT_SEASON)
-gameweeks.add_value_delta()
+raw_gameweeks = load_gameweeks(CURRENT_SEASON)
+identity = IdentityIndex.load("../../data/identity")
+game_odds = read_game_odds(CURRENT_SEASON)
 
-game_odds = pd.read_csv("../../data/game_odds/{}-game-odds.csv".format(CURRENT_SEASON))
 
-gameweeks.map_opponent_team(game_odds)
-gameweeks.add_teams()
-gameweeks.add_times_of_match()
+def transform_gameweeks(dataframe):
+    """
+    runs every transformation of the gameweeks data for the current season
+    :param dataframe: pandas.core.frame.DataFrame
+    :return: pandas.core.frame.DataFrame
+    """
+    gameweeks = Gameweeks(dataframe.copy())
 
-gameweeks.join_odds(game_odds)
-gameweeks.add_win_expectation()
+    gameweeks.add_season(CURRENT_SEASON)
+    gameweeks.add_player_ids(identity, CURRENT_SEASON)
+    gameweeks.add_value_delta()
 
-gameweeks.add_won()
-gameweeks.add_total_points_range()
+    gameweeks.map_opponent_team(identity, CURRENT_SEASON)
+    gameweeks.add_teams()
+    gameweeks.add_times_of_match()
 
-print("Rolling Mean Metrics:")
-gameweeks.rolling_mean_metrics()
-print("Shifting Match Info:")
-gameweeks.shift_match_info()
+    gameweeks.join_odds(game_odds, identity)
+    gameweeks.add_win_expectation()
 
-gameweeks.take_useful_columns()
-gameweeks.gameweeks.to_csv("../../data/clean_gameweeks/{}-clean-gameweeks.csv".format(CURRENT_SEASON), index=False)
+    gameweeks.add_won()
+    gameweeks.add_total_points_range()
+
+    print("Rolling Mean Metrics:")
+    gameweeks.rolling_mean_metrics()
+    print("Shifting Match Info:")
+    gameweeks.shift_match_info()
+
+    gameweeks.take_useful_columns()
+    return gameweeks.gameweeks
+
+
+state = None
+if INCREMENTAL and os.path.exists(STATE_PATH) and CURRENT_SEASON in clean_gameweeks.partitions():
+    state = GameweeksState.load(STATE_PATH)
+    rows_stored = clean_gameweeks.schema(CURRENT_SEASON)["rows"]
+    if rows_stored != state.rows_processed or not state.can_extend(raw_gameweeks):
+        state = None
+
+if state is not None:
+    print("Transforming {} new rows".format(len(raw_gameweeks) - state.rows_processed))
+    transformed = transform_gameweeks(state.combine(raw_gameweeks))
+    clean = state.update_clean_rows(clean_gameweeks.read_partition(CURRENT_SEASON, mmap=False), transformed)
+    clean_gameweeks.write(clean, CURRENT_SEASON)
+    state.advance(raw_gameweeks)
+else:
+    clean_gameweeks.write(transform_gameweeks(raw_gameweeks), CURRENT_SEASON)
+    state = GameweeksState.from_gameweeks(raw_gameweeks)
+
+if INCREMENTAL:
+    state.save(STATE_PATH)
@@ -1,54 +1,103 @@
 """
 Transform the gameweeks data of the finished seasons so that it is aligned across seasons.
+Each season is transformed independently, so the seasons are dispatched to a pool of processes, with the number of
+workers set by WORKERS in the parameters, where null uses every core.
 """
-import pandas as pd
-from project.transform.individual import gameweeks_2018_19, gameweeks_2020_21, gameweeks_2021_22
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from project import instrumentation
 from project.models.gameweeks import Gameweeks
 from project.models.end_of_season import EndOfSeason
+from project.models.identity import IdentityIndex
+from project.models.season_store import SeasonStore
+from project.transform.individual import load_gameweeks, read_game_odds, read_end_of_season
 
-gameweeks_dict = {
-    "2016-17": pd.read_csv('../../data/gameweeks/2016-17-gameweeks.csv', encoding="latin-1"),
-    "2017-18": pd.read_csv('../../data/gameweeks/2017-18-gameweeks.csv', encoding="latin-1"),
-    "2018-19": gameweeks_2018_19,
-    "2019-20": pd.read_csv('../../data/gameweeks/2019-20-gameweeks.csv', encoding="utf-8"),
-    "2020-21": gameweeks_2020_21,
-    "2021-22": gameweeks_2021_22
-}
+parameters = json.load(open("../../project/parameters.json"))
+WORKERS = parameters["WORKERS"]
 
-for season in gameweeks_dict.keys():
-    print(season)
-    gameweeks = Gameweeks(gameweeks_dict[season])
+FINISHED_SEASONS = ["2016-17", "2017-18", "2018-19", "2019-20", "2020-21", "2021-22"]
+
+
+def transform_season(season):
+    """
+    runs every transformation of a finished seasons gameweeks data and writes it to the clean gameweeks store
+    the calls instrumented in the worker process are returned, as a worker does not write a trace of its own
+    :param season: str
+    :return: str, float, list
+    """
+    start = time.perf_counter()
+    gameweeks = Gameweeks(load_gameweeks(season))
 
     gameweeks.add_season(season)
-    gameweeks.add_value_delta()
 
     if season in {"2016-17", "2017-18", "2018-19", "2019-20"}:
         gameweeks.align_player_names()
 
-        end_of_season_df = pd.read_csv("../../data/end_of_season/{}-end-of-season.csv".format(season))
-
-        end_of_season = EndOfSeason(end_of_season_df)
+        end_of_season = EndOfSeason(read_end_of_season(season))
         end_of_season.align_player_names()
         end_of_season.map_position()
 
         gameweeks.join_position(end_of_season)
 
-    game_odds = pd.read_csv("../../data/game_odds/{}-game-odds.csv".format(season))
+    identity = IdentityIndex.load("../../data/identity")
+    gameweeks.add_player_ids(identity, season)
+    gameweeks.add_value_delta()
+
+    game_odds = read_game_odds(season)
 
-    gameweeks.map_opponent_team(game_odds)
+    gameweeks.map_opponent_team(identity, season)
     gameweeks.add_teams()
     gameweeks.add_times_of_match()
 
-    gameweeks.join_odds(game_odds)
+    gameweeks.join_odds(game_odds, identity)
     gameweeks.add_win_expectation()
 
     gameweeks.add_won()
     gameweeks.add_total_points_range()
 
-    print("Rolling Mean Metrics:")
     gameweeks.rolling_mean_metrics()
-    print("Shifting Match Info:")
     gameweeks.shift_match_info()
 
     gameweeks.take_useful_columns()
-    gameweeks.gameweeks.to_csv("../../data/clean_gameweeks/{}-clean-gameweeks.csv".format(season), index=False)
+    SeasonStore("../../data/clean_gameweeks").write(gameweeks.gameweeks, season)
+    return season, time.perf_counter() - start, instrumentation.take_calls()
+
+
+def transform_seasons(seasons, workers=None):
+    """
+    transforms the seasons in a pool of processes, reporting each season as it finishes
+    if any season fails, the remaining seasons still finish before an error naming the failed seasons is raised
+    :param seasons: list
+    :param workers: int
+    :return: dict
+    """
+    workers = min(workers or os.cpu_count(), len(seasons))
+    print("Transforming {} seasons with {} workers".format(len(seasons), workers))
+    timings, failures = {}, {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(transform_season, season): season for season in seasons}
+        for future in as_completed(futures):
+            season = futures[future]
+            try:
+                _, timings[season], calls = future.result()
+                instrumentation.add_calls(calls)
+                print("{} done in {:.1f}s ({}/{})".format(season, timings[season], len(timings), len(seasons)))
+            except Exception as error:
+                failures[season] = error
+                print("{} failed:".format(season))
+                traceback.print_exception(type(error), error, error.__traceback__)
+
+    print("Finished in {:.1f}s".format(time.perf_counter() - start))
+    for season in seasons:
+        print("{:<10}{}".format(season, "{:.1f}s".format(timings[season]) if season in timings else "failed"))
+    if failures:
+        raise RuntimeError("Transforming seasons {} failed".format(", ".join(sorted(failures))))
+    return timings
+
+
+if __name__ == "__main__":
+    transform_seasons(FINISHED_SEASONS, WORKERS)
@@ -0,0 +1,32 @@
+"""
+Update the identity index of the players and teams with every season of gameweeks data, so the later transforms can
+join and group the players and teams by integer ids that are stable across seasons.
+The index is only ever extended, so a player or team keeps their id when a season is added or its data is fetched again.
+"""
+import os
+from project.models.identity import IdentityIndex, fpl_teams
+from project.transform.individual import LOADERS, load_gameweeks, read_game_odds, read_end_of_season
+
+IDENTITY_PATH = "../../data/identity"
+
+identity = IdentityIndex.load(IDENTITY_PATH)
+
+for season in LOADERS:
+    if not os.path.exists("../../data/gameweeks/{}-gameweeks.csv".format(season)):
+        print("Skipping {}, it has no gameweeks data".format(season))
+        continue
+    raw_gameweeks = load_gameweeks(season)
+    season_players = raw_gameweeks[["element", "name"] + (["team"] if "team" in raw_gameweeks.columns else [])]
+    season_players = season_players.drop_duplicates("element", keep="last")
+
+    end_of_season_path = "../../data/end_of_season/{}-end-of-season.csv".format(season)
+    if os.path.exists(end_of_season_path):
+        codes = read_end_of_season(season, {"id": "int16", "code": "int32"}).rename(columns={"id": "element"})
+        season_players = season_players.merge(codes, on="element", how="left")
+
+    identity.add_season(season, season_players)
+    identity.add_teams(season, fpl_teams(raw_gameweeks, read_game_odds(season, {"HomeTeam": "str"})))
+
+identity.save(IDENTITY_PATH)
+print("Indexed {} players and {} teams".format(identity.players["player_id"].nunique(),
+                                               identity.teams["team_id"].nunique()))
@@ -1,33 +1,139 @@
 """
 Individual transformations to clean the raw seasons gameweeks data.
+Each season has a loader registered for it, which reads and cleans that season only when it is first requested and
+keeps the result for later requests, so importing this module reads no data.
 """
+import functools
 import pandas as pd
+from project.models.end_of_season import END_OF_SEASON_COLUMNS
+from project.models.gameweeks import GAMEWEEKS_COLUMNS, ODDS_COLUMNS
 
-# The name of a player in the gameweeks data does not align with the end of season data.
-gameweeks_2018_19 = pd.read_csv("../../data/gameweeks/2018-19-gameweeks.csv", encoding="latin-1")
-gameweeks_2018_19["name"] = gameweeks_2018_19["name"].str.replace("Caglar", "Çaglar")
-
-# Some team names in the 2020-21 season do not align with the previous season or the game odds.
-team_name_dict = {
-    "Man Utd": "Man United",
-    "Sheffield Utd": "Sheffield United",
-    "Spurs": "Tottenham"
-}
-# The opponent index for 2 teams need to be swapped to align with the game odds sorted team names.
-opponent_index_dict = {
-    9: 10,
-    10: 9
-}
-gameweeks_2020_21 = pd.read_csv("../../data/gameweeks/2020-21-gameweeks.csv", encoding="utf-8")
-gameweeks_2020_21["plays_for"] = gameweeks_2020_21["team"].replace(team_name_dict)
-gameweeks_2020_21["opponent_team"] = gameweeks_2020_21["opponent_team"].replace(opponent_index_dict)
-
-gameweeks_2021_22 = pd.read_csv("../../data/gameweeks/2021-22-gameweeks.csv", encoding="utf-8")
-gameweeks_2021_22["opponent_team"] = gameweeks_2021_22["opponent_team"].replace(opponent_index_dict)
-
-opponent_index_dict = {
-    10: 11,
-    11: 10
-}
-gameweeks_2022_23 = pd.read_csv("../../data/gameweeks/2022-23-gameweeks.csv", encoding="utf-8")
-gameweeks_2022_23["opponent_team"] = gameweeks_2022_23["opponent_team"].replace(opponent_index_dict)
+LOADERS = {}
+
+
+def register(season):
+    """
+    registers the decorated function as the loader of the seasons gameweeks data
+    :param season: str
+    :return: function
+    """
+    def decorator(loader):
+        LOADERS[season] = loader
+        return loader
+    return decorator
+
+
+def read_gameweeks(season, encoding="utf-8"):
+    """
+    reads the used columns of the seasons raw gameweeks data, parsed as their declared types
+    :param season: str
+    :param encoding: str
+    :return: pandas.core.frame.DataFrame
+    """
+    return pd.read_csv("../../data/gameweeks/{}-gameweeks.csv".format(season), encoding=encoding,
+                       usecols=lambda column: column in GAMEWEEKS_COLUMNS, dtype=GAMEWEEKS_COLUMNS)
+
+
+def read_game_odds(season, columns=ODDS_COLUMNS):
+    """
+    reads the used columns of the seasons game odds data, parsed as their declared types
+    :param season: str
+    :param columns: dict
+    :return: pandas.core.frame.DataFrame
+    """
+    return pd.read_csv("../../data/game_odds/{}-game-odds.csv".format(season), usecols=list(columns), dtype=columns)
+
+
+def read_end_of_season(season, columns=END_OF_SEASON_COLUMNS):
+    """
+    reads the used columns of the seasons end of season data, parsed as their declared types
+    :param season: str
+    :param columns: dict
+    :return: pandas.core.frame.DataFrame
+    """
+    return pd.read_csv("../../data/end_of_season/{}-end-of-season.csv".format(season), usecols=list(columns),
+                       dtype=columns)
+
+
+@functools.lru_cache(maxsize=None)
+def load_gameweeks(season):
+    """
+    the cleaned raw gameweeks data of the season, read the first time the season is requested
+    the same dataframe is returned to every caller, as the module level dataframes were before
+    :param season: str
+    :return: pandas.core.frame.DataFrame
+    """
+    if season not in LOADERS:
+        raise KeyError("No gameweeks loader for season {}, the seasons are {}".format(season, ", ".join(LOADERS)))
+    return LOADERS[season]()
+
+
+@register("2016-17")
+def load_2016_17():
+    """
+    :return: pandas.core.frame.DataFrame
+    """
+    return read_gameweeks("2016-17", encoding="latin-1")
+
+
+@register("2017-18")
+def load_2017_18():
+    """
+    :return: pandas.core.frame.DataFrame
+    """
+    return read_gameweeks("2017-18", encoding="latin-1")
+
+
+@register("2018-19")
+def load_2018_19():
+    """
+    :return: pandas.core.frame.DataFrame
+    """
+    # The name of a player in the gameweeks data does not align with the end of season data.
+    gameweeks = read_gameweeks("2018-19", encoding="latin-1")
+    gameweeks["name"] = gameweeks["name"].str.replace("Caglar", "Çaglar")
+    return gameweeks
+
+
+@register("2019-20")
+def load_2019_20():
+    """
+    :return: pandas.core.frame.DataFrame
+    """
+    return read_gameweeks("2019-20")
+
+
+@register("2020-21")
+def load_2020_21():
+    """
+    :return: pandas.core.frame.DataFrame
+    """
+    return read_gameweeks("2020-21")
+
+
+@register("2021-22")
+def load_2021_22():
+    """
+    :return: pandas.core.frame.DataFrame
+    """
+    return read_gameweeks("2021-22")
+
+
+@register("2022-23")
+def load_2022_23():
+    """
+    :return: pandas.core.frame.DataFrame
+    """
+    return read_gameweeks("2022-23")
+
+
+def __getattr__(name):
+    """
+    loads the season named by the module attribute, e.g. gameweeks_2022_23, when it is first imported
+    :param name: str
+    :return: pandas.core.frame.DataFrame
+    """
+    season = name[len("gameweeks_"):].replace("_", "-")
+    if name.startswith("gameweeks_") and season in LOADERS:
+        return load_gameweeks(season)
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
@@ -3,12 +3,12 @@ Prepare the latest gameweek data, for each player who plays for a team in the ne
 for predicting.
 """
 import json
-import pandas as pd
+from project.models.season_store import SeasonStore
 
 parameters = json.load(open("../../project/parameters.json"))
 CURRENT_SEASON = parameters["CURRENT_SEASON"]
 
-all_seasons = pd.read_csv("../../data/all_seasons.csv")
+current_season = SeasonStore("../../data/all_seasons").read(partitions=[CURRENT_SEASON])
 
-recent_gameweek = all_seasons[(all_seasons["season"] == CURRENT_SEASON) & (all_seasons["shift_opponent"].isnull())]
+recent_gameweek = current_season[current_season["shift_opponent"].isnull()]
 recent_gameweek.drop(["shift_total_points_range"], axis=1, inplace=True)
@@ -1,12 +1,20 @@
 """
 Prepare the all complete rows of the master data to train the model.
+Unless SPARSE_DUMMIES is false in the parameters, the dummies are kept sparse, so the train and test sets are sparse
+matrices for sparse capable estimators.
 """
-import pandas as pd
+import json
 from project.models.training import Training
+from project.models.season_store import SeasonStore
 
-all_seasons = pd.read_csv("../../data/all_seasons.csv", low_memory=False)
+parameters = json.load(open("../../project/parameters.json"))
+SPARSE_DUMMIES = parameters["SPARSE_DUMMIES"]
+
+all_seasons = SeasonStore("../../data/all_seasons").read()
 
 training_data = all_seasons[all_seasons["shift_opponent"].notna()]
+training_data = training_data.apply(lambda column: column.cat.remove_unused_categories()
+                                    if column.dtype == "category" else column)
 training_data = Training(training_data)
-training_data.dummify_categories()
+training_data.dummify_categories(sparse_output=SPARSE_DUMMIES)
 x_train, x_test, y_train, y_test, transformer = training_data.split_into_train_and_test()
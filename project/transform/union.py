@@ -1,18 +1,53 @@
 """
 Concatenate all the seasons gameweeks data into one master dataset.
+The seasons are streamed one partition at a time, first to aggregate them and then to map and write each season from
+the combined aggregates, so the memory needed is bounded by the largest season rather than growing with the seasons.
+In incremental mode, the aggregates of the finished seasons are kept from the last full rebuild, so only the current
+seasons clean gameweeks are read and written, and the finished seasons rows whose output changed are updated in place.
+The state is saved after each merge, so the next merge compares against the totals the store was last written from.
+The defenders and midfielders are typed by the POSITION_THRESHOLDS of the parameters, per season when
+POSITIONS_PER_SEASON is true.
 """
-import pandas as pd
-import glob
-from project.models.all_seasons import AllSeasons
+import hashlib
+import json
+import os
+from project.models.all_seasons import ALL_SEASONS_COLUMNS
+from project.models.season_store import SeasonStore
+from project.models.union_state import UnionState, stream_union
+from project.hashing import hash_path
 
-all_seasons = pd.concat(
-    map(lambda x: pd.read_csv(x, low_memory=False), glob.glob("../../data/clean_gameweeks/*.csv")))
-all_seasons = AllSeasons(all_seasons)
+parameters = json.load(open("../../project/parameters.json"))
+CURRENT_SEASON = parameters["CURRENT_SEASON"]
+INCREMENTAL = parameters["INCREMENTAL_UNION"]
+POSITION_THRESHOLDS = parameters["POSITION_THRESHOLDS"]
+POSITIONS_PER_SEASON = parameters["POSITIONS_PER_SEASON"]
 
-all_seasons.map_defender_position()
-all_seasons.map_midfielder_position()
+clean_gameweeks = SeasonStore("../../data/clean_gameweeks")
+all_seasons_store = SeasonStore("../../data/all_seasons")
+STATE_PATH = "../../data/all_seasons/union-state.pkl"
 
-all_seasons.form_against_shift_opponent()
-all_seasons.only_take_minutes_played()
-all_seasons.take_useful_columns()
-all_seasons.all_seasons.to_csv('../../data/all_seasons.csv', index=False)
+frozen_seasons = [season for season in clean_gameweeks.partitions() if season != CURRENT_SEASON]
+frozen_key = hashlib.sha256(json.dumps(
+    [hash_path(os.path.abspath(os.path.join(clean_gameweeks.path, season))) for season in frozen_seasons]
+    + [hash_path(os.path.abspath(path)) for path in ["../models/all_seasons.py", "../models/union_state.py"]]
+    + [POSITION_THRESHOLDS, POSITIONS_PER_SEASON]
+).encode()).hexdigest()
+
+state = None
+if INCREMENTAL and os.path.exists(STATE_PATH) and CURRENT_SEASON in clean_gameweeks.partitions():
+    state = UnionState.load(STATE_PATH)
+    if state.frozen_key != frozen_key or not set(frozen_seasons) <= set(all_seasons_store.partitions()):
+        state = None
+
+if state is not None:
+    current_seasons = clean_gameweeks.read_partition(CURRENT_SEASON, columns=ALL_SEASONS_COLUMNS)
+    print("Merging {} rows of the current season".format(len(current_seasons)))
+    updated = state.merge(all_seasons_store, current_seasons, CURRENT_SEASON, STATE_PATH)
+    print("Updated {} rows of the finished seasons".format(updated))
+else:
+    aggregates, positions, against, frozen_rows = stream_union(clean_gameweeks, all_seasons_store, frozen_seasons,
+                                                               CURRENT_SEASON, POSITION_THRESHOLDS,
+                                                               POSITIONS_PER_SEASON)
+    if INCREMENTAL and frozen_rows is not None:
+        UnionState.from_union(frozen_key, frozen_seasons, aggregates, frozen_rows, positions, against,
+                              POSITION_THRESHOLDS, POSITIONS_PER_SEASON).save(STATE_PATH)